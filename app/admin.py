@@ -0,0 +1,660 @@
+import logging
+import os
+from flask import abort, current_app, request, session, redirect, url_for, flash, send_from_directory
+from flask_admin import Admin, AdminIndexView, BaseView, expose
+from flask_admin.contrib.sqla import ModelView
+from wtforms import SelectField, DateField, FloatField, StringField, SubmitField
+from flask_wtf import FlaskForm
+from wtforms.validators import DataRequired
+from wtforms.validators import InputRequired, NumberRange, Optional
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload
+from app import alerts, bulk, db, inventory, reconciliation
+from app.decorators import query_budget
+from app.models import PackageDeal, Hotel, Flight, FlightSchedule, Booking, BookingArchive, Contact, User
+from app.sampling_profiler import list_profiles, read_profile
+
+logger = logging.getLogger(__name__)
+
+ADMIN_LIST_QUERY_BUDGET = 10
+
+
+# Custom AdminIndexView with access control and custom buttons
+class MyAdminIndexView(AdminIndexView):
+    @expose("/")
+    def index(self):
+        if not self.is_accessible():
+            return self.inaccessible_callback(name="index")
+        return self.render("admin/index.html")  
+
+    def is_accessible(self):
+        return session.get("admin_logged_in")  # Check if admin is logged in
+
+    def inaccessible_callback(self, name, **kwargs):
+        flash("You must log in as admin to access the admin panel.", "warning")
+        return redirect(url_for("routes.admin_login"))
+
+
+class ListQueryBudgetMixin:
+    """Hold a list page to a fixed number of statements however many rows it shows."""
+
+    @expose("/")
+    @query_budget(ADMIN_LIST_QUERY_BUDGET)
+    def index_view(self):
+        return super().index_view()
+
+
+# Custom ModelView for managing models in the admin panel
+class MyModelView(ListQueryBudgetMixin, ModelView):
+    def is_accessible(self):
+        return session.get("admin_logged_in")  # Check if admin is logged in
+
+    def inaccessible_callback(self):
+        flash("You must log in as admin to access the admin panel.", "warning")
+        return redirect(url_for("routes.admin_login"))
+
+
+# Custom SearchForm for searching in the admin panel
+
+
+class SearchForm(FlaskForm):
+    search_query = StringField("Search", validators=[DataRequired()])
+    submit = SubmitField("Search")
+
+
+
+class BookingAdmin(ListQueryBudgetMixin, ModelView):
+    # Define searchable fields
+    column_searchable_list = ["name", "email", "destination"]
+
+    # Define all possible columns
+    column_list = (
+        "id",
+        "name",
+        "email",
+        "service_type",
+        "destination",
+        "num_people",
+        "total_price",
+        "booking_date",
+        "is_confirmed",
+    )
+
+    # Define filters
+    column_filters = ["booking_date"]
+
+    # Define column labels for better readability
+    column_labels = {
+        "service_type": "Service Type",
+        "num_people": "Number of People",
+        "total_price": "Total Price",
+        "booking_date": "Booking Date",
+        "is_confirmed": "Confirmed",
+    }
+
+    # Define form fields
+    form_columns = (
+        "name",
+        "email",
+        "destination",
+        "service_type",
+        "flight_id",
+        "hotel_id",
+        "package_deal_id",
+        "num_people",
+        "booking_date",
+        "total_price",
+        "is_confirmed",
+    )
+
+    form_extra_fields = {
+        "service_type": SelectField(
+            "Service Type",
+            choices=[
+                ("Flight", "Flight"),
+                ("Hotel", "Hotel"),
+                ("PackageDeal", "Package Deal"),
+            ],
+            validators=[DataRequired()],
+        ),
+        "flight_id": SelectField("Flight", choices=[], coerce=int, validators=[]),
+        "hotel_id": SelectField("Hotel", choices=[], coerce=int, validators=[]),
+        "package_deal_id": SelectField("Package Deal", choices=[], coerce=int, validators=[]),
+    }
+
+    # Dynamically populate select field choices for create/edit forms
+    def _populate_service_choices(self, form):
+        form.flight_id.choices = [(0, "None")] + [(f.id, f.airline) for f in Flight.query.all()]
+        form.hotel_id.choices = [(0, "None")] + [(h.id, h.hotel_name) for h in Hotel.query.all()]
+        form.package_deal_id.choices = [(0, "None")] + [(p.id, f"Package {p.id}") for p in PackageDeal.query.all()]
+
+    def create_form(self, obj=None):
+        form = super(BookingAdmin, self).create_form(obj)
+        self._populate_service_choices(form)
+        return form
+
+    def edit_form(self, obj=None):
+        form = super(BookingAdmin, self).edit_form(obj)
+        self._populate_service_choices(form)
+        return form
+
+    # Handle form submissions to set the appropriate foreign keys based on service_type
+    def on_model_change(self, form, model, is_created):
+        try:
+            # Reset foreign keys based on service_type
+            model.flight_id = form.flight_id.data if form.service_type.data == "Flight" and form.flight_id.data != 0 else None
+            model.hotel_id = form.hotel_id.data if form.service_type.data == "Hotel" and form.hotel_id.data != 0 else None
+            model.package_deal_id = form.package_deal_id.data if form.service_type.data == "PackageDeal" and form.package_deal_id.data != 0 else None
+
+            # Set service type
+            model.service_type = form.service_type.data
+
+            # Calculate total price
+            model.total_price = model.calculate_total_price()  # Ensure this method exists and calculates correctly
+
+            # Validate that required foreign keys are set based on service_type
+            if form.service_type.data == "Flight" and not model.flight_id:
+                raise ValueError("Flight ID must be set for Flight service type.")
+            if form.service_type.data == "Hotel" and not model.hotel_id:
+                raise ValueError("Hotel ID must be set for Hotel service type.")
+            if form.service_type.data == "PackageDeal" and not model.package_deal_id:
+                raise ValueError("Package Deal ID must be set for Package Deal service type.")
+
+        except Exception as e:
+            logger.error("Error in BookingAdmin.on_model_change: %s", e)
+            flash(f"Error processing booking: {e}", "danger")
+            raise e
+
+    def get_query(self):
+        # Get the current query
+        query = super().get_query()
+        # Check if service_type is in the request args
+        service_type = request.args.get("service_type")
+        if service_type:
+            query = query.filter_by(service_type=service_type)
+        return query
+
+    def get_count_query(self):
+        # Get the count query for pagination
+        query = super().get_count_query()
+        # Check if service_type is in the request args
+        service_type = request.args.get("service_type")
+        if service_type:
+            query = query.filter_by(service_type=service_type)
+        return query
+
+class BookingArchiveAdmin(MyModelView):
+    # Read-only view of bookings moved out by `flask archive-bookings`
+    can_create = False
+    can_edit = False
+    can_delete = False
+    column_searchable_list = ["name", "email", "destination"]
+    column_filters = ["booking_date", "service_type", "is_confirmed", "user_id"]
+    column_list = (
+        "id",
+        "name",
+        "email",
+        "service_type",
+        "destination",
+        "num_people",
+        "total_price",
+        "booking_date",
+        "is_confirmed",
+        "archived_at",
+    )
+    column_default_sort = ("id", True)
+
+
+class BaseBookingAdmin(BookingAdmin):
+    # Related columns are loaded with the page instead of once per row
+    list_loads = ()
+
+    def get_query(self):
+        return super().get_query().filter(Booking.service_type == self.service_type).options(*self.list_loads)
+
+    def get_count_query(self):
+        return super().get_count_query().filter(Booking.service_type == self.service_type)
+
+
+class FlightBookingAdmin(BaseBookingAdmin):
+    service_type = 'Flight'
+    list_loads = (joinedload(Booking.flight),)
+    
+    column_list = BookingAdmin.column_list + (
+        "flight.airline",
+        "flight_number",
+        "flight.departure_time",
+        "flight.arrival_time",
+    )
+    
+    form_columns = BookingAdmin.form_columns + ("flight_id",)
+
+
+class HotelBookingAdmin(BaseBookingAdmin):
+    service_type = 'Hotel'
+    list_loads = (joinedload(Booking.hotel),)
+    
+    column_list = BookingAdmin.column_list + (
+        "hotel.hotel_name",
+        "hotel.hotel_location",
+        "hotel.checkin_date",
+        "hotel.checkout_date",
+    )
+    
+    form_columns = BookingAdmin.form_columns + ("hotel_id",)
+
+
+class PackageDealBookingAdmin(BaseBookingAdmin):
+    service_type = 'PackageDeal'
+    list_loads = (
+        joinedload(Booking.package_deal).joinedload(PackageDeal.flight),
+        joinedload(Booking.package_deal).joinedload(PackageDeal.hotel),
+    )
+    
+    column_list = BookingAdmin.column_list + (
+        "package_deal.flight.airline",
+        "package_deal.hotel.hotel_name",
+    )
+    
+    form_columns = BookingAdmin.form_columns + ("package_deal_id",)
+
+
+class UserAdmin(MyModelView):
+    column_searchable_list = ["name", "email"]
+    column_list = ("id", "name", "email", "password_hash")  # Adjusted field name
+    column_labels = {"name": "Name", "email": "Email", "password_hash": "password"}
+
+    form_columns = ("name", "email", "password_hash")
+
+    def on_model_change(self, form, model, is_created):
+        # Hash the password_hash before storing
+        if form.password_hash.data:
+            model.set_password_hash(
+                form.password_hash.data
+            )  # Assuming set_password_hash method exists
+
+class InventoryAdminMixin:
+    """Ledger availability edits made through the admin forms and queue price changes for alerts."""
+
+    def on_model_change(self, form, model, is_created):
+        super().on_model_change(form, model, is_created)
+        state = inspect(model)
+        history = state.attrs.availability.history
+        if not is_created and history.added and history.deleted:
+            delta = history.added[0] - history.deleted[0]
+            inventory.record(type(model), model.id, delta, "admin")
+            # A restock or cut by hand is a new capacity, or reconcile --fix would undo it
+            reconciliation.shift_capacity(type(model), model.id, delta)
+        if not is_created and state.attrs.price.history.has_changes():
+            alerts.mark_changed(model.__tablename__, model.id)
+
+    def after_model_change(self, form, model, is_created):
+        super().after_model_change(form, model, is_created)
+        if is_created:
+            reconciliation.set_capacity(type(model), model.id, model.availability)
+            alerts.mark_changed(model.__tablename__, model.id)
+            db.session.commit()
+
+
+class LiveInventoryAdminMixin:
+    """List only rows still on sale unless the URL asks for ?retired=1."""
+
+    def get_query(self):
+        query = super().get_query()
+        return query if request.args.get("retired") else query.filter(self.model.is_active)
+
+    def get_count_query(self):
+        query = super().get_count_query()
+        return query if request.args.get("retired") else query.filter(self.model.is_active)
+
+
+class FlightAdmin(ListQueryBudgetMixin, LiveInventoryAdminMixin, InventoryAdminMixin, ModelView):
+    # List all fields to display in the table view
+    column_list = (
+        "id",
+        "airline",
+        "flight_number",
+        "departure_city",
+        "destination",
+        "departure_time",
+        "arrival_time",
+        "price",
+        "availability",
+        "is_active",
+    )
+
+    # Searchable fields in the table view
+    column_searchable_list = [
+        "airline",
+        "flight_number",
+        "departure_city",
+        "destination",
+    ]
+
+    # Fields to filter by in the table view
+    column_filters = [
+        "airline",
+        "departure_city",
+        "destination",
+        "departure_time",
+        "arrival_time",
+        "is_active",
+    ]
+
+    # Custom labels for each column
+    column_labels = {
+        "airline": "Airline",
+        "flight_number": "Flight Number",
+        "departure_city": "Departure City",
+        "destination": "Destination",
+        "departure_time": "Departure Time",
+        "arrival_time": "Arrival Time",
+        "price": "Price",
+        "availability": "Availability",
+    }
+
+    # Ensure the price field is available in the form when creating/editing a flight
+    form_columns = [
+        "airline",
+        "flight_number",
+        "departure_city",
+        "destination",
+        "departure_time",
+        "arrival_time",
+        "price",
+        "availability",
+    ]
+
+    # Custom formatter for displaying price in Indian Rupees
+    def _price_formatter(view, context, model, name):
+        """Display the price description in Indian Rupees."""
+        return f"₹{model.price:.2f}"
+
+    # Assign the price formatter to the price column
+    column_formatters = {"price": _price_formatter}
+
+
+class FlightScheduleAdmin(MyModelView):
+    """Recurring flights; their departures become Flight rows through `flask materialize-schedules` or on first booking."""
+
+    column_list = (
+        "id",
+        "airline",
+        "flight_number",
+        "departure_city",
+        "destination",
+        "weekdays",
+        "departure_time",
+        "duration_minutes",
+        "valid_from",
+        "valid_to",
+        "price",
+        "capacity",
+        "is_active",
+    )
+    column_searchable_list = ["airline", "flight_number", "departure_city", "destination"]
+    column_filters = ["airline", "departure_city", "destination", "valid_from", "valid_to", "is_active"]
+    column_labels = {
+        "weekdays": "Weekdays (0 = Monday)",
+        "duration_minutes": "Duration (minutes)",
+        "capacity": "Seats per Departure",
+    }
+    column_descriptions = {"weekdays": "Digits of the days it flies, e.g. 0123456 daily or 024 on Mon, Wed, Fri."}
+    form_excluded_columns = ["flights"]
+    column_formatters = {"price": lambda view, context, model, name: f"₹{model.price:.2f}"}
+
+
+class HotelAdmin(ListQueryBudgetMixin, LiveInventoryAdminMixin, InventoryAdminMixin, ModelView):
+    # List all fields to display in the table view
+    column_list = (
+        "id",
+        "hotel_name",
+        "hotel_location",
+        "hotel_rating",
+        "checkin_date",
+        "checkout_date",
+        "price",
+        "availability",
+        "is_active",
+    )
+
+    # Searchable fields in the table view
+    column_searchable_list = ["hotel_name", "hotel_location"]
+
+    # Fields to filter by in the table view
+    column_filters = ["hotel_location", "hotel_rating", "checkin_date", "checkout_date", "is_active"]
+
+    # Custom labels for each column
+    column_labels = {
+        "hotel_name": "Hotel Name",
+        "hotel_location": "Hotel Location",
+        "hotel_rating": "Hotel Rating",
+        "checkin_date": "Check-in Date",
+        "checkout_date": "Check-out Date",
+        "price": "Price",
+        "availability": "Availability",
+    }
+
+    # Ensure the price field is available in the form when creating/editing a hotel
+    form_columns = [
+        "hotel_name",
+        "hotel_location",
+        "hotel_rating",
+        "checkin_date",
+        "checkout_date",
+        "price",
+        "availability",
+    ]
+
+    # Custom formatter for displaying price in Indian Rupees
+    def _price_formatter(view, context, model, name):
+        """Display the price description in Indian Rupees."""
+        return f"₹{model.price:.2f}"
+
+    # Assign the price formatter to the price column
+    column_formatters = {"price": _price_formatter}
+
+
+class PackageDealAdmin(ListQueryBudgetMixin, ModelView):
+    # Define the columns to display in the list view
+    column_list = (
+        "id",
+        "flight_airline",
+        "hotel_name",
+        "start_date",
+        "end_date",
+        "price",
+        "flight_availability",
+        "hotel_availability",
+    )
+
+    column_labels = {
+        "flight_airline": "Flight Airline",
+        "hotel_name": "Hotel Name",
+        "start_date": "Start Date",
+        "end_date": "End Date",
+        "price": "Price",
+        "flight_availability": "Flight Availability",
+        "hotel_availability": "Hotel Availability",
+    }
+
+    form_columns = (
+        "flight_id",
+        "hotel_id",
+        "start_date",
+        "end_date",
+        "price",
+    )
+
+    form_extra_fields = {
+        "flight_id": SelectField(
+            "Flight", choices=[], coerce=int, validators=[DataRequired()]
+        ),
+        "hotel_id": SelectField(
+            "Hotel", choices=[], coerce=int, validators=[DataRequired()]
+        ),
+        "start_date": DateField(
+            "Start Date", format="%Y-%m-%d", validators=[DataRequired()]
+        ),
+        "end_date": DateField(
+            "End Date", format="%Y-%m-%d", validators=[DataRequired()]
+        ),
+        "price": FloatField(
+            "Price",
+            validators=[
+                DataRequired(),
+                NumberRange(min=0.0, message="Price must be a positive number."),
+            ],
+        ),
+    }
+
+    # Custom formatter for displaying price in Indian Rupees
+    def _price_formatter(view, context, model, name):
+        """Display the price in a formatted manner in Indian Rupees."""
+        return f"₹{model.price:.2f}"
+
+    # The formatters below read m.flight / m.hotel on every row, load them with the list query
+    column_select_related_list = (PackageDeal.flight, PackageDeal.hotel)
+
+    column_formatters = {
+        "price": _price_formatter,
+        "flight_airline": lambda v, c, m, n: m.flight.airline if m.flight else "N/A",
+        "hotel_name": lambda v, c, m, n: m.hotel.hotel_name if m.hotel else "N/A",
+        "flight_availability": lambda v, c, m, n: "Available" if m.flight.availability else "Unavailable",
+        "hotel_availability": lambda v, c, m, n: "Available" if m.hotel.availability else "Unavailable",
+    }
+
+    def create_form(self, obj=None):
+        form = super().create_form(obj)
+        form.flight_id.choices = [(f.id, f.airline) for f in Flight.query.all()]
+        form.hotel_id.choices = [(h.id, h.hotel_name) for h in Hotel.query.all()]
+        return form
+
+    def edit_form(self, obj=None):
+        form = super().edit_form(obj)
+        form.flight_id.choices = [(f.id, f.airline) for f in Flight.query.all()]
+        form.hotel_id.choices = [(h.id, h.hotel_name) for h in Hotel.query.all()]
+        return form
+
+    def get_query(self):
+        return super().get_query().join(Flight).join(Hotel)
+
+    def get_count_query(self):
+        return super().get_count_query().join(Flight).join(Hotel)
+
+
+class ProfilerView(BaseView):
+    # Captured request profiles, slowest first
+    def is_accessible(self):
+        return session.get("admin_logged_in")  # Check if admin is logged in
+
+    def inaccessible_callback(self, name, **kwargs):
+        flash("You must log in as admin to access the admin panel.", "warning")
+        return redirect(url_for("routes.admin_login"))
+
+    @expose("/")
+    def index(self):
+        profiles = list_profiles(current_app.config["PROFILER_DIR"])
+        return self.render("admin/profiles.html", profiles=profiles[:100])
+
+    @expose("/<filename>")
+    def detail(self, filename):
+        directory = current_app.config["PROFILER_DIR"]
+        path = os.path.join(directory, os.path.basename(filename))
+        if not os.path.isfile(path):
+            abort(404)
+        if request.args.get("raw"):
+            # Collapsed stacks for flamegraph.pl / speedscope
+            return send_from_directory(directory, os.path.basename(filename), mimetype="text/plain")
+        meta, stacks = read_profile(path)
+        total = sum(count for _, count in stacks) or 1
+        return self.render("admin/profile_detail.html", name=filename, meta=meta, stacks=stacks[:50], total=total)
+
+
+class BulkUpdateForm(FlaskForm):
+    table = SelectField("Service", choices=[("flight", "Flights"), ("hotel", "Hotels")])
+    destination = StringField("Destination / Location", validators=[Optional()])
+    departure_city = StringField("Departure City (flights)", validators=[Optional()])
+    name = StringField("Airline / Hotel Name Prefix", validators=[Optional()])
+    date_from = DateField("From", format="%Y-%m-%d", validators=[Optional()])
+    date_to = DateField("To", format="%Y-%m-%d", validators=[Optional()])
+    operation = SelectField("Change", choices=[
+        ("raise_price", "Raise price by %"),
+        ("add_price", "Add to price"),
+        ("set_price", "Set price"),
+        ("set_availability", "Set availability"),
+    ])
+    value = FloatField("Value", validators=[InputRequired()])
+    preview = SubmitField("Preview")
+    submit = SubmitField("Apply")
+
+
+class BulkUpdateView(BaseView):
+    # Set-based price and availability changes; Preview counts, Apply writes
+    def is_accessible(self):
+        return session.get("admin_logged_in")  # Check if admin is logged in
+
+    def inaccessible_callback(self, name, **kwargs):
+        flash("You must log in as admin to access the admin panel.", "warning")
+        return redirect(url_for("routes.admin_login"))
+
+    @expose("/", methods=["GET", "POST"])
+    def index(self):
+        form = BulkUpdateForm()
+        if form.validate_on_submit():
+            model = bulk.MODELS[form.table.data]
+            dry_run = not form.submit.data
+            try:
+                where = bulk.conditions(model, form.destination.data, form.departure_city.data, form.name.data,
+                                        form.date_from.data, form.date_to.data)
+                result = bulk.apply(model, form.operation.data, form.value.data, where, dry_run=dry_run)
+            except bulk.BulkUpdateError as e:
+                db.session.rollback()
+                flash(str(e), "error")
+            else:
+                if not dry_run:
+                    db.session.commit()
+                    bulk.forget_counters(model)
+                flash(bulk.describe(model, form.operation.data, result, dry_run), "info" if dry_run else "success")
+        return self.render("admin/bulk_update.html", form=form)
+
+
+def register_admin(app):
+    """Build the admin panel and add views for every model."""
+    admin = Admin(
+        app,
+        name="Admin Panel",
+        index_view=MyAdminIndexView(),
+        template_mode="bootstrap3",
+    )
+
+    # Add views for managing User, Booking, Contact, Hotel, Flight, PackageDeal models
+    admin.add_view(UserAdmin(User, db.session))
+    admin.add_view(BookingAdmin(Booking, db.session))
+    admin.add_view(
+        FlightBookingAdmin(
+            Booking, db.session, name="Flight Bookings", endpoint="flight_bookings"
+        )
+    )
+    admin.add_view(
+        HotelBookingAdmin(
+            Booking, db.session, name="Hotel Bookings", endpoint="hotel_bookings"
+        )
+    )
+    admin.add_view(
+        PackageDealBookingAdmin(
+            Booking,
+            db.session,
+            name="Package Deal Bookings",
+            endpoint="package_deal_bookings",
+        )
+    )
+    admin.add_view(BookingArchiveAdmin(BookingArchive, db.session, name="Archived Bookings", endpoint="booking_archive"))
+    admin.add_view(MyModelView(Contact, db.session))
+    admin.add_view(HotelAdmin(Hotel, db.session))
+    admin.add_view(FlightAdmin(Flight, db.session))
+    admin.add_view(FlightScheduleAdmin(FlightSchedule, db.session, name="Flight Schedules", endpoint="flight_schedule"))
+    admin.add_view(PackageDealAdmin(PackageDeal, db.session))
+    admin.add_view(BulkUpdateView(name="Bulk Update", endpoint="bulk_update"))
+    admin.add_view(ProfilerView(name="Request Profiles", endpoint="profiles"))
+    return admin
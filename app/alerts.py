@@ -0,0 +1,266 @@
+"""
+Price-drop and availability alerts.
+
+A PriceAlert is a saved search: a destination, a date window, a party size
+and optionally a price ceiling. Its window is indexed in price_alert_bucket
+under (service type, destination, week), so the matcher finds the alerts an
+item could satisfy with one index probe per week the item touches instead
+of scanning every alert.
+
+Whatever changes a flight's or hotel's price, or gives units back, queues
+the item in alert_change in the same transaction: inventory.record() for
+released inventory, the admin forms and add-service for edits and new
+items, app/bulk.py for bulk updates. `flask match-alerts` drains that queue in batches and writes one
+notification_outbox row per newly matched alert. An alert only fires again
+for a lower price than it last reported.
+"""
+import json
+import logging
+from datetime import date, datetime, timedelta
+from sqlalchemy import delete, event, func, insert, literal, select, tuple_
+from sqlalchemy.orm import Session
+from app import db, inventory
+from app.models import AlertChange, Flight, Hotel, NotificationOutbox, PriceAlert, PriceAlertBucket
+
+logger = logging.getLogger(__name__)
+
+TABLES = {"flight": "Flight", "hotel": "Hotel"}
+MAX_WINDOW_DAYS = 92
+MAX_ALERTS_PER_USER = 20
+
+# session.info key for items already queued in the open transaction
+QUEUED = "alert_queued"
+
+
+class AlertError(Exception):
+    """Raised for alerts that cannot be saved; the message is safe to show the user."""
+
+
+def week(day):
+    """Bucket of a date: the Monday of its week."""
+    return day - timedelta(days=day.weekday())
+
+
+def weeks(first, last):
+    """Buckets of every week touched by first..last inclusive."""
+    bucket = week(first)
+    while bucket <= last:
+        yield bucket
+        bucket += timedelta(days=7)
+
+
+def _resolve(column, typed, label):
+    """
+    The one stored value of `column` (lowercased) that `typed` means. Search
+    matches by substring but the matcher compares exactly, so an alert keeps
+    the real name: an exact match, else the only value containing `typed`.
+    """
+    exact = db.session.execute(
+        select(func.lower(column)).where(func.lower(column) == typed).limit(1)
+    ).scalar()
+    if exact is not None:
+        return exact
+    found = db.session.execute(
+        select(func.lower(column)).where(column.ilike(f"%{typed}%")).distinct().order_by(func.lower(column)).limit(3)
+    ).scalars().all()
+    if not found:
+        raise AlertError(f"We have nothing for {label} \"{typed}\" yet.")
+    if len(found) > 1:
+        raise AlertError(f"\"{typed}\" matches several places ({', '.join(found)}); please search for one.")
+    return found[0]
+
+
+def subscribe(user_id, service_type, destination, start_date, end_date, num_people,
+              max_price=None, departure_city=None):
+    """Save an alert and index its window; the caller commits."""
+    destination = (destination or "").strip().lower()
+    departure_city = (departure_city or "").strip().lower() or None
+    if service_type not in TABLES.values():
+        raise AlertError("Alerts are available for flights and hotels.")
+    if not destination:
+        raise AlertError("Please search for a destination first.")
+    if end_date < start_date or end_date < date.today():
+        raise AlertError("The alert's dates are in the past.")
+    if (end_date - start_date).days > MAX_WINDOW_DAYS:
+        raise AlertError(f"Alert windows can span at most {MAX_WINDOW_DAYS} days.")
+    if max_price is not None and max_price <= 0:
+        raise AlertError("Please enter a valid maximum price.")
+    if service_type == "Flight":
+        destination = _resolve(Flight.destination, destination, "destination")
+        if departure_city:
+            departure_city = _resolve(Flight.departure_city, departure_city, "departure city")
+    else:
+        destination = _resolve(Hotel.hotel_location, destination, "destination")
+    count = db.session.execute(select(func.count()).where(PriceAlert.user_id == user_id)).scalar()
+    if count >= MAX_ALERTS_PER_USER:
+        raise AlertError(f"You can keep at most {MAX_ALERTS_PER_USER} alerts.")
+    alert = PriceAlert(
+        user_id=user_id,
+        service_type=service_type,
+        destination=destination,
+        departure_city=departure_city,
+        start_date=start_date,
+        end_date=end_date,
+        max_price=max_price,
+        num_people=num_people,
+    )
+    db.session.add(alert)
+    db.session.flush()
+    db.session.add_all(
+        PriceAlertBucket(service_type=service_type, destination=destination, bucket=bucket, alert_id=alert.id)
+        for bucket in weeks(start_date, end_date)
+    )
+    return alert
+
+
+def unsubscribe(user_id, alert_id):
+    """Delete one of the user's alerts with its index rows; returns False if it is not theirs."""
+    alert = db.session.get(PriceAlert, alert_id)
+    if alert is None or alert.user_id != user_id:
+        return False
+    db.session.execute(delete(PriceAlertBucket).where(PriceAlertBucket.alert_id == alert_id))
+    db.session.delete(alert)
+    return True
+
+
+def mark_changed(table, item_id):
+    """Queue a flight or hotel for the matcher in the current transaction."""
+    if table not in TABLES:
+        return
+    queued = db.session.info.setdefault(QUEUED, set())
+    if (table, item_id) not in queued:
+        queued.add((table, item_id))
+        db.session.add(AlertChange(service_table=table, item_id=item_id, created_at=datetime.utcnow()))
+
+
+def mark_changed_where(model, where, now=None):
+    """Queue every flight or hotel matching `where` with one INSERT ... SELECT."""
+    now = now or datetime.utcnow()
+    db.session.execute(insert(AlertChange).from_select(
+        ["service_table", "item_id", "created_at"],
+        select(literal(model.__tablename__), model.id, literal(now, db.DateTime)).where(*where),
+    ))
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _forget_queued(session):
+    session.info.pop(QUEUED, None)
+
+
+def _flight_keys(flight):
+    day = flight.departure_time.date()
+    return [(flight.destination.lower(), week(day))]
+
+
+def _hotel_keys(hotel, today):
+    # Only weeks a future stay could fall in; long-lived hotels are capped at a year
+    first = max(hotel.checkin_date.date(), today)
+    last = min(hotel.checkout_date.date(), today + timedelta(days=366))
+    return [(hotel.hotel_location.lower(), bucket) for bucket in weeks(first, last)]
+
+
+def _flight_matches(alert, flight):
+    day = flight.departure_time.date()
+    return (
+        alert.start_date <= day <= alert.end_date
+        and (alert.departure_city is None or alert.departure_city == flight.departure_city.lower())
+        and flight.availability >= alert.num_people
+    )
+
+
+def _hotel_matches(alert, hotel):
+    return inventory.stay_availability(hotel.id, alert.start_date, alert.end_date) >= alert.num_people
+
+
+def _candidates(service_type, keys):
+    """{(destination, week): [alert, ...]} for the given index keys, in one query."""
+    found = {}
+    if not keys:
+        return found
+    rows = db.session.execute(
+        select(PriceAlertBucket.destination, PriceAlertBucket.bucket, PriceAlert)
+        .join(PriceAlert, PriceAlert.id == PriceAlertBucket.alert_id)
+        .where(PriceAlertBucket.service_type == service_type,
+               tuple_(PriceAlertBucket.destination, PriceAlertBucket.bucket).in_(sorted(keys)))
+    ).all()
+    for destination, bucket, alert in rows:
+        found.setdefault((destination, bucket), []).append(alert)
+    return found
+
+
+def _notify(alert, service_type, item, price, now):
+    name = f"{item.airline} {item.flight_number}" if service_type == "Flight" else item.hotel_name
+    alert.notified_price = price
+    db.session.add(NotificationOutbox(
+        user_id=alert.user_id,
+        kind="price_alert",
+        subject=f"{name} to {alert.destination.title()} from {price:,.2f}",
+        body=json.dumps({
+            "alert_id": alert.id,
+            "service_type": service_type,
+            "item_id": item.id,
+            "price": price,
+            "availability": item.availability,
+            "start_date": alert.start_date.isoformat(),
+            "end_date": alert.end_date.isoformat(),
+        }),
+        created_at=now,
+    ))
+
+
+def match_batch(batch_size=500, now=None):
+    """
+    Match the oldest `batch_size` queued changes and commit. Returns
+    (changes consumed, notifications queued); (0, 0) once the queue is empty.
+    """
+    now = now or datetime.utcnow()
+    changes = db.session.execute(
+        select(AlertChange.id, AlertChange.service_table, AlertChange.item_id)
+        .order_by(AlertChange.id)
+        .limit(batch_size)
+    ).all()
+    if not changes:
+        return 0, 0
+    ids = {table: {c.item_id for c in changes if c.service_table == table} for table in TABLES}
+    queued = 0
+    for model, table, keys_for, matches in (
+        (Flight, "flight", _flight_keys, _flight_matches),
+        (Hotel, "hotel", lambda hotel: _hotel_keys(hotel, now.date()), _hotel_matches),
+    ):
+        if not ids[table]:
+            continue
+        service_type = TABLES[table]
+        items = db.session.execute(select(model).where(model.id.in_(ids[table])).order_by(model.price)).scalars().all()
+        keys = {item.id: keys_for(item) for item in items}
+        candidates = _candidates(service_type, set().union(*keys.values()))
+        for item in items:
+            seen = set()
+            for key in keys[item.id]:
+                for alert in candidates.get(key, ()):
+                    if alert.id in seen:
+                        continue
+                    seen.add(alert.id)
+                    price = item.price
+                    if alert.max_price is not None and price > alert.max_price:
+                        continue
+                    if alert.notified_price is not None and price >= alert.notified_price:
+                        continue
+                    if matches(alert, item):
+                        _notify(alert, service_type, item, price, now)
+                        queued += 1
+    db.session.execute(delete(AlertChange).where(AlertChange.id.in_([change.id for change in changes])))
+    db.session.commit()
+    logger.info("Matched %d changed items against alerts, queued %d notifications", len(changes), queued)
+    return len(changes), queued
+
+
+def match_pending(batch_size=500):
+    """Drain the change queue one committed batch at a time; returns (changes, notifications)."""
+    changes = queued = 0
+    while True:
+        consumed, notified = match_batch(batch_size)
+        if not consumed:
+            return changes, queued
+        changes += consumed
+        queued += notified
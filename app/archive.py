@@ -0,0 +1,105 @@
+"""
+Archival of canceled and long-past bookings into booking_archive.
+
+A booking is archived once it was made more than BOOKING_RETENTION_DAYS ago
+and is either canceled or its trip ended before that cutoff (stay check-out,
+package end, hotel check-out or flight departure). `flask archive-bookings`
+moves them in batches, oldest id first. Each batch is one transaction: copy
+into booking_archive with INSERT ... SELECT, delete the stay, seat and
+ingestion rows, delete the bookings. An interrupted run loses at most the
+batch in flight, which rolls back, and the next run carries on where it
+stopped because moved rows are no longer candidates.
+
+The hot table then holds only live and recent bookings. The profile page
+and the admin read the archive only when asked. Ledger rows keep their
+booking_id; it now names a booking_archive row (SQLite does not enforce
+the foreign key).
+"""
+import logging
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, func, insert, literal, or_, select
+from app import db
+from app.models import (
+    Booking, BookingArchive, Flight, Hotel, HotelStay, IngestedBooking, PackageDeal, SeatAssignment,
+)
+
+logger = logging.getLogger(__name__)
+
+BOOKING_COLUMNS = [column.name for column in Booking.__table__.columns]
+
+
+def cutoff(days=None, now=None):
+    days = current_app.config["BOOKING_RETENTION_DAYS"] if days is None else days
+    return (now or datetime.utcnow()) - timedelta(days=days)
+
+
+def _trip_end():
+    return func.coalesce(HotelStay.check_out, PackageDeal.end_date, Hotel.checkout_date, Flight.departure_time)
+
+
+def candidates(before):
+    """Ids of bookings to archive, oldest first, as a SELECT to limit."""
+    return (
+        select(Booking.id)
+        .outerjoin(HotelStay, HotelStay.booking_id == Booking.id)
+        .outerjoin(PackageDeal, PackageDeal.id == Booking.package_deal_id)
+        .outerjoin(Hotel, Hotel.id == Booking.hotel_id)
+        .outerjoin(Flight, Flight.id == Booking.flight_id)
+        .where(Booking.booking_date < before, or_(Booking.is_confirmed.is_(False), _trip_end() < before))
+        .order_by(Booking.id)
+    )
+
+
+def count_candidates(before):
+    return db.session.execute(select(func.count()).select_from(candidates(before).subquery())).scalar()
+
+
+def archive_batch(before, batch_size=1000, now=None):
+    """Move up to `batch_size` bookings and commit; returns how many moved."""
+    now = now or datetime.utcnow()
+    ids = db.session.execute(candidates(before).limit(batch_size)).scalars().all()
+    if not ids:
+        return 0
+    db.session.execute(insert(BookingArchive).from_select(
+        BOOKING_COLUMNS + ["check_in", "check_out", "seats", "archived_at"],
+        select(
+            *(Booking.__table__.c[name] for name in BOOKING_COLUMNS),
+            HotelStay.check_in, HotelStay.check_out, SeatAssignment.seats, literal(now, db.DateTime),
+        )
+        .outerjoin(HotelStay, HotelStay.booking_id == Booking.id)
+        .outerjoin(SeatAssignment, SeatAssignment.booking_id == Booking.id)
+        .where(Booking.id.in_(ids)),
+    ))
+    for model in (HotelStay, SeatAssignment, IngestedBooking):
+        db.session.execute(delete(model).where(model.booking_id.in_(ids)))
+    moved = db.session.execute(delete(Booking).where(Booking.id.in_(ids))).rowcount
+    db.session.commit()
+    logger.info("Archived %d bookings up to id %d", moved, ids[-1])
+    return moved
+
+
+def archive(before, batch_size=1000, max_batches=None):
+    """Archive batch after batch until none are left or `max_batches` ran; returns the total moved."""
+    moved = batches = 0
+    while max_batches is None or batches < max_batches:
+        done = archive_batch(before, batch_size)
+        if not done:
+            break
+        moved += done
+        batches += 1
+    return moved
+
+
+def archived_for_user(user_id, limit=50):
+    """A user's archived bookings, newest first."""
+    return db.session.execute(
+        select(BookingArchive)
+        .where(BookingArchive.user_id == user_id)
+        .order_by(BookingArchive.booking_date.desc())
+        .limit(limit)
+    ).scalars().all()
+
+
+def init_app(app):
+    app.config.setdefault("BOOKING_RETENTION_DAYS", 365)
@@ -3,7 +3,6 @@ from app.models import PackageDeal, Flight, Hotel
 import logging
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)  
 
 
 class PackageDealBuilder:
@@ -18,14 +17,14 @@ class PackageDealBuilder:
         if not isinstance(flight, Flight):
             raise TypeError("Expected a Flight instance.")
         self._flight = flight
-        logger.debug(f"PackageDealBuilder: Set flight to {flight}")
+        logger.debug("PackageDealBuilder: Set flight to %s", flight)
         return self
 
     def set_hotel(self, hotel: Hotel):
         if not isinstance(hotel, Hotel):
             raise TypeError("Expected a Hotel instance.")
         self._hotel = hotel
-        logger.debug(f"PackageDealBuilder: Set hotel to {hotel}")
+        logger.debug("PackageDealBuilder: Set hotel to %s", hotel)
         return self
 
     def set_dates(self, start_date: date, end_date: date):
@@ -35,14 +34,14 @@ class PackageDealBuilder:
             raise ValueError("end_date cannot be before start_date.")
         self._start_date = start_date
         self._end_date = end_date
-        logger.debug(f"PackageDealBuilder: Set dates from {start_date} to {end_date}")
+        logger.debug("PackageDealBuilder: Set dates from %s to %s", start_date, end_date)
         return self
 
     def calculate_price(self):
         if not self._flight or not self._hotel:
             raise ValueError("Flight and Hotel must be set before calculating price.")
         self._price = self._flight.calculate_cost() + self._hotel.calculate_cost()
-        logger.debug(f"PackageDealBuilder: Calculated price {self._price}")
+        logger.debug("PackageDealBuilder: Calculated price %s", self._price)
         return self
 
     def build(self):
@@ -63,5 +62,5 @@ class PackageDealBuilder:
             end_date=self._end_date,
             price=self._price,
         )
-        logger.debug(f"PackageDealBuilder: Built PackageDeal {package_deal}")
+        logger.debug("PackageDealBuilder: Built PackageDeal %s", package_deal)
         return package_deal
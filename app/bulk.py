@@ -0,0 +1,173 @@
+"""
+Set-based bulk price and availability updates for flights and hotels.
+
+Each change is a single UPDATE ... WHERE <filters> instead of one ORM object
+and form post per row, so a seasonal repricing of a few hundred thousand
+rows is one statement. Because the ORM validators are bypassed, the rules
+they enforce are checked set-based first: a change that would leave any
+matched row with a negative price or availability is refused as a whole.
+
+Availability changes follow app/inventory.py's rules in bulk: one
+INSERT ... SELECT ledgers every delta, recorded capacities move by the same
+amount, and hotels already split into per-night counters are left alone
+(their nights hold different bookings). Every touched row is queued for the
+alert matcher. Availability changes of up to PUBLISH_LIMIT rows are also
+pushed to live search pages; a larger restock shows on the next search
+instead of loading every id. forget_counters() drops the
+write-behind counter cache of the process that ran the update; other
+processes catch up within WRITE_BEHIND_REFRESH_SECONDS.
+"""
+import logging
+from datetime import date, datetime, time, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy import func, insert, literal, null, select, update
+from app import alerts, db, pubsub
+from app.models import Flight, Hotel, HotelNight, InventoryCapacity, InventoryLedger
+from app.reconciliation import LEDGER_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+MODELS = {"flight": Flight, "hotel": Hotel}
+OPERATIONS = ("raise_price", "add_price", "set_price", "set_availability")
+
+# Most availability changes pushed to live search pages one by one
+PUBLISH_LIMIT = 1000
+
+
+class BulkUpdateError(Exception):
+    """Raised for bulk updates that are invalid or would break a row; nothing has been written."""
+
+
+def conditions(model, destination=None, departure_city=None, name=None, date_from=None, date_to=None):
+    """
+    WHERE clauses for the rows to change. `destination` is the flight
+    destination or hotel location, `name` the airline or hotel name (a chain
+    prefix such as "Taj" matches every "Taj ..." hotel). Dates select flights
+    departing in date_from..date_to, or hotels open on any day of it.
+    """
+    if isinstance(date_from, date) and not isinstance(date_from, datetime):
+        date_from = datetime.combine(date_from, time())
+    if isinstance(date_to, date) and not isinstance(date_to, datetime):
+        date_to = datetime.combine(date_to, time())
+    found = []
+    if model is Flight:
+        if destination:
+            found.append(Flight.destination.ilike(destination))
+        if departure_city:
+            found.append(Flight.departure_city.ilike(departure_city))
+        if name:
+            found.append(Flight.airline.ilike(f"{name}%"))
+        if date_from:
+            found.append(Flight.departure_time >= date_from)
+        if date_to:
+            found.append(Flight.departure_time < date_to + timedelta(days=1))
+    else:
+        if departure_city:
+            raise BulkUpdateError("Hotels have no departure city.")
+        if destination:
+            found.append(Hotel.hotel_location.ilike(destination))
+        if name:
+            found.append(Hotel.hotel_name.ilike(f"{name}%"))
+        if date_from:
+            found.append(Hotel.checkout_date >= date_from)
+        if date_to:
+            found.append(Hotel.checkin_date < date_to + timedelta(days=1))
+    if date_from and date_to and date_to < date_from:
+        raise BulkUpdateError("The end date is before the start date.")
+    if not found:
+        raise BulkUpdateError("Give at least one filter; bulk updates never touch a whole table by accident.")
+    return found
+
+
+def _new_value(model, operation, value):
+    if operation == "raise_price":
+        if value <= -100:
+            raise BulkUpdateError("Prices cannot drop by 100% or more.")
+        return func.round(model.price * (1 + value / 100.0), 2)
+    if operation == "add_price":
+        return model.price + value
+    if operation == "set_price":
+        return literal(value, db.Float)
+    if operation == "set_availability":
+        if value < 0 or value != int(value):
+            raise BulkUpdateError("Availability must be a whole number of units, zero or more.")
+        return literal(int(value), db.Integer)
+    raise BulkUpdateError(f"Unknown operation {operation!r}; choose from {', '.join(OPERATIONS)}.")
+
+
+def _not_split():
+    return ~select(HotelNight.hotel_id).where(HotelNight.hotel_id == Hotel.id).exists()
+
+
+def apply(model, operation, value, where, dry_run=False, now=None):
+    """
+    Run one bulk change and return {"matched", "updated", "skipped",
+    "lowest", "highest"} (the new value range over matched rows). With
+    `dry_run` nothing is written and "updated" is what would change. The
+    caller commits, then calls forget_counters() after availability changes.
+    """
+    now = now or datetime.utcnow()
+    new = _new_value(model, operation, value)
+    column = model.availability if operation == "set_availability" else model.price
+    where = list(where)
+    skipped = 0
+    if operation == "set_availability" and model is Hotel:
+        skipped = db.session.execute(select(func.count()).select_from(Hotel).where(*where, ~_not_split())).scalar()
+        where.append(_not_split())
+    matched, changed, lowest, highest = db.session.execute(
+        select(func.count(), func.count().filter(column != new), func.min(new), func.max(new))
+        .select_from(model)
+        .where(*where)
+    ).one()
+    if matched and lowest < 0:
+        raise BulkUpdateError(f"The change would leave a {model.__tablename__} with a negative value ({lowest}).")
+    result = {"matched": matched, "updated": changed, "skipped": skipped, "lowest": lowest, "highest": highest}
+    if dry_run or not changed:
+        return result
+
+    table = model.__tablename__
+    where.append(column != new)
+    alerts.mark_changed_where(model, where, now)
+    ids = []
+    if operation == "set_availability":
+        # Live pages only show availability; read the ids before the UPDATE hides them
+        if changed <= PUBLISH_LIMIT:
+            ids = db.session.execute(select(model.id).where(*where)).scalars().all()
+        db.session.execute(insert(InventoryLedger).from_select(LEDGER_COLUMNS, select(
+            literal(table), model.id, new - model.availability, literal("bulk"), null(), null(),
+            literal(now, db.DateTime),
+        ).where(*where)))
+        delta = select(new - model.availability).where(model.id == InventoryCapacity.item_id, *where).scalar_subquery()
+        db.session.execute(
+            update(InventoryCapacity)
+            .where(InventoryCapacity.service_table == table, InventoryCapacity.item_id.in_(select(model.id).where(*where)))
+            .values(capacity=InventoryCapacity.capacity + delta)
+            .execution_options(synchronize_session=False)
+        )
+    result["updated"] = db.session.execute(
+        update(model).where(*where).values({column.key: new}).execution_options(synchronize_session=False)
+    ).rowcount
+    for item_id in ids:
+        pubsub.mark_changed(table, item_id)
+    if operation == "set_availability" and not ids:
+        logger.info("Not pushing %d bulk availability changes to live pages", changed)
+    logger.info("Bulk %s %s on %d %s rows", operation, value, result["updated"], table)
+    return result
+
+
+def forget_counters(model):
+    """Drop this process's write-behind counters for `model` so the next reservation re-reads them."""
+    current = current_app.extensions.get("write_behind") if has_app_context() else None
+    if current is not None:
+        current.counters.forget(model)
+
+
+def describe(model, operation, result, dry_run):
+    """One-line summary for the CLI and the admin page."""
+    verb = "Would update" if dry_run else "Updated"
+    line = f"{verb} {result['updated']} of {result['matched']} matched {model.__tablename__} rows"
+    if result["matched"]:
+        line += f"; new {'availability' if operation == 'set_availability' else 'prices'} {result['lowest']}..{result['highest']}"
+    if result["skipped"]:
+        line += f"; skipped {result['skipped']} hotels with per-night availability"
+    return line + "."
@@ -0,0 +1,181 @@
+"""
+Multi-item checkout: every item in the cart is booked in one transaction or none is.
+The bookings go in first with a single multi-row INSERT, then inventory for all
+items is reserved through app.inventory (conditional UPDATEs in lock order) with
+every ledger row pointing at its booking. A hotel item
+added from a hotel search carries its check_in/check_out and takes rooms on
+those nights only, with a hotel_stay row like a single booking.
+"""
+import logging
+from datetime import date, datetime
+from sqlalchemy import insert
+from sqlalchemy.orm import joinedload
+from app import db, inventory
+from app.models import Booking, Flight, Hotel, HotelStay, PackageDeal
+
+logger = logging.getLogger(__name__)
+
+MAX_ITEMS = 10
+
+
+class CheckoutError(Exception):
+    """Raised when the cart cannot be booked; the message is safe to show the user."""
+
+
+def parse_items(raw_items):
+    """
+    Validate [{"booking_type", "item_id", "num_people"}, ...] from a form,
+    session or JSON body. Hotel items may add "check_in" and "check_out"
+    (YYYY-MM-DD) to book those nights only.
+    """
+    if not raw_items:
+        raise CheckoutError("Your cart is empty.")
+    if len(raw_items) > MAX_ITEMS:
+        raise CheckoutError(f"A cart can hold at most {MAX_ITEMS} items.")
+    items = []
+    for raw in raw_items:
+        try:
+            item = {
+                "booking_type": raw["booking_type"],
+                "item_id": int(raw["item_id"]),
+                "num_people": int(raw["num_people"]),
+            }
+        except (KeyError, TypeError, ValueError):
+            raise CheckoutError("Invalid cart item.")
+        if item["booking_type"] not in inventory.SERVICE_TYPES:
+            raise CheckoutError(f"Invalid booking type: {item['booking_type']}")
+        if item["num_people"] <= 0:
+            raise CheckoutError("Please enter a valid number of people for every item.")
+        if item["booking_type"] == "Hotel" and (raw.get("check_in") or raw.get("check_out")):
+            try:
+                check_in = date.fromisoformat(str(raw["check_in"]))
+                check_out = date.fromisoformat(str(raw["check_out"]))
+            except (KeyError, ValueError):
+                raise CheckoutError("Invalid stay dates.")
+            if check_out <= check_in or check_in < date.today():
+                raise CheckoutError("Please search for future stay dates first.")
+            # Kept as strings so the cart stays JSON in the session
+            item.update(check_in=check_in.isoformat(), check_out=check_out.isoformat())
+        items.append(item)
+    return items
+
+
+def stay(item):
+    """(check_in, check_out) dates of a hotel item, or None for the whole hotel."""
+    if not item.get("check_in"):
+        return None
+    return date.fromisoformat(item["check_in"]), date.fromisoformat(item["check_out"])
+
+
+def load_items(items):
+    """Attach the Flight/Hotel/PackageDeal of every item with one query per type."""
+    ids = {service_type: {i["item_id"] for i in items if i["booking_type"] == service_type}
+           for service_type in inventory.SERVICE_TYPES}
+    found = {"Flight": {}, "Hotel": {}, "PackageDeal": {}}
+    if ids["Flight"]:
+        found["Flight"] = {f.id: f for f in Flight.query.filter(Flight.id.in_(ids["Flight"]))}
+    if ids["Hotel"]:
+        found["Hotel"] = {h.id: h for h in Hotel.query.filter(Hotel.id.in_(ids["Hotel"]))}
+    if ids["PackageDeal"]:
+        packages = PackageDeal.query.options(
+            joinedload(PackageDeal.flight), joinedload(PackageDeal.hotel)
+        ).filter(PackageDeal.id.in_(ids["PackageDeal"]))
+        found["PackageDeal"] = {p.id: p for p in packages}
+
+    loaded = []
+    for item in items:
+        service = found[item["booking_type"]].get(item["item_id"])
+        if service is None:
+            raise CheckoutError(f"{item['booking_type']} {item['item_id']} no longer exists.")
+        loaded.append(dict(item, service=service, total_price=service.calculate_cost() * item["num_people"]))
+    return loaded
+
+
+def _units(item):
+    service = item["service"]
+    if item["booking_type"] == "Flight":
+        return [(Flight, service.id)]
+    if item["booking_type"] == "Hotel":
+        nights = stay(item)
+        return [inventory.stay_unit(service.id, *nights)] if nights else [(Hotel, service.id)]
+    return [(Flight, service.flight_id), (Hotel, service.hotel_id)]
+
+
+def _booking_row(user, item, booked_at):
+    service = item["service"]
+    flight = service if item["booking_type"] == "Flight" else getattr(service, "flight", None)
+    hotel = service if item["booking_type"] == "Hotel" else getattr(service, "hotel", None)
+    return {
+        "name": user.name,
+        "email": user.email,
+        "destination": flight.destination if flight else hotel.hotel_location,
+        "booking_date": booked_at,
+        "num_people": item["num_people"],
+        "user_id": user.id,
+        "flight_number": flight.flight_number if flight else None,
+        "total_price": item["total_price"],
+        "service_type": item["booking_type"],
+        "flight_id": flight.id if flight else None,
+        "hotel_id": hotel.id if hotel else None,
+        "package_deal_id": service.id if item["booking_type"] == "PackageDeal" else None,
+        "is_confirmed": True,
+    }
+
+
+def held_item(hold, items):
+    """Index of the first cart item the session's hold is for, or None."""
+    if not hold:
+        return None
+    return next((index for index, item in enumerate(items)
+                 if item["booking_type"] == hold["booking_type"] and item["item_id"] == hold["item_id"]), None)
+
+
+def checkout(user, items, ctx=None, hold=None):
+    """
+    Reserve inventory for every item and insert their bookings; returns the new
+    booking ids. An item the session `hold` covers is booked out of the hold
+    instead of being reserved again. Raises CheckoutError (or
+    InsufficientInventory) without having committed anything; the caller
+    commits on success and rolls back otherwise.
+    """
+    loaded = load_items(items)
+    if ctx is not None:
+        ctx.phase("reserve")
+    booked_at = datetime.utcnow()
+    # One multi-row INSERT that hands back the Booking objects the ledger rows point at
+    bookings = db.session.scalars(
+        insert(Booking).returning(Booking, sort_by_parameter_order=True),
+        [_booking_row(user, item, booked_at) for item in loaded],
+    ).all()
+    requests = [(_units(item), item["num_people"], booking) for item, booking in zip(loaded, bookings)]
+    held = held_item(hold, loaded)
+    if held is not None:
+        item = loaded[held]
+        try:
+            if stay(item):
+                # The hold is on the whole hotel; give it back and take the stay's nights
+                inventory.cancel_hold(hold["token"])
+            else:
+                inventory.convert_hold(hold["token"], item["booking_type"], item["item_id"], item["num_people"])
+                del requests[held]
+        except inventory.HoldNotFound:
+            logger.info("Hold %s expired before checkout; reserving again", hold["token"])
+        except inventory.InsufficientInventory as e:
+            raise CheckoutError(f"Not enough availability left on {e.model.__name__} {e.item_id}.") from e
+        inventory.attribute(bookings[held])
+    try:
+        inventory.reserve_all(requests, "checkout")
+    except inventory.InsufficientInventory as e:
+        raise CheckoutError(f"Not enough availability left on {e.model.__name__} {e.item_id}.") from e
+
+    if ctx is not None:
+        ctx.phase("commit")
+    stays = []
+    for booking, item in zip(bookings, loaded):
+        nights = stay(item)
+        if nights:
+            stays.append({"booking_id": booking.id, "hotel_id": item["item_id"],
+                          "check_in": nights[0], "check_out": nights[1]})
+    if stays:
+        db.session.execute(insert(HotelStay), stays)
+    return [booking.id for booking in bookings]
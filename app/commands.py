@@ -0,0 +1,264 @@
+import os
+import click
+from app import db
+
+
+def register_commands(app):
+    """Attach the maintenance CLI commands to the app."""
+
+    # Flask-Migrate pulls in Alembic, so only wire it up for `flask ...` invocations
+    if click.get_current_context(silent=True) is not None:
+        from flask_migrate import Migrate
+
+        Migrate(app, db)
+
+    @app.cli.command("profile-token")
+    def profile_token():
+        """Print a signed token that forces profiling of a request."""
+        from app.sampling_profiler import make_profile_token
+
+        click.echo(f"{app.config['PROFILER_HEADER']}: {make_profile_token(app)}")
+
+    @app.cli.command("analyze-logs")
+    @click.argument("paths", nargs=-1)
+    @click.option("--json", "as_json", is_flag=True, help="Print the report as JSON.")
+    @click.option("--top", default=20, help="Number of error signatures to show.")
+    def analyze_logs(paths, as_json, top):
+        """Summarize latency and error hot spots from the rotating app logs."""
+        from app.log_analyzer import run
+
+        default = os.path.dirname(app.config["LOG_FILE"]) if app.config["LOG_FILE"] else "logs"
+        click.echo(run(paths or [default], as_json, top))
+
+    @app.cli.command("generate-data")
+    @click.option("--output", default=lambda: os.path.join(app.instance_path, "bench.db"), help="Fresh SQLite file to write.")
+    @click.option("--scale", default=1.0, help="Multiplier for every row count below.")
+    @click.option("--users", default=100_000)
+    @click.option("--flights", default=200_000)
+    @click.option("--hotels", default=50_000)
+    @click.option("--packages", default=50_000)
+    @click.option("--bookings", default=1_000_000)
+    @click.option("--seed", default=42, help="Same seed, same dataset.")
+    def generate_data(output, scale, users, flights, hotels, packages, bookings, seed):
+        """Generate a large synthetic dataset for performance testing."""
+        from app.datagen import generate
+
+        counts = [max(1, int(n * scale)) for n in (users, flights, hotels, packages, bookings)]
+        try:
+            generate(output, *counts, seed=seed, echo=click.echo)
+        except FileExistsError as e:
+            raise click.ClickException(str(e))
+        click.echo(f"Dataset written to {output}")
+
+    @app.cli.command("sweep-holds")
+    @click.option("--batch-size", default=500, help="Holds released per transaction.")
+    def sweep_holds(batch_size):
+        """Release expired seat holds back into availability."""
+        from app.inventory import sweep_expired_holds
+
+        click.echo(f"Released {sweep_expired_holds(batch_size=batch_size)} expired holds.")
+
+    @app.cli.command("purge-idempotency-keys")
+    def purge_idempotency_keys():
+        """Delete idempotency keys past their TTL."""
+        from app.idempotency import purge_expired
+
+        click.echo(f"Purged {purge_expired()} expired idempotency keys.")
+
+    @app.cli.command("drain-booking-queue")
+    def drain_booking_queue():
+        """Commit bookings left in the write-behind queue and check the counters."""
+        from app.write_behind import QueueLocked, WriteBehindPipeline
+
+        try:
+            pipeline = WriteBehindPipeline(app)
+        except QueueLocked as e:
+            raise click.ClickException(f"{e}; the server running write-behind drains it itself.")
+        try:
+            recovered = pipeline.recover()
+            committed = pipeline.drain()
+        finally:
+            pipeline.queue.close()
+        click.echo(f"Recovered {recovered} queued bookings, committed {committed}.")
+        if pipeline.stats["dead_lettered"]:
+            click.echo(f"Moved {pipeline.stats['dead_lettered']} failing bookings to {pipeline.dead_letter_path}.")
+        from app.models import Flight, Hotel
+
+        for model in (Flight, Hotel):
+            for service in model.query.filter(model.availability < 0):
+                click.echo(f"Oversold: {model.__name__} {service.id} availability {service.availability}")
+
+    @app.cli.command("reconcile-availability")
+    @click.option("--fix", is_flag=True, help="Set drifted counters to the expected value.")
+    @click.option("--seed", is_flag=True,
+                  help="Record a capacity for rows without one from their current counters (trusts them).")
+    @click.option("--show", default=20, help="Number of discrepancies to list.")
+    def reconcile_availability(fix, seed, show):
+        """Compare availability with capacity minus confirmed bookings and live holds."""
+        from time import perf_counter
+        from app.reconciliation import reconcile
+
+        started = perf_counter()
+        discrepancies, created, fixed, unchecked = reconcile(fix=fix, seed=seed)
+        if created:
+            click.echo(f"Seeded capacity for {created} rows from their current counters; "
+                       "drift they already had can no longer be detected.")
+        if unchecked:
+            click.echo(f"{unchecked} rows have no recorded capacity and were not checked; "
+                       "verify their counters, then run with --seed.")
+        for table, item_id, availability, expected in discrepancies[:show]:
+            click.echo(f"{table} {item_id}: availability {availability}, expected {expected}")
+        click.echo(
+            f"{len(discrepancies)} discrepancies, {fixed} fixed in {perf_counter() - started:.2f}s."
+        )
+
+    @app.cli.command("add-fare-classes")
+    @click.argument("flight_id", type=int)
+    @click.option("--layout", default="ABC-DEF", help="Seat letters of one row, '-' for aisles.")
+    @click.option("--cabin", "cabins", multiple=True, required=True,
+                  help="CODE:ROWS[:PRICE] from the front, e.g. --cabin J:4:15000 --cabin Y:26.")
+    def add_fare_classes(flight_id, layout, cabins):
+        """Split a flight into fare classes with a bitset seat map."""
+        from app.models import Flight, SeatMap
+        from app.seatmap import CABINS, setup_flight
+
+        flight = db.session.get(Flight, flight_id)
+        if flight is None:
+            raise click.ClickException(f"No flight {flight_id}")
+        if db.session.get(SeatMap, flight_id) is not None:
+            raise click.ClickException(f"Flight {flight_id} already has fare classes")
+        names = dict(CABINS)
+        parsed = []
+        for cabin in cabins:
+            code, _, rest = cabin.partition(":")
+            rows, _, price = rest.partition(":")
+            if code not in names or not rows.isdigit():
+                raise click.ClickException(f"Bad cabin {cabin!r}; codes are {', '.join(names)}")
+            parsed.append((code, names[code], int(rows), float(price) if price else flight.price))
+        for fare in setup_flight(flight, layout, parsed):
+            click.echo(f"{fare.name}: rows {fare.first_row}-{fare.last_row}, {fare.availability} seats at {fare.price}")
+        db.session.commit()
+
+    @app.cli.command("snapshot-inventory")
+    @click.option("--every", default=100, help="Snapshot counters with at least this many ledger rows since the last one.")
+    @click.option("--all", "everything", is_flag=True, help="Snapshot every counter (run once to seed).")
+    def snapshot_inventory(every, everything):
+        """Snapshot inventory counters so point-in-time reads replay a short ledger tail."""
+        from app.ledger import take_snapshots
+
+        click.echo(f"Wrote {take_snapshots(every=every, everything=everything)} snapshots.")
+
+    @app.cli.command("inventory-at")
+    @click.argument("table", type=click.Choice(["flight", "hotel", "fare_class"]))
+    @click.argument("item_id", type=int)
+    @click.option("--at", "at", type=click.DateTime(), default=None, help="UTC time; default now.")
+    @click.option("--night", type=click.DateTime(formats=["%Y-%m-%d"]), default=None, help="Night of a split hotel.")
+    @click.option("--history", "rows", default=10, help="Latest ledger rows to list.")
+    def inventory_at(table, item_id, at, night, rows):
+        """Rebuild a counter from its latest snapshot and the ledger tail."""
+        from app.ledger import COUNTERS, availability_at, history
+
+        model = next(m for m in COUNTERS if m.__tablename__ == table)
+        value = availability_at(model, item_id, at=at, night=night.date() if night else None)
+        if value is None:
+            raise click.ClickException("No snapshot that early; run `flask snapshot-inventory --all` first.")
+        click.echo(f"{table} {item_id} availability at {at or 'now'}: {value}")
+        current = db.session.get(model, item_id)
+        if at is None and night is None and current is not None and current.availability != value:
+            click.echo(f"Counter reads {current.availability}: changed outside the ledger")
+        for entry in history(model, item_id, rows):
+            nights = f" nights {entry.first_night}..{entry.last_night}" if entry.first_night else ""
+            click.echo(f"  {entry.created_at} {entry.delta:+d} {entry.reason} booking={entry.booking_id}{nights}")
+
+    @app.cli.command("match-alerts")
+    @click.option("--batch-size", default=500, help="Queued changes matched per transaction.")
+    def match_alerts(batch_size):
+        """Match changed flights and hotels against price alerts and queue notifications."""
+        from app.alerts import match_pending
+
+        changes, queued = match_pending(batch_size=batch_size)
+        click.echo(f"Matched {changes} changes, queued {queued} notifications.")
+
+    @app.cli.command("promote-waitlist")
+    @click.option("--scan", default=None, type=int, help="Waiting entries read per item (default WAITLIST_PROMOTE_SCAN).")
+    def promote_waitlist(scan):
+        """Book waitlisted parties on every item that has room for them again."""
+        from app.waitlist import promote_all
+
+        click.echo(f"Promoted {promote_all(scan)} waitlisted parties.")
+
+    @app.cli.command("bulk-update")
+    @click.argument("table", type=click.Choice(["flight", "hotel"]))
+    @click.option("--destination", help="Flight destination or hotel location (case-insensitive).")
+    @click.option("--departure-city", help="Flights only.")
+    @click.option("--name", help="Airline or hotel name prefix, e.g. a hotel chain.")
+    @click.option("--from", "date_from", type=click.DateTime(formats=["%Y-%m-%d"]), help="Departing (or open) on or after.")
+    @click.option("--to", "date_to", type=click.DateTime(formats=["%Y-%m-%d"]), help="Departing (or open) on or before.")
+    @click.option("--raise-price", type=float, help="Percent; negative to cut.")
+    @click.option("--add-price", type=float, help="Amount added to every price.")
+    @click.option("--set-price", type=float)
+    @click.option("--set-availability", type=int)
+    @click.option("--dry-run", is_flag=True, help="Only count the rows that would change.")
+    def bulk_update(table, destination, departure_city, name, date_from, date_to,
+                    raise_price, add_price, set_price, set_availability, dry_run):
+        """Change prices or availability of every matching flight or hotel in one statement."""
+        from app import bulk
+
+        chosen = [(op, value) for op, value in zip(bulk.OPERATIONS, (raise_price, add_price, set_price, set_availability))
+                  if value is not None]
+        if len(chosen) != 1:
+            raise click.ClickException("Give exactly one of --raise-price, --add-price, --set-price, --set-availability.")
+        operation, value = chosen[0]
+        model = bulk.MODELS[table]
+        try:
+            where = bulk.conditions(model, destination, departure_city, name, date_from, date_to)
+            result = bulk.apply(model, operation, value, where, dry_run=dry_run)
+        except bulk.BulkUpdateError as e:
+            db.session.rollback()
+            raise click.ClickException(str(e))
+        if not dry_run:
+            db.session.commit()
+            bulk.forget_counters(model)
+        click.echo(bulk.describe(model, operation, result, dry_run))
+
+    @app.cli.command("archive-bookings")
+    @click.option("--days", type=int, default=None, help="Retention window; default BOOKING_RETENTION_DAYS.")
+    @click.option("--batch-size", default=1000, help="Bookings moved per transaction.")
+    @click.option("--max-batches", type=int, default=None, help="Stop after this many batches; rerun to resume.")
+    @click.option("--dry-run", is_flag=True, help="Only count the bookings due for archival.")
+    def archive_bookings(days, batch_size, max_batches, dry_run):
+        """Move canceled and long-past bookings into booking_archive."""
+        from app.archive import archive, count_candidates, cutoff
+
+        before = cutoff(days)
+        if dry_run:
+            click.echo(f"{count_candidates(before)} bookings made before {before:%Y-%m-%d} are due for archival.")
+            return
+        click.echo(f"Archived {archive(before, batch_size=batch_size, max_batches=max_batches)} bookings.")
+
+    @app.cli.command("retire-inventory")
+    @click.option("--batch-size", default=1000, help="Rows retired per transaction.")
+    @click.option("--dry-run", is_flag=True, help="Only count what would be retired.")
+    def retire_inventory(batch_size, dry_run):
+        """Take departed flights and hotels past checkout off sale."""
+        from app.retirement import count_expired, retire
+
+        counts = count_expired() if dry_run else retire(batch_size=batch_size)
+        verb = "Would retire" if dry_run else "Retired"
+        click.echo(f"{verb} {counts['flight']} flights and {counts['hotel']} hotels.")
+
+    @app.cli.command("materialize-schedules")
+    @click.option("--days", default=None, type=int, help="Sellable horizon in days (default SCHEDULE_HORIZON_DAYS).")
+    def materialize_schedules(days):
+        """Create the Flight rows of every scheduled departure within the horizon."""
+        from app.schedules import materialize_horizon
+
+        click.echo(f"Materialized {materialize_horizon(days)} scheduled departures.")
+
+    @app.cli.command("init-db")
+    def init_db():
+        """Create any missing tables."""
+        import app.models  # noqa: F401  (register every model on the metadata)
+
+        db.create_all()
+        click.echo("Database tables created.")
@@ -1,26 +1,44 @@
-from contextlib import contextmanager
+from time import perf_counter
 import logging
+from app import metrics
 
 logger = logging.getLogger(__name__)
 
 
-@contextmanager
-def BookingContext(booking_type):
+class BookingContext:
     """
     context manager to handle booking process.
-    Ensures that resources are properly managed during the booking.
+    Times each phase of the operation (validation, query, pricing, commit, render)
+    and records the timings in app.metrics when the block exits.
     """
-    # Initial setup for the booking session
-    logger.info(f"Starting {booking_type} booking session...")
-    try:
-        yield  # Yield control back to the code within the 'with' block
-        # If everything is successful, finalize the booking
-        logger.info(f"{booking_type} booking completed successfully.")
-    except Exception as e:
-        # Handle any exceptions that occur during booking
-        logger.error(f"Error during {booking_type} booking: {e}")
-        # You could rollback or clean up if necessary
-        raise
-    finally:
-        # Clean up logic goes here (e.g., unlocking resources, closing connections)
-        logger.info(f"Cleaning up {booking_type} booking session.")
+    __slots__ = ("operation", "outcome", "_phase", "_started", "_phases")
+
+    def __init__(self, operation, outcome="success", phase="validation"):
+        self.operation = operation
+        # Views set this to "success" once the work is done, "error" is set on exceptions
+        self.outcome = outcome
+        self._phase = phase
+        self._phases = []
+
+    def __enter__(self):
+        logger.debug("Starting %s booking session...", self.operation)
+        self._started = perf_counter()
+        return self
+
+    def phase(self, name):
+        """Close the current phase and start timing the next one."""
+        now = perf_counter()
+        self._phases.append((self._phase, now - self._started))
+        self._phase = name
+        self._started = now
+
+    def __exit__(self, exc_type, exc, tb):
+        self.phase(None)
+        if exc_type is not None:
+            # Handle any exceptions that occur during booking
+            self.outcome = "error"
+            logger.error("Error during %s booking: %s", self.operation, exc)
+        else:
+            logger.debug("%s booking finished: %s", self.operation, self.outcome)
+        metrics.observe_phases(self.operation, self.outcome, self._phases)
+        return False  # Never swallow the exception
@@ -0,0 +1,303 @@
+"""
+Deterministic synthetic dataset generator for performance work.
+
+    flask generate-data --output instance/bench.db --scale 1.0 --seed 42
+
+Writes users, flights, hotels, package deals and bookings into a fresh SQLite
+file with batched Core inserts inside one transaction.
+City, route and date popularity follow Zipf-like distributions, so a few
+destinations and near-term dates dominate the same way real traffic does.
+"""
+import os
+import random
+import time
+from array import array
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, event, insert
+from werkzeug.security import generate_password_hash
+from app import db
+from app.models import Booking, Flight, Hotel, InventoryCapacity, PackageDeal, User
+
+CITIES = [
+    "Mumbai", "Delhi", "Goa", "Bengaluru", "Jaipur", "Chennai", "Kolkata", "Hyderabad",
+    "Pune", "Kochi", "Udaipur", "Varanasi", "Amritsar", "Leh", "Shimla", "Manali",
+    "Rishikesh", "Agra", "Mysuru", "Ahmedabad", "Srinagar", "Port Blair", "Darjeeling",
+    "Dubai", "Singapore", "Bangkok", "London", "Paris", "New York", "Tokyo", "Bali",
+    "Kathmandu", "Colombo", "Male", "Sydney", "Istanbul", "Rome", "Zurich", "Doha", "Hong Kong",
+]
+AIRLINES = [("Air India", "AI"), ("IndiGo", "6E"), ("Vistara", "UK"), ("SpiceJet", "SG"),
+            ("Akasa Air", "QP"), ("Emirates", "EK"), ("Singapore Airlines", "SQ"), ("Qatar Airways", "QR")]
+HOTEL_BRANDS = ["Taj", "Oberoi", "ITC", "Leela", "Hyatt", "Marriott", "Radisson", "Lemon Tree",
+                "Ginger", "Novotel", "Ibis", "Hilton", "Trident", "Fortune", "Sarovar"]
+FIRST_NAMES = ["Aarav", "Vivaan", "Aditya", "Diya", "Ananya", "Isha", "Rohan", "Kabir", "Meera",
+               "Sara", "Arjun", "Priya", "Neha", "Rahul", "Vikram", "Zoya", "Kiran", "Tara"]
+LAST_NAMES = ["Sharma", "Patel", "Iyer", "Reddy", "Singh", "Gupta", "Nair", "Das", "Mehta",
+              "Khan", "Joshi", "Kapoor", "Rao", "Bose", "Menon", "Chopra"]
+
+BATCH_SIZE = 10_000
+
+DEFAULT_START = datetime(2025, 1, 1)
+
+
+def zipf_weights(n, exponent=1.1):
+    """Cumulative weights where item i is (i + 1) ** -exponent as popular as the first."""
+    total = 0.0
+    cumulative = []
+    for i in range(n):
+        total += 1.0 / (i + 1) ** exponent
+        cumulative.append(total)
+    return cumulative
+
+
+class DatasetGenerator:
+    def __init__(self, seed=42, start=None, horizon_days=365):
+        self.rng = random.Random(seed)
+        self.start = start or DEFAULT_START
+        self.horizon_days = horizon_days
+        self.city_weights = zipf_weights(len(CITIES))
+        # Near-term departures sell more than far-future ones
+        self.day_weights = zipf_weights(horizon_days, exponent=0.6)
+
+    def _city(self):
+        return self.rng.choices(range(len(CITIES)), cum_weights=self.city_weights)[0]
+
+    def _day(self):
+        return self.rng.choices(range(self.horizon_days), cum_weights=self.day_weights)[0]
+
+    def users(self, count):
+        # Hashing is deliberately slow, so every user shares one hash of "password"
+        password_hash = generate_password_hash("password")
+        for user_id in range(1, count + 1):
+            yield {
+                "id": user_id,
+                "name": f"{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}",
+                "email": f"user{user_id}@example.com",
+                "password_hash": password_hash,
+            }
+
+    def plan_flights(self, count):
+        """Draw the flight attributes bookings depend on into compact arrays."""
+        self.flight_origin = array("H")
+        self.flight_destination = array("H")
+        self.flight_day = array("H")
+        self.flight_price = array("f")
+        self.flight_capacity = array("H")
+        for _ in range(count):
+            origin = self._city()
+            destination = self._city()
+            while destination == origin:
+                destination = self._city()
+            self.flight_origin.append(origin)
+            self.flight_destination.append(destination)
+            self.flight_day.append(self._day())
+            self.flight_price.append(round(self.rng.uniform(2500, 45000), 2))
+            self.flight_capacity.append(self.rng.choice((72, 120, 180, 220, 300)))
+        self.flight_booked = array("I", bytes(4 * count))
+
+    def plan_hotels(self, count):
+        self.hotel_city = array("H")
+        self.hotel_day = array("H")
+        self.hotel_nights = array("H")
+        self.hotel_price = array("f")
+        self.hotel_capacity = array("H")
+        self.hotels_by_city = [[] for _ in CITIES]
+        for index in range(count):
+            city = self._city()
+            self.hotel_city.append(city)
+            self.hotel_day.append(self.rng.randrange(0, max(1, self.horizon_days // 2)))
+            self.hotel_nights.append(self.rng.randrange(60, self.horizon_days))
+            self.hotel_price.append(round(self.rng.uniform(1200, 30000), 2))
+            self.hotel_capacity.append(self.rng.choice((20, 40, 80, 150, 300)))
+            self.hotels_by_city[city].append(index)
+        self.hotel_booked = array("I", bytes(4 * count))
+
+    def plan_packages(self, count):
+        """Pair flights with a hotel in their destination city."""
+        self.package_flight = array("I")
+        self.package_hotel = array("I")
+        attempts = 0
+        while len(self.package_flight) < count and attempts < count * 5:
+            attempts += 1
+            flight = self.rng.randrange(len(self.flight_day))
+            hotels = self.hotels_by_city[self.flight_destination[flight]]
+            if hotels:
+                self.package_flight.append(flight)
+                self.package_hotel.append(self.rng.choice(hotels))
+
+    def flights(self):
+        for index in range(len(self.flight_day)):
+            airline, code = AIRLINES[index % len(AIRLINES)]
+            departure = self.start + timedelta(days=self.flight_day[index], minutes=(index * 37) % 1440)
+            yield {
+                "id": index + 1,
+                "airline": airline,
+                "flight_number": f"{code}{100 + index % 9900}",
+                "departure_city": CITIES[self.flight_origin[index]],
+                "destination": CITIES[self.flight_destination[index]],
+                "departure_time": departure,
+                "arrival_time": departure + timedelta(minutes=60 + (index * 13) % 600),
+                "price": float(self.flight_price[index]),
+                "availability": self.flight_capacity[index] - self.flight_booked[index],
+            }
+
+    def hotels(self):
+        for index in range(len(self.hotel_day)):
+            checkin = self.start + timedelta(days=self.hotel_day[index], hours=14)
+            city = CITIES[self.hotel_city[index]]
+            yield {
+                "id": index + 1,
+                "hotel_name": f"{HOTEL_BRANDS[index % len(HOTEL_BRANDS)]} {city} {index + 1}",
+                "hotel_location": city,
+                "hotel_rating": 1 + (index * 7) % 5,
+                "checkin_date": checkin,
+                "checkout_date": checkin + timedelta(days=self.hotel_nights[index]),
+                "price": float(self.hotel_price[index]),
+                "availability": self.hotel_capacity[index] - self.hotel_booked[index],
+            }
+
+    def capacities(self):
+        for index, capacity in enumerate(self.flight_capacity):
+            yield {"service_table": "flight", "item_id": index + 1, "capacity": capacity}
+        for index, capacity in enumerate(self.hotel_capacity):
+            yield {"service_table": "hotel", "item_id": index + 1, "capacity": capacity}
+
+    def _package_price(self, index):
+        return self.flight_price[self.package_flight[index]] * 1.2 + self.hotel_price[self.package_hotel[index]] * 1.1
+
+    def package_deals(self):
+        for index in range(len(self.package_flight)):
+            start = (self.start + timedelta(days=self.flight_day[self.package_flight[index]])).date()
+            yield {
+                "id": index + 1,
+                "flight_id": self.package_flight[index] + 1,
+                "hotel_id": self.package_hotel[index] + 1,
+                "start_date": start,
+                "end_date": start + timedelta(days=2 + index % 9),
+                "price": round(self._package_price(index), 2),
+            }
+
+    def bookings(self, count, user_count):
+        """Bookings against the planned inventory; never oversells."""
+        user_weights = zipf_weights(user_count, exponent=0.8)
+        kinds = ("Flight", "Hotel", "PackageDeal")
+        flights, hotels, packages = len(self.flight_day), len(self.hotel_day), len(self.package_flight)
+        booking_id = 0
+        for _ in range(count):
+            kind = self.rng.choices(kinds, weights=(55, 30, 15 if packages else 0))[0]
+            num_people = self.rng.choices((1, 2, 3, 4, 6), weights=(35, 40, 10, 10, 5))[0]
+            user_id = self.rng.choices(range(1, user_count + 1), cum_weights=user_weights)[0]
+            confirmed = self.rng.random() < 0.9
+
+            # Popular destinations get booked more: take the first of a few draws that fits
+            for _ in range(3):
+                if kind == "Flight":
+                    flight, hotel, package = self.rng.randrange(flights), None, None
+                elif kind == "Hotel":
+                    flight, hotel, package = None, self.rng.randrange(hotels), None
+                else:
+                    package = self.rng.randrange(packages)
+                    flight, hotel = self.package_flight[package], self.package_hotel[package]
+                fits = (
+                    (flight is None or self.flight_booked[flight] + num_people <= self.flight_capacity[flight])
+                    and (hotel is None or self.hotel_booked[hotel] + num_people <= self.hotel_capacity[hotel])
+                )
+                if fits:
+                    break
+            else:
+                continue
+
+            if confirmed:
+                if flight is not None:
+                    self.flight_booked[flight] += num_people
+                if hotel is not None:
+                    self.hotel_booked[hotel] += num_people
+
+            if kind == "Flight":
+                unit_price = self.flight_price[flight] * 1.2
+                destination, day = CITIES[self.flight_destination[flight]], self.flight_day[flight]
+            elif kind == "Hotel":
+                unit_price = self.hotel_price[hotel] * 1.1
+                destination, day = CITIES[self.hotel_city[hotel]], self.hotel_day[hotel]
+            else:
+                unit_price = self._package_price(package)
+                destination, day = CITIES[self.flight_destination[flight]], self.flight_day[flight]
+
+            booking_id += 1
+            airline_code = AIRLINES[flight % len(AIRLINES)][1] if flight is not None else None
+            yield {
+                "id": booking_id,
+                "name": f"Traveller {user_id}",
+                "email": f"user{user_id}@example.com",
+                "destination": destination,
+                "booking_date": self.start + timedelta(days=max(0, day - self.rng.randrange(0, 60))),
+                "num_people": num_people,
+                "user_id": user_id,
+                "flight_number": f"{airline_code}{100 + flight % 9900}" if flight is not None else None,
+                "total_price": int(unit_price * num_people),
+                "service_type": kind,
+                "flight_id": flight + 1 if flight is not None else None,
+                "hotel_id": hotel + 1 if hotel is not None else None,
+                "package_deal_id": package + 1 if package is not None else None,
+                "is_confirmed": confirmed,
+            }
+
+
+def _bulk_insert(conn, table, rows):
+    """
+    Insert rows in batches of BATCH_SIZE; returns the row count.
+    One insert() with a list of parameter sets goes through the driver's
+    executemany, so the statement is compiled once rather than per batch.
+    """
+    statement = insert(table)
+    batch = []
+    total = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            conn.execute(statement, batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        conn.execute(statement, batch)
+        total += len(batch)
+    return total
+
+
+def _fast_sqlite_pragmas(dbapi_connection, connection_record):
+    # Throwaway benchmark file: trade crash safety for load speed
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=OFF")
+    cursor.execute("PRAGMA synchronous=OFF")
+    cursor.execute("PRAGMA cache_size=-200000")
+    cursor.close()
+
+
+def generate(output, users, flights, hotels, packages, bookings, seed=42, echo=print):
+    """Write a fresh SQLite database at `output`; returns {table: rows}."""
+    if os.path.exists(output):
+        raise FileExistsError(f"{output} already exists; generate into a fresh file")
+    engine = create_engine(f"sqlite:///{output}")
+    event.listen(engine, "connect", _fast_sqlite_pragmas)
+    db.metadata.create_all(engine)
+
+    generator = DatasetGenerator(seed=seed)
+    generator.plan_flights(flights)
+    generator.plan_hotels(hotels)
+    generator.plan_packages(packages)
+
+    counts = {}
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        # Bookings first: they decide how much availability the inventory rows keep
+        for table, rows in (
+            (User.__table__, generator.users(users)),
+            (Booking.__table__, generator.bookings(bookings, users)),
+            (Flight.__table__, generator.flights()),
+            (Hotel.__table__, generator.hotels()),
+            (PackageDeal.__table__, generator.package_deals()),
+            (InventoryCapacity.__table__, generator.capacities()),
+        ):
+            counts[table.name] = _bulk_insert(conn, table, rows)
+            echo(f"{table.name}: {counts[table.name]} rows ({time.perf_counter() - started:.1f}s)")
+    engine.dispose()
+    return counts
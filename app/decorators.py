@@ -1,5 +1,6 @@
 from functools import wraps
 from flask import session, flash, redirect, url_for
+from app.routing import use_read_replica
 
 
 def login_required(func):
@@ -11,3 +12,20 @@ def login_required(func):
             return redirect(url_for('routes.login'))
         return func(*args, **kwargs)
     return wrapper
+
+
+def read_only(func):
+    """Decorator to send the view's queries to the read-only engine."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        use_read_replica()
+        return func(*args, **kwargs)
+    return wrapper
+
+
+def query_budget(limit):
+    """Decorator to cap how many SQL statements the view may run (enforced in strict mode)."""
+    def decorator(func):
+        func.query_budget = limit
+        return func
+    return decorator
@@ -0,0 +1,216 @@
+"""
+Idempotency keys for write endpoints.
+
+Clients send an Idempotency-Key header (forms get a hidden idempotency_key
+field). The first request with a key does the work and stores a snapshot of
+its response; retries get the snapshot back without touching inventory. Hot
+keys are answered from an in-process LRU, the rest by primary key lookup.
+While the first request runs, the key is leased for IDEMPOTENCY_LOCK_SECONDS
+and retries get 409; if its worker dies, a retry takes the key over once the
+lease runs out. Stored responses are kept for IDEMPOTENCY_TTL_SECONDS.
+"""
+import hashlib
+import json
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import current_app, flash, jsonify, make_response, redirect, request, session
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+HEADER = "Idempotency-Key"
+FORM_FIELD = "idempotency_key"
+MAX_BODY_BYTES = 64 * 1024
+
+
+class LRUCache:
+    """Thread-safe bounded mapping of key -> (expires_at, snapshot)."""
+
+    def __init__(self, size):
+        self.size = size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= datetime.utcnow():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, expires_at, snapshot):
+        with self._lock:
+            self._data[key] = (expires_at, snapshot)
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+
+_cache = LRUCache(1024)
+
+
+def new_key():
+    """Fresh key for a hidden form field."""
+    return uuid.uuid4().hex
+
+
+def _client_key():
+    return request.headers.get(HEADER) or request.form.get(FORM_FIELD)
+
+
+def _storage_key(client_key):
+    scope = f"{session.get('user_id')}|{request.endpoint}|{client_key}"
+    return hashlib.sha256(scope.encode()).hexdigest()
+
+
+def _snapshot(response, flashes):
+    snapshot = {"status": response.status_code, "flashes": flashes}
+    if response.location:
+        snapshot["location"] = response.location
+    elif response.content_length is None or response.content_length <= MAX_BODY_BYTES:
+        snapshot["mimetype"] = response.mimetype
+        snapshot["body"] = response.get_data(as_text=True)
+    return snapshot
+
+
+def _replay(snapshot):
+    for category, message in snapshot.get("flashes", []):
+        flash(message, category)
+    if "location" in snapshot:
+        response = redirect(snapshot["location"], code=snapshot["status"])
+    else:
+        response = make_response(snapshot.get("body", ""), snapshot["status"])
+        if snapshot.get("mimetype"):
+            response.mimetype = snapshot["mimetype"]
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _claim(key, request_line, expires_at):
+    """
+    Insert the in-progress marker, leased until `expires_at`. Returns None when
+    this request owns the key, otherwise the existing row.
+    """
+    try:
+        db.session.add(IdempotencyKey(key=key, request=request_line, expires_at=expires_at))
+        db.session.commit()
+        return None
+    except IntegrityError:
+        db.session.rollback()
+    # An expired row may be taken over, including the lease of a worker that died
+    # mid-request; the conditional UPDATE lets only one request win
+    taken = db.session.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.key == key, IdempotencyKey.expires_at <= datetime.utcnow())
+        .values(request=request_line, status_code=None, response=None, expires_at=expires_at)
+    )
+    db.session.commit()
+    if taken.rowcount == 1:
+        return None
+    return db.session.get(IdempotencyKey, key)
+
+
+def _conflict(message):
+    if request.is_json:
+        return jsonify(error=message), 409
+    flash(message, "warning")
+    return redirect(request.referrer or "/")
+
+
+def idempotent(func):
+    """Decorator to make a POST view safe to retry with the same idempotency key."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        client_key = _client_key() if request.method == "POST" else None
+        if not client_key:
+            return func(*args, **kwargs)
+
+        key = _storage_key(client_key)
+        snapshot = _cache.get(key)
+        if snapshot is not None:
+            return _replay(snapshot)
+
+        request_line = f"{request.method} {request.path}"[:255]
+        lease_until = datetime.utcnow() + timedelta(seconds=current_app.config["IDEMPOTENCY_LOCK_SECONDS"])
+        existing = _claim(key, request_line, lease_until)
+        if existing is not None:
+            if existing.request != request_line:
+                return _conflict("This idempotency key was already used for a different request.")
+            if existing.status_code is None:
+                return _conflict("This request is still being processed.")
+            snapshot = json.loads(existing.response)
+            _cache.put(key, existing.expires_at, snapshot)
+            return _replay(snapshot)
+
+        flashes_before = len(session.get("_flashes", []))
+        try:
+            response = make_response(func(*args, **kwargs))
+        except Exception:
+            db.session.rollback()
+            _release(key)
+            raise
+        if response.status_code >= 500:
+            _release(key)  # Let the client retry
+            return response
+
+        snapshot = _snapshot(response, [list(f) for f in session.get("_flashes", [])[flashes_before:]])
+        # Views commit their own work; anything an early return left pending must
+        # not be committed along with the key
+        db.session.rollback()
+        expires_at = datetime.utcnow() + timedelta(seconds=current_app.config["IDEMPOTENCY_TTL_SECONDS"])
+        db.session.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.key == key)
+            .values(status_code=snapshot["status"], response=json.dumps(snapshot), expires_at=expires_at)
+        )
+        db.session.commit()
+        _cache.put(key, expires_at, snapshot)
+        return response
+    return wrapper
+
+
+def _release(key):
+    try:
+        db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.warning("Could not release idempotency key: %s", e)
+
+
+def purge_expired(batch_size=1000):
+    """Delete expired keys in batches through the expires_at index; returns the count."""
+    purged = 0
+    while True:
+        keys = db.session.execute(
+            db.select(IdempotencyKey.key)
+            .where(IdempotencyKey.expires_at <= datetime.utcnow())
+            .limit(batch_size)
+        ).scalars().all()
+        if not keys:
+            return purged
+        db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.key.in_(keys)))
+        db.session.commit()
+        purged += len(keys)
+
+
+def init_app(app):
+    """Size the LRU and expose idempotency_key() to templates."""
+    global _cache
+    app.config.setdefault("IDEMPOTENCY_TTL_SECONDS", 24 * 3600)
+    # How long an unfinished request keeps its key; keep it above the request timeout
+    app.config.setdefault("IDEMPOTENCY_LOCK_SECONDS", 60)
+    app.config.setdefault("IDEMPOTENCY_CACHE_SIZE", 1024)
+    _cache = LRUCache(app.config["IDEMPOTENCY_CACHE_SIZE"])
+    app.jinja_env.globals["idempotency_key"] = new_key
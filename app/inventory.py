@@ -0,0 +1,460 @@
+"""
+Every change to Flight/Hotel availability goes through here.
+
+Units are taken with a conditional UPDATE (availability >= n), so two requests
+can never both get the last seat, and rows are always touched in the same
+(table, id) order so concurrent multi-row reservations cannot deadlock.
+Nothing here commits; the caller owns the transaction. The one exception is
+the expired-hold sweep, which commits its own batches from the CLI or at
+request teardown, never inside a view's transaction.
+
+Hotels start with one counter for their whole checkin_date..checkout_date
+span. The first booking of a partial stay splits that counter into one
+hotel_night row per night; from then on every reservation on the hotel is a
+conditional range UPDATE over its nights (the whole span for holds, packages
+and bookings without stay dates), and Hotel.availability is kept at the
+minimum over the nights so the single-counter queries stay correct.
+
+Every counter change also appends one inventory_ledger row in the same
+transaction (see app/ledger.py for snapshots and point-in-time reads).
+"""
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app, g
+from sqlalchemy import and_, delete, event, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app import alerts, db, pubsub
+from app.models import FareClass, Flight, Hotel, HotelNight, InventoryHold, InventoryLedger, PackageDeal
+from app.reconciliation import record_capacity
+
+logger = logging.getLogger(__name__)
+
+SERVICE_TYPES = ("Flight", "Hotel", "PackageDeal")
+
+_last_sweep = 0.0
+
+# session.info key for ledger rows still waiting for their booking
+LEDGER_PENDING = "inventory_ledger_pending"
+
+
+class InsufficientInventory(Exception):
+    """Raised when a flight or hotel has fewer units left than requested."""
+
+    def __init__(self, model, item_id, requested):
+        self.model = model
+        self.item_id = item_id
+        self.requested = requested
+        super().__init__(f"{model.__name__} {item_id} has fewer than {requested} units left")
+
+
+class HoldNotFound(Exception):
+    """Raised when a hold token is unknown, expired or already used."""
+
+
+def units_for(service_type, item_id):
+    """The (model, id) rows a booking of this item draws on, in lock order."""
+    if service_type == "Flight":
+        return [(Flight, item_id)]
+    if service_type == "Hotel":
+        return [(Hotel, item_id)]
+    if service_type == "PackageDeal":
+        package = db.session.get(PackageDeal, item_id)
+        if package is None:
+            return []
+        return sorted_units([(Flight, package.flight_id), (Hotel, package.hotel_id)])
+    raise ValueError(f"Unknown service type: {service_type}")
+
+
+def units_for_booking(booking):
+    """Rows an existing booking holds units of; packages use the booking's own ids."""
+    units = []
+    if booking.service_type in ("Flight", "PackageDeal") and booking.flight_id:
+        units.append((Flight, booking.flight_id))
+    if booking.service_type == "Flight" and booking.seat_assignment is not None:
+        units.append((FareClass, booking.seat_assignment.fare_class_id))
+    if booking.service_type == "Hotel" and booking.hotel_id and booking.stay is not None:
+        units.append(stay_unit(booking.hotel_id, booking.stay.check_in, booking.stay.check_out))
+    elif booking.service_type in ("Hotel", "PackageDeal") and booking.hotel_id:
+        units.append((Hotel, booking.hotel_id))
+    return sorted_units(units)
+
+
+def stay_unit(hotel_id, check_in, check_out):
+    """Rooms at a hotel for the nights [check_in, check_out) only."""
+    return (HotelNight, (hotel_id, check_in, check_out))
+
+
+def _lock_key(unit):
+    model, item_id = unit
+    if model is HotelNight:
+        return (Hotel.__tablename__, item_id[0])  # A stay locks with its hotel
+    return (model.__tablename__, item_id)
+
+
+def sorted_units(units):
+    return sorted(units, key=_lock_key)
+
+
+def reserve(units, quantity, reason="reserve", booking=None):
+    """Take `quantity` units from every row, or raise InsufficientInventory."""
+    for model, item_id in sorted_units(units):
+        if model is HotelNight:
+            _reserve_nights(*item_id, quantity, reason, booking)
+        elif model is Hotel and _night_count(item_id):
+            _reserve_nights(item_id, None, None, quantity, reason, booking)
+        else:
+            # Retired flights and hotels keep their counters but are not for sale
+            live = [model.is_active] if hasattr(model, "is_active") else []
+            result = db.session.execute(
+                update(model)
+                .where(model.id == item_id, model.availability >= quantity, *live)
+                .values(availability=model.availability - quantity)
+            )
+            if result.rowcount != 1:
+                raise InsufficientInventory(model, item_id, quantity)
+            record(model, item_id, -quantity, reason, booking)
+
+
+def reserve_all(requests, reason="reserve"):
+    """
+    Reserve several (units, quantity, booking) requests at once. Quantities for
+    the same row are summed first, so a flight booked alone and inside a package
+    is one conditional UPDATE, and rows are taken in lock order across all
+    requests. The ledger still gets one row per request and row.
+    """
+    totals = {}
+    for units, quantity, _ in requests:
+        for unit in units:
+            totals[unit] = totals.get(unit, 0) + quantity
+    for unit in sorted_units(totals):
+        reserve([unit], totals[unit], reason)
+        _share_out([(quantity, booking) for units, quantity, booking in requests if unit in units])
+
+
+def _share_out(shares):
+    """Replace the ledger row reserve() just wrote for a summed quantity with one row per (quantity, booking)."""
+    summed = db.session.info[LEDGER_PENDING].pop()
+    db.session.expunge(summed)
+    for quantity, booking in shares:
+        entry = InventoryLedger(
+            service_table=summed.service_table,
+            item_id=summed.item_id,
+            delta=-quantity,
+            reason=summed.reason,
+            first_night=summed.first_night,
+            last_night=summed.last_night,
+            created_at=summed.created_at,
+        )
+        if booking is not None:
+            entry.booking = booking
+        else:
+            db.session.info[LEDGER_PENDING].append(entry)
+        db.session.add(entry)
+
+
+def release(units, quantity, reason="release", booking=None):
+    """Give `quantity` units back to every row."""
+    for model, item_id in sorted_units(units):
+        shift(model, item_id, quantity, reason, booking)
+
+
+def shift(model, item_id, delta, reason="release", booking=None):
+    """Add `delta` to a row's availability unconditionally; stays and split hotels shift their nights."""
+    if model is HotelNight:
+        _shift_nights(*item_id, delta, reason, booking)
+    elif model is Hotel and _night_count(item_id):
+        _shift_nights(item_id, None, None, delta, reason, booking)
+    else:
+        db.session.execute(
+            update(model).where(model.id == item_id).values(availability=model.availability + delta)
+        )
+        record(model, item_id, delta, reason, booking)
+
+
+def adjust(units, delta, reason="adjust", booking=None):
+    """Reserve a positive delta, release a negative one."""
+    if delta > 0:
+        reserve(units, delta, reason, booking)
+    elif delta < 0:
+        release(units, -delta, reason, booking)
+
+
+def record(model, item_id, delta, reason, booking=None, check_in=None, check_out=None):
+    """
+    Append one ledger row in the caller's transaction and have the change
+    pushed to live subscribers once it commits; freed units are also queued
+    for the alert matcher. Rows without a booking wait
+    in the session until attribute() gives them one or the transaction ends.
+    """
+    if not delta:
+        return
+    entry = InventoryLedger(
+        service_table=model.__tablename__,
+        item_id=item_id,
+        delta=delta,
+        reason=reason,
+        first_night=check_in,
+        last_night=check_out - timedelta(days=1) if check_out else None,
+        created_at=datetime.utcnow(),
+    )
+    if booking is not None:
+        entry.booking = booking
+    else:
+        db.session.info.setdefault(LEDGER_PENDING, []).append(entry)
+    db.session.add(entry)
+    pubsub.mark_changed(model.__tablename__, item_id)
+    if delta > 0:
+        alerts.mark_changed(model.__tablename__, item_id)  # Freed units may satisfy a waiting alert
+
+
+def attribute(booking):
+    """Point this transaction's ledger rows that have no booking yet at `booking`."""
+    for entry in db.session.info.pop(LEDGER_PENDING, []):
+        entry.booking = booking
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _forget_pending(session):
+    session.info.pop(LEDGER_PENDING, None)
+
+
+def split_hotel_nights(hotel_id):
+    """
+    Replace a hotel's single counter with one row per night of its span, each
+    starting at the current availability. Returns the number of rows created.
+    """
+    if _night_count(hotel_id):
+        return 0
+    _lock_hotel(hotel_id)
+    hotel = db.session.execute(
+        select(Hotel.availability, Hotel.checkin_date, Hotel.checkout_date).where(Hotel.id == hotel_id)
+    ).first()
+    if hotel is None:
+        return 0
+    first, last = hotel.checkin_date.date(), hotel.checkout_date.date()
+    rows = [
+        {"hotel_id": hotel_id, "night": first + timedelta(days=offset), "availability": hotel.availability}
+        for offset in range((last - first).days)
+    ]
+    if not rows:
+        return 0
+    record_capacity(Hotel, hotel_id)  # Last moment the single counter describes every night
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(HotelNight), rows)
+    except IntegrityError:
+        return 0  # A concurrent booking split it first
+    return len(rows)
+
+
+def stay_availability(hotel_id, check_in, check_out):
+    """Rooms free on every night of [check_in, check_out); one index range scan."""
+    if not _night_count(hotel_id):
+        hotel = db.session.get(Hotel, hotel_id)
+        covered = hotel and hotel.checkin_date.date() <= check_in and hotel.checkout_date.date() >= check_out
+        return hotel.availability if covered else 0
+    lowest, nights = db.session.execute(
+        select(func.min(HotelNight.availability), func.count())
+        .where(_night_range(hotel_id, check_in, check_out))
+    ).one()
+    return lowest if nights == (check_out - check_in).days else 0
+
+
+def hotels_with_rooms(check_in, check_out, quantity):
+    """
+    Filter for Hotel queries: `quantity` rooms free on every night of the stay.
+    Split hotels are checked with an index probe over just the stay's nights,
+    the rest by their single counter.
+    """
+    if check_out <= check_in:
+        return Hotel.availability >= quantity
+    short_night = (
+        select(HotelNight.hotel_id)
+        .where(_night_range(Hotel.id, check_in, check_out), HotelNight.availability < quantity)
+        .exists()
+    )
+    split = select(HotelNight.hotel_id).where(HotelNight.hotel_id == Hotel.id).exists()
+    return and_(~short_night, or_(Hotel.availability >= quantity, split))
+
+
+def _night_range(hotel_id, check_in=None, check_out=None):
+    if check_in is None:
+        return HotelNight.hotel_id == hotel_id
+    return and_(HotelNight.hotel_id == hotel_id, HotelNight.night >= check_in, HotelNight.night < check_out)
+
+
+def _night_count(hotel_id):
+    return db.session.execute(
+        select(func.count()).select_from(HotelNight).where(HotelNight.hotel_id == hotel_id)
+    ).scalar()
+
+
+def _lock_hotel(hotel_id, live=False):
+    # No-op write so night updates always take the hotel row lock first
+    return db.session.execute(
+        update(Hotel).where(Hotel.id == hotel_id, *([Hotel.is_active] if live else []))
+        .values(availability=Hotel.availability)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def _refresh_hotel(hotel_id):
+    """Keep Hotel.availability at the fewest rooms left on any night."""
+    db.session.execute(
+        update(Hotel).where(Hotel.id == hotel_id)
+        .values(availability=select(func.min(HotelNight.availability))
+                .where(HotelNight.hotel_id == hotel_id).scalar_subquery())
+        .execution_options(synchronize_session="fetch")
+    )
+
+
+def _reserve_nights(hotel_id, check_in, check_out, quantity, reason, booking=None):
+    """Conditional range decrement: every night in the range must have `quantity` rooms left."""
+    if check_in is None:
+        nights = _night_count(hotel_id)
+    else:
+        split_hotel_nights(hotel_id)
+        nights = (check_out - check_in).days
+    if _lock_hotel(hotel_id, live=True) != 1:
+        raise InsufficientInventory(Hotel, hotel_id, quantity)
+    result = db.session.execute(
+        update(HotelNight)
+        .where(_night_range(hotel_id, check_in, check_out), HotelNight.availability >= quantity)
+        .values(availability=HotelNight.availability - quantity)
+    )
+    # Nights outside the hotel's span have no row, so they fail the count too
+    if nights <= 0 or result.rowcount != nights:
+        raise InsufficientInventory(Hotel, hotel_id, quantity)
+    _refresh_hotel(hotel_id)
+    record(Hotel, hotel_id, -quantity, reason, booking, check_in, check_out)
+
+
+def _shift_nights(hotel_id, check_in, check_out, delta, reason, booking=None):
+    _lock_hotel(hotel_id)
+    db.session.execute(
+        update(HotelNight).where(_night_range(hotel_id, check_in, check_out))
+        .values(availability=HotelNight.availability + delta)
+    )
+    _refresh_hotel(hotel_id)
+    record(Hotel, hotel_id, delta, reason, booking, check_in, check_out)
+
+
+def place_hold(service_type, item_id, quantity, user_id=None, ttl=None):
+    """Reserve units for `ttl` seconds (HOLD_TTL_SECONDS); returns the InventoryHold."""
+    units = units_for(service_type, item_id)
+    if not units:
+        raise HoldNotFound(f"{service_type} {item_id} does not exist")
+    reserve(units, quantity, "hold")
+    ttl = ttl if ttl is not None else current_app.config["HOLD_TTL_SECONDS"]
+    hold = InventoryHold(
+        token=uuid.uuid4().hex,
+        service_type=service_type,
+        item_id=item_id,
+        flight_id=next((i for m, i in units if m is Flight), None),
+        hotel_id=next((i for m, i in units if m is Hotel), None),
+        quantity=quantity,
+        user_id=user_id,
+        expires_at=datetime.utcnow() + timedelta(seconds=ttl),
+    )
+    db.session.add(hold)
+    return hold
+
+
+def convert_hold(token, service_type, item_id, quantity):
+    """
+    Consume a live hold for a booking of the same item. The held units become
+    the booking's; any difference in quantity is reserved or released.
+    """
+    hold = db.session.execute(
+        select(InventoryHold).where(InventoryHold.token == token, InventoryHold.expires_at > datetime.utcnow())
+    ).scalar_one_or_none()
+    if hold is None or hold.service_type != service_type or hold.item_id != item_id:
+        raise HoldNotFound(token)
+    adjust(_hold_units(hold), quantity - hold.quantity, "hold_converted")
+    # The delete is conditional too, so a concurrent sweep cannot release it twice
+    deleted = db.session.execute(delete(InventoryHold).where(InventoryHold.id == hold.id))
+    if deleted.rowcount != 1:
+        raise HoldNotFound(token)
+    return hold
+
+
+def cancel_hold(token):
+    """Give a hold's units back straight away; False if it was already gone."""
+    hold = db.session.execute(select(InventoryHold).where(InventoryHold.token == token)).scalar_one_or_none()
+    if hold is None:
+        return False
+    release(_hold_units(hold), hold.quantity, "hold_released")
+    db.session.delete(hold)
+    return True
+
+
+def _hold_units(hold):
+    units = []
+    if hold.flight_id:
+        units.append((Flight, hold.flight_id))
+    if hold.hotel_id:
+        units.append((Hotel, hold.hotel_id))
+    return units
+
+
+def sweep_expired_holds(batch_size=500, now=None):
+    """
+    Release expired holds oldest first, one committed batch at a time, through
+    the expires_at index. Returns the number of holds released.
+    """
+    now = now or datetime.utcnow()
+    released = 0
+    while True:
+        ids = db.session.execute(
+            select(InventoryHold.id)
+            .where(InventoryHold.expires_at <= now)
+            .order_by(InventoryHold.expires_at)
+            .limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return released
+
+        # One UPDATE per distinct row rather than per hold
+        for model, column in ((Flight, InventoryHold.flight_id), (Hotel, InventoryHold.hotel_id)):
+            totals = db.session.execute(
+                select(column, func.sum(InventoryHold.quantity))
+                .where(InventoryHold.id.in_(ids), column.isnot(None))
+                .group_by(column)
+                .order_by(column)
+            ).all()
+            for item_id, quantity in totals:
+                shift(model, item_id, quantity, "hold_expired")
+        db.session.execute(delete(InventoryHold).where(InventoryHold.id.in_(ids)))
+        db.session.commit()
+        released += len(ids)
+        logger.info("Released %d expired inventory holds", len(ids))
+
+
+def _maybe_sweep(exc=None):
+    """
+    Sweep from request traffic at most every HOLD_SWEEP_INTERVAL seconds. Runs
+    at request teardown, after the view has committed; whatever it left
+    uncommitted is rolled back first (the session is discarded next anyway),
+    so the sweep's commits never carry a request's half-done work.
+    """
+    global _last_sweep
+    interval = current_app.config["HOLD_SWEEP_INTERVAL"]
+    if not interval or time.monotonic() - _last_sweep < interval:
+        return
+    _last_sweep = time.monotonic()
+    db.session.rollback()
+    # A read-only view routed this request to the replica; the sweep writes
+    g.use_read_replica = False
+    try:
+        sweep_expired_holds(batch_size=current_app.config["HOLD_SWEEP_BATCH"])
+    except Exception as e:
+        db.session.rollback()
+        logger.warning("Expired hold sweep failed: %s", e)
+
+
+def init_app(app):
+    app.teardown_request(_maybe_sweep)
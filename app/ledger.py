@@ -0,0 +1,111 @@
+"""
+Inventory ledger snapshots and point-in-time availability.
+
+inventory.record() appends one inventory_ledger row per counter change, in
+the same transaction, so writes stay single-row appends. `flask
+snapshot-inventory`, run periodically, snapshots every counter whose ledger
+tail since its last snapshot has reached `every` rows, so reading a counter
+at any moment replays at most that many rows:
+
+    availability at T = latest snapshot taken by T + ledger rows after it, up to T
+
+Run it once with --all to seed a snapshot of every counter; counters with
+no snapshot have no known starting point. Split hotels are snapshotted per
+night. Ledger ids follow commit order because SQLite serializes writers.
+"""
+import logging
+from datetime import datetime
+from sqlalchemy import and_, func, insert, literal, null, or_, select
+from app import db
+from app.models import FareClass, Flight, Hotel, HotelNight, InventoryLedger, InventorySnapshot
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = (Flight, Hotel, FareClass)
+
+
+def _busy_items(table, every):
+    """Items with at least `every` ledger rows since their latest snapshot."""
+    latest = (
+        select(InventorySnapshot.item_id, func.max(InventorySnapshot.ledger_id).label("ledger_id"))
+        .where(InventorySnapshot.service_table == table)
+        .group_by(InventorySnapshot.item_id)
+        .subquery()
+    )
+    return (
+        select(InventoryLedger.item_id)
+        .outerjoin(latest, latest.c.item_id == InventoryLedger.item_id)
+        .where(InventoryLedger.service_table == table,
+               InventoryLedger.id > func.coalesce(latest.c.ledger_id, 0))
+        .group_by(InventoryLedger.item_id)
+        .having(func.count() >= every)
+    )
+
+
+def take_snapshots(every=100, everything=False, now=None):
+    """Snapshot busy counters (all of them with `everything`) set-based; returns rows written."""
+    now = now or datetime.utcnow()
+    last_id = select(func.coalesce(func.max(InventoryLedger.id), 0)).scalar_subquery()
+    columns = ["service_table", "item_id", "night", "availability", "ledger_id", "created_at"]
+    written = 0
+    for model in COUNTERS:
+        table = model.__tablename__
+        rows = select(literal(table), model.id, null(), model.availability, last_id, literal(now, db.DateTime))
+        if not everything:
+            rows = rows.where(model.id.in_(_busy_items(table, every)))
+        if model is Hotel:
+            # A split hotel's counter is derived from its nights, so snapshot those instead
+            rows = rows.where(~select(HotelNight.hotel_id).where(HotelNight.hotel_id == Hotel.id).exists())
+            nights = select(literal(table), HotelNight.hotel_id, HotelNight.night, HotelNight.availability,
+                            last_id, literal(now, db.DateTime))
+            if not everything:
+                nights = nights.where(HotelNight.hotel_id.in_(_busy_items(table, every)))
+            written += db.session.execute(insert(InventorySnapshot).from_select(columns, nights)).rowcount
+        written += db.session.execute(insert(InventorySnapshot).from_select(columns, rows)).rowcount
+    db.session.commit()
+    logger.info("Wrote %d inventory snapshots", written)
+    return written
+
+
+def availability_at(model, item_id, at=None, night=None):
+    """
+    A counter's value at `at` (default now), or None without a snapshot taken
+    by then. Pass `night` for one night of a split hotel.
+    """
+    table = model.__tablename__
+    at = at or datetime.utcnow()
+    snapshot = (
+        select(InventorySnapshot.availability, InventorySnapshot.ledger_id)
+        .where(InventorySnapshot.service_table == table, InventorySnapshot.item_id == item_id,
+               InventorySnapshot.created_at <= at)
+        .order_by(InventorySnapshot.ledger_id.desc())
+        .limit(1)
+    )
+    tail = select(func.coalesce(func.sum(InventoryLedger.delta), 0)).where(
+        InventoryLedger.service_table == table, InventoryLedger.item_id == item_id,
+        InventoryLedger.created_at <= at,
+    )
+    if night is None:
+        snapshot = snapshot.where(InventorySnapshot.night.is_(None))
+        tail = tail.where(InventoryLedger.first_night.is_(None))
+    else:
+        # Snapshots taken before the hotel was split apply to every night
+        snapshot = snapshot.where(or_(InventorySnapshot.night == night, InventorySnapshot.night.is_(None)))
+        tail = tail.where(or_(
+            InventoryLedger.first_night.is_(None),
+            and_(InventoryLedger.first_night <= night, InventoryLedger.last_night >= night),
+        ))
+    found = db.session.execute(snapshot).first()
+    if found is None:
+        return None
+    return found.availability + db.session.execute(tail.where(InventoryLedger.id > found.ledger_id)).scalar()
+
+
+def history(model, item_id, limit=20):
+    """The item's latest ledger rows, newest first."""
+    return db.session.execute(
+        select(InventoryLedger)
+        .where(InventoryLedger.service_table == model.__tablename__, InventoryLedger.item_id == item_id)
+        .order_by(InventoryLedger.id.desc())
+        .limit(limit)
+    ).scalars().all()
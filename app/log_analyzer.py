@@ -0,0 +1,263 @@
+"""
+Single-pass analyzer for the rotating logs/app.log* files.
+
+    flask analyze-logs                  # logs/app.log.10 ... logs/app.log
+    python -m app.log_analyzer logs/ --json
+
+Reads plain, .gz and .bz2 files line by line and keeps only counters and
+fixed-size latency histograms, so memory stays flat however large the logs are.
+Error signatures have ids, numbers and hex stripped so one bug is one
+signature, and at most MAX_SIGNATURES of them are tracked (space-saving top-k).
+Requests are grouped by Flask endpoint; ones that matched no route (404s from
+scanners and typos, endpoint=None) all count under UNMATCHED, since their
+paths are attacker-chosen and would grow the table without bound.
+"""
+import argparse
+import bz2
+import gzip
+import json
+import math
+import os
+import re
+import sys
+from collections import Counter, defaultdict
+
+RECORD_START = re.compile(r"^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d{3}) (\w+): (.*)$")
+LOCATION_SUFFIX = re.compile(r" \[in [^\]]*\]$")
+# Structured access line written by app.logging_config
+ACCESS_LINE = re.compile(r"^request method=(\S+) path=(\S+) endpoint=(\S+) status=(\d+) duration_ms=([\d.]+)")
+# Older BookingContext timing lines: "Finished operation: <name> in 0.02 seconds"
+OPERATION_LINE = re.compile(r"^Finished operation: (.+) in ([\d.]+) seconds")
+FLASK_EXCEPTION = re.compile(r"^Exception on (\S+) \[(\w+)\]")
+TRACEBACK_FRAME = re.compile(r'^\s+File "([^"]+)", line (\d+), in (\S+)')
+EXCEPTION_LINE = re.compile(r"^([\w.]+(?:Error|Exception|Exit)\b.*)$")
+NUMBERS_IN_PATH = re.compile(r"/\d+(?=/|$)")
+# Hex ids (0x..., uuids, tokens) first, then any remaining number
+HEX_IN_MESSAGE = re.compile(r"\b(?:0x[0-9a-fA-F]+|[0-9a-fA-F]{8,}(?:-[0-9a-fA-F]{4,})*)\b")
+NUMBER_IN_MESSAGE = re.compile(r"\b\d+(?:\.\d+)?\b")
+
+MAX_SIGNATURES = 1000
+
+UNMATCHED = "<unmatched>"
+
+OPENERS = {".gz": gzip.open, ".bz2": bz2.open}
+
+
+class LatencyHistogram:
+    """Log-scale buckets (about 5% wide) from 0.01 ms upward; constant memory."""
+    __slots__ = ("counts", "count", "total")
+    GROWTH = 1.05
+    FLOOR_MS = 0.01
+
+    def __init__(self):
+        self.counts = Counter()
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, ms):
+        index = 0 if ms <= self.FLOOR_MS else int(math.log(ms / self.FLOOR_MS, self.GROWTH)) + 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += ms
+
+    def percentile(self, q):
+        if not self.count:
+            return None
+        rank = q / 100 * self.count
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return self.FLOOR_MS * self.GROWTH ** index  # Upper edge of the bucket
+        return None
+
+
+class TopCounter:
+    """
+    Space-saving top-k counter: at most `capacity` keys. A new key past that
+    takes over the least counted one and its count, so counts are upper
+    bounds, exact for keys that were never evicted.
+    """
+    __slots__ = ("capacity", "counts")
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+
+    def add(self, key):
+        if key in self.counts:
+            self.counts[key] += 1
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = 1
+        else:
+            smallest = min(self.counts, key=self.counts.get)
+            self.counts[key] = self.counts.pop(smallest) + 1
+
+    def most_common(self):
+        return Counter(self.counts).most_common()
+
+
+def normalize_signature(text):
+    """Replace hex ids and numbers so messages that differ only in values compare equal."""
+    return NUMBER_IN_MESSAGE.sub("<n>", HEX_IN_MESSAGE.sub("<hex>", text))
+
+
+def rotation_order(directory, base="app.log"):
+    """Log files oldest first: app.log.10, ..., app.log.1, app.log (compressed ones included)."""
+    found = []
+    for name in os.listdir(directory):
+        stem = name
+        for suffix in OPENERS:
+            if stem.endswith(suffix):
+                stem = stem[: -len(suffix)]
+        if stem == base:
+            found.append((0, name))
+        elif stem.startswith(base + ".") and stem[len(base) + 1:].isdigit():
+            found.append((int(stem[len(base) + 1:]), name))
+    return [os.path.join(directory, name) for _, name in sorted(found, reverse=True)]
+
+
+def read_lines(paths):
+    for path in paths:
+        opener = OPENERS.get(os.path.splitext(path)[1], open)
+        with opener(path, "rt", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                yield line.rstrip("\r\n")
+
+
+def parse_records(lines):
+    """
+    Group lines into (timestamp, level, message, traceback_summary) records.
+    Only the last frame and the exception line of a traceback are kept.
+    """
+    current = None
+    last_frame = None
+    exception = None
+    for line in lines:
+        match = RECORD_START.match(line)
+        if match:
+            if current is not None:
+                yield current + ((last_frame, exception),)
+            timestamp, level, message = match.groups()
+            current = (timestamp, level, LOCATION_SUFFIX.sub("", message))
+            last_frame = exception = None
+        elif current is not None:
+            frame = TRACEBACK_FRAME.match(line)
+            if frame:
+                last_frame = f"{os.path.basename(frame.group(1).replace(chr(92), '/'))}:{frame.group(2)} in {frame.group(3)}"
+            elif EXCEPTION_LINE.match(line):
+                exception = line.strip()
+    if current is not None:
+        yield current + ((last_frame, exception),)
+
+
+def analyze(records):
+    """Aggregate request counts, latency percentiles and error signatures."""
+    endpoints = defaultdict(lambda: {"requests": 0, "statuses": Counter(), "latency": LatencyHistogram()})
+    failed_requests = TopCounter(MAX_SIGNATURES)
+    operations = defaultdict(LatencyHistogram)
+    signatures = TopCounter(MAX_SIGNATURES)
+    levels = Counter()
+    first = last = None
+
+    for timestamp, level, message, (frame, exception) in records:
+        first = first or timestamp
+        last = timestamp
+        levels[level] += 1
+
+        access = ACCESS_LINE.match(message)
+        if access:
+            method, path, endpoint, status, duration = access.groups()
+            stats = endpoints[endpoint if endpoint != "None" else UNMATCHED]
+            stats["requests"] += 1
+            stats["statuses"][status[0] + "xx"] += 1
+            stats["latency"].add(float(duration))
+            continue
+
+        operation = OPERATION_LINE.match(message)
+        if operation:
+            operations[operation.group(1)].add(float(operation.group(2)) * 1000)
+            continue
+
+        if level in ("ERROR", "CRITICAL"):
+            failed = FLASK_EXCEPTION.match(message)
+            if failed:
+                failed_requests.add(f"{failed.group(2)} {NUMBERS_IN_PATH.sub('/<int>', failed.group(1))}")
+            # The frame's line number stays: it tells two raise sites apart
+            signature = normalize_signature(exception or message)
+            if frame:
+                signature = f"{signature} @ {frame}"
+            signatures.add(signature)
+
+    return {
+        "first_record": first,
+        "last_record": last,
+        "levels": dict(levels),
+        "endpoints": {
+            name: {
+                "requests": stats["requests"],
+                "statuses": dict(stats["statuses"]),
+                **_latency_summary(stats["latency"]),
+            }
+            for name, stats in sorted(endpoints.items())
+        },
+        "operations": {name: _latency_summary(h) for name, h in sorted(operations.items())},
+        "unhandled_exceptions": failed_requests.most_common(),
+        "error_signatures": signatures.most_common(),
+    }
+
+
+def _latency_summary(histogram):
+    if not histogram.count:
+        return {}
+    return {
+        "count": histogram.count,
+        "mean_ms": round(histogram.total / histogram.count, 3),
+        "p50_ms": round(histogram.percentile(50), 3),
+        "p95_ms": round(histogram.percentile(95), 3),
+        "p99_ms": round(histogram.percentile(99), 3),
+    }
+
+
+def format_report(report, top=20):
+    lines = [f"Records {report['first_record']} .. {report['last_record']}  levels: {report['levels']}", ""]
+    lines.append(f"{'endpoint':45} {'requests':>8} {'5xx':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, stats in report["endpoints"].items():
+        lines.append(
+            f"{name[:45]:45} {stats['requests']:>8} {stats['statuses'].get('5xx', 0):>6} "
+            f"{stats.get('p50_ms', ''):>9} {stats.get('p95_ms', ''):>9} {stats.get('p99_ms', ''):>9}"
+        )
+    if report["operations"]:
+        lines += ["", f"{'operation':45} {'count':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"]
+        for name, stats in report["operations"].items():
+            lines.append(f"{name[:45]:45} {stats['count']:>8} {stats['p50_ms']:>9} {stats['p95_ms']:>9} {stats['p99_ms']:>9}")
+    if report["unhandled_exceptions"]:
+        lines += ["", "Unhandled exceptions by request:"]
+        for request_line, count in report["unhandled_exceptions"][:top]:
+            lines.append(f"{count:>6}  {request_line}")
+    lines += ["", "Top error signatures:"]
+    for signature, count in report["error_signatures"][:top]:
+        lines.append(f"{count:>6}  {signature}")
+    return "\n".join(lines)
+
+
+def run(paths, as_json=False, top=20):
+    files = []
+    for path in paths:
+        files.extend(rotation_order(path) if os.path.isdir(path) else [path])
+    report = analyze(parse_records(read_lines(files)))
+    return json.dumps(report, indent=2) if as_json else format_report(report, top)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize request latency and errors from app logs.")
+    parser.add_argument("paths", nargs="*", default=["logs"], help="log files or directories (default: logs/)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--top", type=int, default=20, help="number of error signatures to show")
+    args = parser.parse_args(argv)
+    print(run(args.paths, args.json, args.top))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+import atexit
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from time import perf_counter
+from flask import g, request
+from app import metrics
+
+# Same layout as the existing logs/app.log files
+LOG_FORMAT = "%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]"
+
+access_logger = logging.getLogger("app.access")
+
+_queue_handler = None
+_listener = None
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()  # Drains whatever is still queued
+        _listener = None
+
+
+def configure_logging(app):
+    """
+    Send all log records through a bounded queue to a background writer thread.
+    Request threads only enqueue, so a slow disk never delays a booking.
+    """
+    global _queue_handler, _listener
+    config = app.config
+    config.setdefault("LOG_LEVEL", "INFO")
+    config.setdefault("LOG_LEVELS", {})  # Per-logger overrides, e.g. {"app.builders": "DEBUG"}
+    config.setdefault("LOG_FILE", os.path.join(os.path.dirname(app.root_path), "logs", "app.log"))
+    config.setdefault("LOG_MAX_BYTES", 1024 * 1024)
+    config.setdefault("LOG_BACKUP_COUNT", 10)
+    config.setdefault("LOG_QUEUE_SIZE", 10000)
+    config.setdefault("LOG_TO_CONSOLE", True)
+    config.setdefault("LOG_REQUESTS", True)
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = []
+    if config["LOG_FILE"]:
+        os.makedirs(os.path.dirname(config["LOG_FILE"]), exist_ok=True)
+        file_handler = RotatingFileHandler(
+            config["LOG_FILE"],
+            maxBytes=config["LOG_MAX_BYTES"],
+            backupCount=config["LOG_BACKUP_COUNT"],
+            delay=True,
+        )
+        handlers.append(file_handler)
+    if config["LOG_TO_CONSOLE"]:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    # Replace the handler from a previous create_app() in this process
+    root = logging.getLogger()
+    _stop_listener()
+    if _queue_handler is not None:
+        root.removeHandler(_queue_handler)
+
+    _queue_handler = DroppingQueueHandler(queue.Queue(maxsize=config["LOG_QUEUE_SIZE"]))
+    root.addHandler(_queue_handler)
+    root.setLevel(config["LOG_LEVEL"])
+    for name, level in config["LOG_LEVELS"].items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+    if config["LOG_REQUESTS"]:
+        @app.before_request
+        def start_request_timer():
+            g.request_started = perf_counter()
+
+        @app.after_request
+        def log_request(response):
+            started = g.get("request_started")
+            if started is not None and access_logger.isEnabledFor(logging.INFO):
+                access_logger.info(
+                    "request method=%s path=%s endpoint=%s status=%d duration_ms=%.2f",
+                    request.method, request.path, request.endpoint, response.status_code,
+                    (perf_counter() - started) * 1000,
+                )
+            return response
+
+
+def dropped_records():
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+
+@metrics.register_collector
+def log_queue_stats():
+    if _queue_handler is not None:
+        yield "log_queue_depth", {}, _queue_handler.queue.qsize()
+        yield "log_records_dropped", {}, _queue_handler.dropped
+
+
+atexit.register(_stop_listener)
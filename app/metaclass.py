@@ -1,8 +1,6 @@
 from sqlalchemy.orm.decl_api import DeclarativeMeta
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
@@ -22,5 +20,5 @@ class ServiceMeta(DeclarativeMeta):
                 logger.error(error_message)
                 raise TypeError(error_message)
             else:
-                logger.info(f"Class {name} created successfully with 'calculate_cost' method.")
+                logger.debug("Class %s created successfully with 'calculate_cost' method.", name)
                 return new_cls
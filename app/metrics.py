@@ -0,0 +1,106 @@
+import threading
+from bisect import bisect_left
+
+# Histogram bucket upper bounds in seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect and three increments."""
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+_lock = threading.Lock()
+# (operation, phase, outcome) -> Histogram
+_phase_histograms = {}
+# Callables returning (metric_name, labels, value) gauges, e.g. pool or cache stats
+_collectors = []
+
+
+def observe_phases(operation, outcome, phases):
+    """Record a list of (phase, seconds) for one operation."""
+    with _lock:
+        for phase, seconds in phases:
+            key = (operation, phase, outcome)
+            histogram = _phase_histograms.get(key)
+            if histogram is None:
+                histogram = _phase_histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+
+def observe_phase(operation, phase, outcome, seconds):
+    observe_phases(operation, outcome, ((phase, seconds),))
+
+
+def register_collector(collector):
+    """Add a callable that yields (metric_name, labels_dict, value) gauges for /metrics."""
+    _collectors.append(collector)
+    return collector
+
+
+def reset():
+    with _lock:
+        _phase_histograms.clear()
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{str(value)}"' for key, value in labels.items())
+    return "{" + pairs + "}"
+
+
+def render_prometheus():
+    """Render all histograms and collector gauges in the Prometheus text format."""
+    with _lock:
+        snapshot = [
+            (key, list(h.buckets), list(h.counts), h.sum, h.count)
+            for key, h in sorted(_phase_histograms.items())
+        ]
+
+    lines = [
+        "# HELP booking_phase_seconds Wall time of each phase of a booking or search operation.",
+        "# TYPE booking_phase_seconds histogram",
+    ]
+    for (operation, phase, outcome), buckets, counts, total, count in snapshot:
+        labels = {"operation": operation, "phase": phase, "outcome": outcome}
+        cumulative = 0
+        for bound, bucket_count in zip(buckets + ["+Inf"], counts):
+            cumulative += bucket_count
+            lines.append(f"booking_phase_seconds_bucket{_labels({**labels, 'le': bound})} {cumulative}")
+        lines.append(f"booking_phase_seconds_sum{_labels(labels)} {total}")
+        lines.append(f"booking_phase_seconds_count{_labels(labels)} {count}")
+
+    seen = set()
+    for collector in _collectors:
+        for name, labels, value in collector():
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name}{_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+@register_collector
+def db_pool_stats():
+    """Connection pool gauges for every configured engine."""
+    from app import db
+
+    for bind_key, engine in db.engines.items():
+        pool = engine.pool
+        labels = {"bind": bind_key or "default", "pool": type(pool).__name__}
+        for stat in ("size", "checkedin", "checkedout", "overflow"):
+            method = getattr(pool, stat, None)
+            if callable(method):
+                yield f"db_pool_{stat}", labels, method()
@@ -42,7 +42,9 @@ class Booking(db.Model):
     is_confirmed = db.Column(db.Boolean, default=True, nullable=False)
 
     def calculate_total_price(self):
-        if self.service_type == 'Flight' and self.flight:
+        if self.service_type == 'Flight' and self.seat_assignment:
+            return self.seat_assignment.fare_class.calculate_cost() * self.num_people
+        elif self.service_type == 'Flight' and self.flight:
             return self.flight.calculate_cost() * self.num_people
         elif self.service_type == 'Hotel' and self.hotel:
             return self.hotel.calculate_cost() * self.num_people
@@ -80,6 +82,8 @@ class TravelService(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     availability = db.Column(db.Integer, nullable=False)
     price = db.Column(db.Float, nullable=False)  
+    # False once `flask retire-inventory` has taken it off sale; see app/retirement.py
+    is_active = db.Column(db.Boolean, default=True, server_default=db.true(), nullable=False)
     def __init__(self, availability, price):
         self.availability = availability
         self.price = price
@@ -100,6 +104,13 @@ class TravelService(db.Model):
 @register_service
 class Flight(TravelService):
     __tablename__ = 'flight' 
+    # Covers sellable flights only, so searches scan live inventory rather than all of history
+    __table_args__ = (
+        db.Index('ix_flight_live_departure', 'departure_time',
+                 sqlite_where=db.text('is_active = 1'), postgresql_where=db.text('is_active')),
+        # One instance per scheduled departure, however many processes materialize it
+        db.UniqueConstraint('schedule_id', 'departure_time', name='uq_flight_schedule_departure'),
+    )
 
     airline = db.Column(db.String(120), nullable=False)
     departure_city = db.Column(db.String(120), nullable=False)
@@ -107,6 +118,8 @@ class Flight(TravelService):
     departure_time = db.Column(db.DateTime, nullable=False)
     arrival_time = db.Column(db.DateTime, nullable=False)
     flight_number = db.Column(db.String(120), nullable=False)
+    # Set on instances materialized from a FlightSchedule; see app/schedules.py
+    schedule_id = db.Column(db.Integer, db.ForeignKey('flight_schedule.id'), nullable=True)
     
     @validates('price') 
     def validate_price(self, key, value):
@@ -129,9 +142,56 @@ class Flight(TravelService):
     def __repr__(self):
         return f"<Flight(airline={self.airline}, id={self.id})>"
     
+class FlightSchedule(db.Model):
+    """
+    A recurring flight: one departure at departure_time on each of its
+    weekdays from valid_from to valid_to. Flight rows are materialized from it
+    for the sellable horizon or on first booking.
+    """
+    __tablename__ = 'flight_schedule'
+
+    id = db.Column(db.Integer, primary_key=True)
+    airline = db.Column(db.String(120), nullable=False)
+    flight_number = db.Column(db.String(120), nullable=False)
+    departure_city = db.Column(db.String(120), nullable=False)
+    destination = db.Column(db.String(120), nullable=False)
+    weekdays = db.Column(db.String(7), nullable=False, default='0123456')  # Monday=0: '024' flies Mon, Wed, Fri
+    departure_time = db.Column(db.Time, nullable=False)
+    duration_minutes = db.Column(db.Integer, nullable=False)
+    valid_from = db.Column(db.Date, nullable=False)
+    valid_to = db.Column(db.Date, nullable=False, index=True)  # Last day it departs
+    price = db.Column(db.Float, nullable=False)
+    capacity = db.Column(db.Integer, nullable=False)
+    is_active = db.Column(db.Boolean, default=True, server_default=db.true(), nullable=False)
+    flights = db.relationship('Flight', backref='schedule', lazy='dynamic')
+
+    @validates('price', 'capacity', 'duration_minutes')
+    def validate_positive(self, key, value):
+        if value is not None and value < 0:
+            raise ValueError(f"{key.replace('_', ' ').capitalize()} cannot be negative.")
+        return value
+
+    @validates('weekdays')
+    def validate_weekdays(self, key, value):
+        value = ''.join(sorted(set(value or '')))
+        if not value or any(day not in '0123456' for day in value):
+            raise ValueError("Weekdays are digits 0 (Monday) to 6 (Sunday).")
+        return value
+
+    def flies_on(self, day):
+        return self.valid_from <= day <= self.valid_to and str(day.weekday()) in self.weekdays
+
+    def __repr__(self):
+        return f'<FlightSchedule {self.id} {self.flight_number} {self.departure_city}-{self.destination}>'
+
+
 @register_service
 class Hotel(TravelService):
     __tablename__ = 'hotel'  # Explicitly define table name
+    __table_args__ = (
+        db.Index('ix_hotel_live_checkout', 'checkout_date',
+                 sqlite_where=db.text('is_active = 1'), postgresql_where=db.text('is_active')),
+    )
 
     hotel_name = db.Column(db.String(120), nullable=False)
     hotel_location = db.Column(db.String(120), nullable=False)
@@ -197,3 +257,297 @@ class PackageDeal(db.Model):
     def availability(self):
         """Calculate availability based on flight and hotel availability.""" 
         return min(self.flight.availability, self.hotel.availability)
+
+class InventoryHold(db.Model):
+    """Units taken out of availability for a short time before checkout."""
+    __tablename__ = 'inventory_hold'
+
+    id = db.Column(db.Integer, primary_key=True)
+    token = db.Column(db.String(32), unique=True, nullable=False)
+    service_type = db.Column(db.String(50), nullable=False)
+    item_id = db.Column(db.Integer, nullable=False)
+    # The rows the units came from, so expiry can give them back without joins
+    flight_id = db.Column(db.Integer, db.ForeignKey('flight.id'), nullable=True)
+    hotel_id = db.Column(db.Integer, db.ForeignKey('hotel.id'), nullable=True)
+    quantity = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<InventoryHold {self.token} {self.service_type} {self.item_id} x{self.quantity}>'
+
+class IdempotencyKey(db.Model):
+    """Outcome of a write request, replayed when the client retries with the same key."""
+    __tablename__ = 'idempotency_key'
+
+    # sha256 of user, endpoint and the client's key
+    key = db.Column(db.String(64), primary_key=True)
+    request = db.Column(db.String(255), nullable=False)
+    # NULL while the first request is still running
+    status_code = db.Column(db.Integer, nullable=True)
+    response = db.Column(db.Text, nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<IdempotencyKey {self.key[:12]} {self.request} {self.status_code}>'
+
+class IngestedBooking(db.Model):
+    """Queue reference of a write-behind booking, committed with the booking itself."""
+    __tablename__ = 'ingested_booking'
+
+    ref = db.Column(db.String(32), primary_key=True)
+    booking_id = db.Column(db.Integer, db.ForeignKey('booking.id'), nullable=False)
+    ingested_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<IngestedBooking {self.ref} -> {self.booking_id}>'
+
+
+class InventoryCapacity(db.Model):
+    """Total units a flight or hotel was put on sale with; availability is what is left."""
+    __tablename__ = 'inventory_capacity'
+
+    service_table = db.Column(db.String(20), primary_key=True)  # 'flight' or 'hotel'
+    item_id = db.Column(db.Integer, primary_key=True)
+    capacity = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<InventoryCapacity {self.service_table} {self.item_id}: {self.capacity}>'
+
+
+class HotelNight(db.Model):
+    """Rooms left at a hotel for one night; created on the hotel's first partial-stay booking."""
+    __tablename__ = 'hotel_night'
+
+    hotel_id = db.Column(db.Integer, db.ForeignKey('hotel.id'), primary_key=True)
+    night = db.Column(db.Date, primary_key=True)
+    availability = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<HotelNight {self.hotel_id} {self.night}: {self.availability}>'
+
+
+class HotelStay(db.Model):
+    """The nights a hotel booking holds rooms for, [check_in, check_out)."""
+    __tablename__ = 'hotel_stay'
+
+    booking_id = db.Column(db.Integer, db.ForeignKey('booking.id'), primary_key=True)
+    hotel_id = db.Column(db.Integer, db.ForeignKey('hotel.id'), nullable=False, index=True)
+    check_in = db.Column(db.Date, nullable=False)
+    check_out = db.Column(db.Date, nullable=False)
+    booking = db.relationship('Booking', backref=db.backref('stay', uselist=False, lazy=True))
+
+    def __repr__(self):
+        return f'<HotelStay {self.booking_id} {self.check_in}..{self.check_out}>'
+
+
+class FareClass(db.Model):
+    """A flight's cabin: its own price, seats left and block of rows in the seat map."""
+    __tablename__ = 'fare_class'
+    __table_args__ = (db.UniqueConstraint('flight_id', 'code', name='uq_fare_class_flight_code'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    flight_id = db.Column(db.Integer, db.ForeignKey('flight.id'), nullable=False)
+    code = db.Column(db.String(1), nullable=False)  # F, J, W, Y
+    name = db.Column(db.String(40), nullable=False)
+    price = db.Column(db.Float, nullable=False)
+    availability = db.Column(db.Integer, nullable=False)
+    first_row = db.Column(db.Integer, nullable=False)
+    last_row = db.Column(db.Integer, nullable=False)
+    flight = db.relationship('Flight', backref=db.backref('fare_classes', lazy=True, order_by='FareClass.first_row'))
+
+    def calculate_cost(self):
+        return self.price * 1.2  # Same 20% tax as Flight
+
+    def __repr__(self):
+        return f'<FareClass {self.flight_id} {self.code}: {self.availability}>'
+
+
+class SeatMap(db.Model):
+    """One bit per seat (1 = taken), row by row in layout order; written with a version check."""
+    __tablename__ = 'seat_map'
+
+    flight_id = db.Column(db.Integer, db.ForeignKey('flight.id'), primary_key=True)
+    layout = db.Column(db.String(20), nullable=False)  # Seat letters per row, '-' for aisles: 'ABC-DEF'
+    rows = db.Column(db.Integer, nullable=False)
+    taken = db.Column(db.LargeBinary, nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<SeatMap {self.flight_id} {self.rows}x{self.layout}>'
+
+
+class SeatAssignment(db.Model):
+    """Fare class and seats of a flight booking made in a cabin."""
+    __tablename__ = 'seat_assignment'
+
+    booking_id = db.Column(db.Integer, db.ForeignKey('booking.id'), primary_key=True)
+    flight_id = db.Column(db.Integer, db.ForeignKey('flight.id'), nullable=False, index=True)
+    fare_class_id = db.Column(db.Integer, db.ForeignKey('fare_class.id'), nullable=False)
+    seats = db.Column(db.String(400), nullable=False, default='')  # '12A,12B'; empty without a seat map
+    booking = db.relationship('Booking', backref=db.backref('seat_assignment', uselist=False, lazy=True))
+    fare_class = db.relationship('FareClass', lazy=True)
+
+    @property
+    def seat_list(self):
+        return [seat for seat in self.seats.split(',') if seat]
+
+    def __repr__(self):
+        return f'<SeatAssignment {self.booking_id} {self.seats}>'
+
+
+class InventoryLedger(db.Model):
+    """
+    Append-only record of every availability change. Hotel rows with a night
+    range apply to those nights only (first_night..last_night inclusive).
+    """
+    __tablename__ = 'inventory_ledger'
+    __table_args__ = (db.Index('ix_inventory_ledger_item', 'service_table', 'item_id', 'id'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    service_table = db.Column(db.String(20), nullable=False)  # 'flight', 'hotel' or 'fare_class'
+    item_id = db.Column(db.Integer, nullable=False)
+    delta = db.Column(db.Integer, nullable=False)
+    reason = db.Column(db.String(30), nullable=False)
+    booking_id = db.Column(db.Integer, db.ForeignKey('booking.id'), nullable=True)
+    first_night = db.Column(db.Date, nullable=True)
+    last_night = db.Column(db.Date, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    booking = db.relationship('Booking', lazy=True)
+
+    def __repr__(self):
+        return f'<InventoryLedger {self.service_table} {self.item_id} {self.delta:+d} {self.reason}>'
+
+
+class InventorySnapshot(db.Model):
+    """A counter's value once every ledger row up to ledger_id had been applied."""
+    __tablename__ = 'inventory_snapshot'
+    __table_args__ = (db.Index('ix_inventory_snapshot_item', 'service_table', 'item_id', 'ledger_id'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    service_table = db.Column(db.String(20), nullable=False)
+    item_id = db.Column(db.Integer, nullable=False)
+    night = db.Column(db.Date, nullable=True)  # Set for the nights of split hotels
+    availability = db.Column(db.Integer, nullable=False)
+    ledger_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<InventorySnapshot {self.service_table} {self.item_id} {self.night or ""} @{self.ledger_id}>'
+
+
+class PriceAlert(db.Model):
+    """A saved search that notifies its user when a matching item gets cheap enough or frees up."""
+    __tablename__ = 'price_alert'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    service_type = db.Column(db.String(20), nullable=False)  # 'Flight' or 'Hotel'
+    destination = db.Column(db.String(120), nullable=False)  # Lower-cased; flight destination or hotel location
+    departure_city = db.Column(db.String(120), nullable=True)  # Lower-cased; flights only
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)  # Last departure day, or check-out day
+    max_price = db.Column(db.Float, nullable=True)
+    num_people = db.Column(db.Integer, nullable=False)
+    notified_price = db.Column(db.Float, nullable=True)  # Lowest price already sent; later matches must beat it
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    user = db.relationship('User', backref=db.backref('price_alerts', lazy=True))
+
+    def __repr__(self):
+        return f'<PriceAlert {self.id} {self.service_type} {self.destination} {self.start_date}..{self.end_date}>'
+
+
+class PriceAlertBucket(db.Model):
+    """Inverted index: one row per week an alert's date window touches."""
+    __tablename__ = 'price_alert_bucket'
+
+    service_type = db.Column(db.String(20), primary_key=True)
+    destination = db.Column(db.String(120), primary_key=True)
+    bucket = db.Column(db.Date, primary_key=True)  # Monday of the week
+    alert_id = db.Column(db.Integer, db.ForeignKey('price_alert.id'), primary_key=True)
+
+
+class AlertChange(db.Model):
+    """Flights and hotels whose price or availability changed since the matcher last ran."""
+    __tablename__ = 'alert_change'
+
+    id = db.Column(db.Integer, primary_key=True)
+    service_table = db.Column(db.String(20), nullable=False)  # 'flight' or 'hotel'
+    item_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class NotificationOutbox(db.Model):
+    """Messages for users, written in the same transaction as their cause and delivered later."""
+    __tablename__ = 'notification_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    kind = db.Column(db.String(30), nullable=False)  # 'price_alert', ...
+    subject = db.Column(db.String(200), nullable=False)
+    body = db.Column(db.Text, nullable=False)  # JSON payload
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = db.Column(db.DateTime, nullable=True, index=True)
+
+    def __repr__(self):
+        return f'<NotificationOutbox {self.id} {self.kind} user={self.user_id}>'
+
+
+class WaitlistEntry(db.Model):
+    """
+    A party waiting for a sold-out flight, hotel or package, first come first
+    served. Promotion books it and deletes the entry.
+    """
+    __tablename__ = 'waitlist_entry'
+    __table_args__ = (db.Index('ix_waitlist_entry_queue', 'service_type', 'item_id', 'created_at', 'id'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    service_type = db.Column(db.String(20), nullable=False)  # 'Flight', 'Hotel' or 'PackageDeal'
+    item_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    name = db.Column(db.String(50), nullable=False)
+    email = db.Column(db.String(120), nullable=False)
+    destination = db.Column(db.String(60), nullable=False)
+    num_people = db.Column(db.Integer, nullable=False)
+    fare_class_id = db.Column(db.Integer, db.ForeignKey('fare_class.id'), nullable=True)  # Flights booked in a cabin
+    check_in = db.Column(db.Date, nullable=True)  # Hotel stays only
+    check_out = db.Column(db.Date, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    user = db.relationship('User', backref=db.backref('waitlist_entries', lazy=True))
+    fare_class = db.relationship('FareClass', lazy=True)
+
+    def __repr__(self):
+        return f'<WaitlistEntry {self.id} {self.service_type} {self.item_id} x{self.num_people}>'
+
+
+class BookingArchive(db.Model):
+    """
+    Cold copy of bookings moved out of `booking` by `flask archive-bookings`:
+    the booking's own columns, its stay dates and seats, and when it moved.
+    Ids are kept, so ledger rows still name the booking.
+    """
+    __tablename__ = 'booking_archive'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(50), nullable=False)
+    email = db.Column(db.String(120), nullable=False)
+    destination = db.Column(db.String(60), nullable=False)
+    booking_date = db.Column(db.DateTime, nullable=False)
+    num_people = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    flight_number = db.Column(db.String(50), nullable=True)
+    total_price = db.Column(db.Integer, nullable=False)
+    service_type = db.Column(db.String(50), nullable=False)
+    flight_id = db.Column(db.Integer, nullable=True)
+    hotel_id = db.Column(db.Integer, nullable=True)
+    package_deal_id = db.Column(db.Integer, nullable=True)
+    is_confirmed = db.Column(db.Boolean, nullable=False)
+    check_in = db.Column(db.Date, nullable=True)
+    check_out = db.Column(db.Date, nullable=True)
+    seats = db.Column(db.String(400), nullable=True)
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        status = "Confirmed" if self.is_confirmed else "Canceled"
+        return f'<BookingArchive {self.id} ({status})>'
@@ -0,0 +1,204 @@
+"""
+In-process pub/sub of availability changes, pushed to browsers over SSE.
+
+inventory.record() marks each changed counter on the session; once the
+transaction commits, the keys go to the app's Broker. A single broker thread
+coalesces them: at most every SSE_THROTTLE_SECONDS it reads the current value
+of the changed keys somebody is watching (one query per table, however many
+subscribers) and hands each subscription only its own keys. Changes made by
+other processes are not seen; each process serves its own subscribers.
+
+Every open stream holds a worker thread, so a process serves at most
+SSE_MAX_SUBSCRIBERS streams and SSE_MAX_PER_CLIENT per user or address.
+"""
+import logging
+import threading
+import time
+from flask import current_app, has_app_context
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from app import db, metrics
+from app.models import FareClass, Flight, Hotel
+
+logger = logging.getLogger(__name__)
+
+MODELS = {model.__tablename__: model for model in (Flight, Hotel, FareClass)}
+
+# session.info key for counters changed in the open transaction
+CHANGED = "pubsub_changed"
+
+_create_lock = threading.Lock()
+
+
+class TooManySubscribers(Exception):
+    """Raised when the process or the client already has every stream it may open."""
+
+
+def parse_keys(raw, limit):
+    """'flight:1,hotel:2' -> {('flight', 1), ('hotel', 2)}; unknown tables and junk are dropped."""
+    keys = set()
+    for part in raw.split(","):
+        table, _, item_id = part.strip().partition(":")
+        if table in MODELS and item_id.isdigit():
+            keys.add((table, int(item_id)))
+        if len(keys) >= limit:
+            break
+    return keys
+
+
+class Subscription:
+    """Latest value per watched key since the subscriber last looked."""
+
+    def __init__(self, keys, client=None):
+        self.keys = frozenset(keys)
+        self.client = client
+        self._pending = {}
+        self._cond = threading.Condition()
+
+    def push(self, values):
+        with self._cond:
+            self._pending.update(values)
+            self._cond.notify()
+
+    def wait(self, timeout):
+        """Pending {key: value} (empty after `timeout` seconds without changes)."""
+        with self._cond:
+            if not self._pending:
+                self._cond.wait(timeout)
+            pending, self._pending = self._pending, {}
+            return pending
+
+
+class Broker:
+    def __init__(self, app):
+        self.app = app
+        self.throttle = app.config["SSE_THROTTLE_SECONDS"]
+        self.max_subscribers = app.config["SSE_MAX_SUBSCRIBERS"]
+        self.max_per_client = app.config["SSE_MAX_PER_CLIENT"]
+        self._subscriptions = set()
+        self._per_client = {}  # client -> open streams
+        self._changed = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="availability-broker", daemon=True)
+        self.stats = {"published": 0, "pushed": 0, "refused": 0}
+
+    def start(self):
+        self._thread.start()
+
+    def subscribe(self, keys, client=None):
+        """A new Subscription, or TooManySubscribers once the process or `client` is at its cap."""
+        with self._lock:
+            if len(self._subscriptions) >= self.max_subscribers:
+                self.stats["refused"] += 1
+                raise TooManySubscribers("Too many open availability streams.")
+            if client is not None and self._per_client.get(client, 0) >= self.max_per_client:
+                self.stats["refused"] += 1
+                raise TooManySubscribers("Too many availability streams from this client.")
+            subscription = Subscription(keys, client)
+            self._subscriptions.add(subscription)
+            if client is not None:
+                self._per_client[client] = self._per_client.get(client, 0) + 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            if subscription not in self._subscriptions:
+                return
+            self._subscriptions.discard(subscription)
+            if subscription.client is not None:
+                left = self._per_client.pop(subscription.client) - 1
+                if left:
+                    self._per_client[subscription.client] = left
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscriptions)
+
+    def publish(self, keys):
+        with self._lock:
+            self._changed.update(keys)
+        self.stats["published"] += len(keys)
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            with self._lock:
+                changed, self._changed = self._changed, set()
+                subscriptions = list(self._subscriptions)
+            watched = changed & set().union(*(s.keys for s in subscriptions)) if subscriptions else set()
+            if watched:
+                try:
+                    with self.app.app_context():
+                        values = self._load(watched)
+                except Exception as e:
+                    logger.warning("Could not load changed availability: %s", e)
+                    values = {}
+                for subscription in subscriptions:
+                    mine = {key: values[key] for key in subscription.keys & values.keys()}
+                    if mine:
+                        subscription.push(mine)
+                        self.stats["pushed"] += 1
+            time.sleep(self.throttle)  # Coalesce whatever arrives meanwhile
+
+    def _load(self, keys):
+        values = {}
+        for table, model in MODELS.items():
+            ids = [item_id for key_table, item_id in keys if key_table == table]
+            if ids:
+                rows = db.session.execute(select(model.id, model.availability).where(model.id.in_(ids)))
+                values.update(((table, item_id), availability) for item_id, availability in rows)
+        return values
+
+
+def broker(app=None):
+    """The app's broker, started on first use."""
+    app = app or current_app._get_current_object()
+    existing = app.extensions.get("pubsub")
+    if existing is not None:
+        return existing
+    with _create_lock:
+        if "pubsub" not in app.extensions:
+            created = Broker(app)
+            created.start()
+            app.extensions["pubsub"] = created
+    return app.extensions["pubsub"]
+
+
+def mark_changed(table, item_id):
+    """Publish this counter once the current transaction commits."""
+    db.session.info.setdefault(CHANGED, set()).add((table, item_id))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed(session):
+    changed = session.info.pop(CHANGED, None)
+    if changed and has_app_context() and "pubsub" in current_app.extensions:
+        current_app.extensions["pubsub"].publish(changed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed(session):
+    session.info.pop(CHANGED, None)
+
+
+@metrics.register_collector
+def pubsub_stats():
+    current = current_app.extensions.get("pubsub") if has_app_context() else None
+    if current is None:
+        return
+    yield "sse_subscribers", {}, current.subscriber_count()
+    for name, value in current.stats.items():
+        yield f"sse_{name}", {}, value
+
+
+def init_app(app):
+    app.config.setdefault("SSE_THROTTLE_SECONDS", 1.0)
+    app.config.setdefault("SSE_HEARTBEAT_SECONDS", 15)
+    app.config.setdefault("SSE_MAX_SECONDS", 300)
+    app.config.setdefault("SSE_MAX_KEYS", 200)
+    app.config.setdefault("SSE_MAX_SUBSCRIBERS", 200)
+    app.config.setdefault("SSE_MAX_PER_CLIENT", 4)
+    app.config.setdefault("SSE_RETRY_SECONDS", 30)
@@ -0,0 +1,127 @@
+import logging
+import re
+from time import perf_counter
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Literals and IN-lists are replaced so the same query with other values shares a fingerprint
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+_listening = False
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised in strict mode when a request runs more statements than its budget."""
+
+
+class RequestQueryStats:
+    """Statement count, time and per-fingerprint counts for one request."""
+    __slots__ = ("count", "seconds", "fingerprints")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.fingerprints = {}  # fingerprint -> [count, seconds]
+
+    def add(self, statement, seconds):
+        self.count += 1
+        self.seconds += seconds
+        entry = self.fingerprints.get(statement)
+        if entry is None:
+            self.fingerprints[statement] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+    def repeated(self, threshold):
+        """Fingerprints run at least `threshold` times, most frequent first (likely N+1 loops)."""
+        merged = {}
+        for statement, (count, seconds) in self.fingerprints.items():
+            entry = merged.setdefault(fingerprint(statement), [0, 0.0])
+            entry[0] += count
+            entry[1] += seconds
+        hits = [(fp, count, seconds) for fp, (count, seconds) in merged.items() if count >= threshold]
+        return sorted(hits, key=lambda hit: hit[1], reverse=True)
+
+
+def fingerprint(statement):
+    """Normalize a SQL statement so repeated shapes compare equal."""
+    statement = _LITERALS.sub("?", statement)
+    statement = _IN_LISTS.sub("(?+)", statement)
+    return _WHITESPACE.sub(" ", statement).strip()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_started = perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is None or not has_request_context():
+        return
+    stats = g.get("query_stats")
+    if stats is not None:
+        stats.add(statement, perf_counter() - context._query_started)
+
+
+def query_budget_for(endpoint):
+    """Budget of the view behind `endpoint`: @query_budget if set, else SQL_QUERY_BUDGET."""
+    view = current_app.view_functions.get(endpoint)
+    budget = getattr(view, "query_budget", None)
+    return budget if budget is not None else current_app.config["SQL_QUERY_BUDGET"]
+
+
+def init_app(app):
+    """Count and time SQL statements per request and flag N+1 patterns."""
+    global _listening
+    app.config.setdefault("SQL_PROFILER_ENABLED", True)
+    app.config.setdefault("SQL_PROFILER_HEADER", False)
+    app.config.setdefault("SQL_PROFILER_STRICT", False)
+    app.config.setdefault("SQL_QUERY_BUDGET", None)
+    app.config.setdefault("SQL_N_PLUS_ONE_THRESHOLD", 5)
+    if not app.config["SQL_PROFILER_ENABLED"]:
+        return
+
+    # Listen on the Engine class so the primary and read engines are both covered
+    if not _listening:
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        _listening = True
+
+    @app.before_request
+    def start_query_stats():
+        g.query_stats = RequestQueryStats()
+
+    @app.after_request
+    def report_query_stats(response):
+        stats = g.pop("query_stats", None)
+        if stats is None:
+            return response
+        threshold = app.config["SQL_N_PLUS_ONE_THRESHOLD"]
+        repeated = stats.repeated(threshold)
+        budget = query_budget_for(request.endpoint)
+        over_budget = budget is not None and stats.count > budget
+
+        summary = f"{stats.count} queries; {stats.seconds * 1000:.1f}ms; n+1={len(repeated)}"
+        if app.config["SQL_PROFILER_HEADER"]:
+            response.headers["X-SQL-Queries"] = summary
+
+        if repeated or over_budget:
+            logger.warning(
+                "sql endpoint=%s queries=%d time_ms=%.1f budget=%s repeated=%s",
+                request.endpoint, stats.count, stats.seconds * 1000, budget,
+                "; ".join(f"{count}x {fp[:120]}" for fp, count, _ in repeated),
+            )
+        else:
+            logger.debug("sql endpoint=%s %s", request.endpoint, summary)
+
+        if over_budget and app.config["SQL_PROFILER_STRICT"]:
+            raise QueryBudgetExceeded(
+                f"{request.endpoint} ran {stats.count} queries, budget is {budget}"
+            )
+        return response
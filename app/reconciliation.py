@@ -0,0 +1,298 @@
+"""
+Availability reconciliation with set-based SQL.
+
+    expected availability = capacity
+                            - confirmed Booking.num_people (package bookings count
+                              against both their flight and their hotel;
+                              archived bookings count too)
+                            - units on live seat holds
+
+One grouped query per table finds every row whose counter drifted, and one
+UPDATE ... FROM fixes them all, so the cost is a scan of booking, not a query
+per row. Hotels split into per-night rows are checked night by night, with
+each stay counted only on its own nights. Bookings still waiting in the
+write-behind queue are not counted; drain it first (`flask drain-booking-queue`).
+
+Capacity is the one input not derived from bookings, so it is recorded when
+a row is created (add-service, the admin, materialized schedules) and moved
+by every deliberate restock (admin edits, bulk updates). Rows without one
+are NOT checked. Seeding them (`--seed`) takes capacity from the current
+counter, which accepts whatever drift the row already has for good: check
+those counters first.
+"""
+import logging
+from datetime import datetime
+from sqlalchemy import and_, func, insert, literal, null, select, union_all, update
+from app import db
+from app.models import (
+    Booking, BookingArchive, Flight, Hotel, HotelNight, HotelStay, InventoryCapacity, InventoryHold, InventoryLedger,
+)
+
+logger = logging.getLogger(__name__)
+
+# Booking/hold column that points at each inventory table, and the booking types that use it
+TARGETS = (
+    (Flight, Booking.flight_id, InventoryHold.flight_id, ("Flight", "PackageDeal")),
+    (Hotel, Booking.hotel_id, InventoryHold.hotel_id, ("Hotel", "PackageDeal")),
+)
+
+
+def _usage(model, booking_column, hold_column, service_types, now, item_id=None):
+    """(item_id, units) per row as grouped subqueries: whole-span bookings, and holds."""
+    hot = (
+        select(booking_column.label("item_id"), Booking.num_people.label("units"))
+        .where(Booking.is_confirmed.is_(True), Booking.service_type.in_(service_types), booking_column.isnot(None))
+    )
+    # Archived bookings still used up their units
+    archived_column = BookingArchive.__table__.c[booking_column.key]
+    archived = (
+        select(archived_column.label("item_id"), BookingArchive.num_people.label("units"))
+        .where(BookingArchive.is_confirmed.is_(True), BookingArchive.service_type.in_(service_types),
+               archived_column.isnot(None))
+    )
+    held = (
+        select(hold_column.label("item_id"), func.sum(InventoryHold.quantity).label("units"))
+        .where(hold_column.isnot(None), InventoryHold.expires_at > now)
+        .group_by(hold_column)
+    )
+    if model is Hotel:
+        # Stays hold rooms on their own nights only; see _night_expected
+        hot = hot.where(~select(HotelStay.booking_id).where(HotelStay.booking_id == Booking.id).exists())
+        archived = archived.where(BookingArchive.check_in.is_(None))
+    if item_id is not None:
+        hot = hot.where(booking_column == item_id)
+        archived = archived.where(archived_column == item_id)
+        held = held.where(hold_column == item_id)
+    rows = union_all(hot, archived).subquery()
+    booked = select(rows.c.item_id, func.sum(rows.c.units).label("units")).group_by(rows.c.item_id)
+    return booked.subquery(), held.subquery()
+
+
+def _is_split(model):
+    if model is not Hotel:
+        return literal(False)
+    return select(HotelNight.hotel_id).where(HotelNight.hotel_id == Hotel.id).exists()
+
+
+def _capacity_join(model):
+    return and_(InventoryCapacity.service_table == model.__tablename__, InventoryCapacity.item_id == model.id)
+
+
+def _expected(model, booking_column, hold_column, service_types, now):
+    booked, held = _usage(model, booking_column, hold_column, service_types, now)
+    expected = InventoryCapacity.capacity - func.coalesce(booked.c.units, 0) - func.coalesce(held.c.units, 0)
+    return (
+        select(model.id.label("id"), model.availability.label("availability"), expected.label("expected"))
+        .join(InventoryCapacity, _capacity_join(model))
+        .outerjoin(booked, booked.c.item_id == model.id)
+        .outerjoin(held, held.c.item_id == model.id)
+        .where(~_is_split(model))
+    )
+
+
+def _night_expected(now):
+    """Per hotel night: capacity - whole-span bookings - holds - stays covering the night."""
+    booked, held = _usage(Hotel, Booking.hotel_id, InventoryHold.hotel_id, ("Hotel", "PackageDeal"), now)
+    confirmed = union_all(
+        select(HotelStay.hotel_id, HotelStay.check_in, HotelStay.check_out, Booking.num_people)
+        .join(Booking, and_(Booking.id == HotelStay.booking_id, Booking.is_confirmed.is_(True))),
+        select(BookingArchive.hotel_id, BookingArchive.check_in, BookingArchive.check_out, BookingArchive.num_people)
+        .where(BookingArchive.check_in.isnot(None), BookingArchive.is_confirmed.is_(True)),
+    ).subquery()
+    stays = (
+        select(HotelNight.hotel_id, HotelNight.night, func.sum(confirmed.c.num_people).label("units"))
+        .join(confirmed, and_(
+            confirmed.c.hotel_id == HotelNight.hotel_id,
+            confirmed.c.check_in <= HotelNight.night,
+            confirmed.c.check_out > HotelNight.night,
+        ))
+        .group_by(HotelNight.hotel_id, HotelNight.night)
+        .subquery()
+    )
+    expected = (InventoryCapacity.capacity - func.coalesce(booked.c.units, 0)
+                - func.coalesce(held.c.units, 0) - func.coalesce(stays.c.units, 0))
+    return (
+        select(HotelNight.hotel_id, HotelNight.night, HotelNight.availability, expected.label("expected"))
+        .join(InventoryCapacity, and_(
+            InventoryCapacity.service_table == Hotel.__tablename__, InventoryCapacity.item_id == HotelNight.hotel_id))
+        .outerjoin(booked, booked.c.item_id == HotelNight.hotel_id)
+        .outerjoin(held, held.c.item_id == HotelNight.hotel_id)
+        .outerjoin(stays, and_(stays.c.hotel_id == HotelNight.hotel_id, stays.c.night == HotelNight.night))
+    )
+
+
+def _lowest_night():
+    return select(func.min(HotelNight.availability)).where(HotelNight.hotel_id == Hotel.id).scalar_subquery()
+
+
+def set_capacity(model, item_id, capacity):
+    """Record the capacity of a row created with `capacity` units; the caller commits."""
+    db.session.add(InventoryCapacity(service_table=model.__tablename__, item_id=item_id, capacity=capacity))
+
+
+def shift_capacity(model, item_id, delta):
+    """Move a recorded capacity along with a deliberate restock or cut, so reconcile keeps it."""
+    db.session.execute(
+        update(InventoryCapacity)
+        .where(InventoryCapacity.service_table == model.__tablename__, InventoryCapacity.item_id == item_id)
+        .values(capacity=InventoryCapacity.capacity + delta)
+    )
+
+
+def record_capacity(model, item_id, now=None):
+    """
+    Record one row's capacity from its current state (availability + booked +
+    held) unless it has one. inventory.split_hotel_nights calls this before a
+    hotel's first stay, while its single counter still tells the whole story;
+    like `--seed`, it trusts that counter.
+    """
+    now = now or datetime.utcnow()
+    if db.session.get(InventoryCapacity, (model.__tablename__, item_id)) is not None:
+        return False
+    _, booking_column, hold_column, service_types = next(t for t in TARGETS if t[0] is model)
+    booked, held = _usage(model, booking_column, hold_column, service_types, now, item_id=item_id)
+    capacity = db.session.execute(
+        select(model.availability + func.coalesce(select(booked.c.units).scalar_subquery(), 0)
+               + func.coalesce(select(held.c.units).scalar_subquery(), 0))
+        .where(model.id == item_id)
+    ).scalar()
+    if capacity is None:
+        return False
+    db.session.add(InventoryCapacity(service_table=model.__tablename__, item_id=item_id, capacity=capacity))
+    return True
+
+
+def count_missing_capacity():
+    """Rows reconcile cannot check because they have no recorded capacity."""
+    return sum(
+        db.session.execute(
+            select(func.count()).select_from(model).outerjoin(InventoryCapacity, _capacity_join(model))
+            .where(InventoryCapacity.item_id.is_(None), ~_is_split(model))
+        ).scalar()
+        for model, *_ in TARGETS
+    )
+
+
+def init_missing_capacity(now=None):
+    """
+    Give rows without a capacity one taken from their current state
+    (availability + booked + held), so they reconcile from here on. Any drift
+    they have now becomes part of their capacity. Returns the count.
+    """
+    now = now or datetime.utcnow()
+    created = 0
+    for model, booking_column, hold_column, service_types in TARGETS:
+        booked, held = _usage(model, booking_column, hold_column, service_types, now)
+        missing = (
+            select(
+                literal(model.__tablename__),
+                model.id,
+                model.availability + func.coalesce(booked.c.units, 0) + func.coalesce(held.c.units, 0),
+            )
+            .outerjoin(InventoryCapacity, _capacity_join(model))
+            .outerjoin(booked, booked.c.item_id == model.id)
+            .outerjoin(held, held.c.item_id == model.id)
+            .where(InventoryCapacity.item_id.is_(None), ~_is_split(model))
+        )
+        result = db.session.execute(
+            insert(InventoryCapacity).from_select(["service_table", "item_id", "capacity"], missing)
+        )
+        created += result.rowcount
+    return created
+
+
+def find_discrepancies(now=None):
+    """
+    [(table, id, availability, expected)] for every drifted flight, hotel and
+    hotel night; night ids read "hotel_id/YYYY-MM-DD".
+    """
+    now = now or datetime.utcnow()
+    found = []
+    for model, booking_column, hold_column, service_types in TARGETS:
+        expected = _expected(model, booking_column, hold_column, service_types, now).subquery()
+        rows = db.session.execute(
+            select(expected.c.id, expected.c.availability, expected.c.expected)
+            .where(expected.c.availability != expected.c.expected)
+            .order_by(expected.c.id)
+        )
+        found.extend((model.__tablename__, *row) for row in rows)
+
+    nights = _night_expected(now).subquery()
+    rows = db.session.execute(
+        select(nights.c.hotel_id, nights.c.night, nights.c.availability, nights.c.expected)
+        .where(nights.c.availability != nights.c.expected)
+        .order_by(nights.c.hotel_id, nights.c.night)
+    )
+    found.extend((HotelNight.__tablename__, f"{hotel_id}/{night}", availability, expected)
+                 for hotel_id, night, availability, expected in rows)
+    # A split hotel's counter must equal its fewest rooms on any night
+    rows = db.session.execute(
+        select(Hotel.id, Hotel.availability, _lowest_night())
+        .where(_is_split(Hotel), Hotel.availability != _lowest_night())
+        .order_by(Hotel.id)
+    )
+    found.extend((Hotel.__tablename__, *row) for row in rows)
+    return found
+
+
+LEDGER_COLUMNS = ["service_table", "item_id", "delta", "reason", "first_night", "last_night", "created_at"]
+
+
+def fix_discrepancies(now=None):
+    """
+    Set every drifted counter to its expected value with one UPDATE per table,
+    ledgering each correction first; returns the count.
+    """
+    now = now or datetime.utcnow()
+    fixed = 0
+    for model, booking_column, hold_column, service_types in TARGETS:
+        expected = _expected(model, booking_column, hold_column, service_types, now).subquery()
+        db.session.execute(insert(InventoryLedger).from_select(LEDGER_COLUMNS, select(
+            literal(model.__tablename__), expected.c.id, expected.c.expected - expected.c.availability,
+            literal("reconcile"), null(), null(), literal(now, db.DateTime),
+        ).where(expected.c.availability != expected.c.expected)))
+        result = db.session.execute(
+            update(model)
+            .where(model.id == expected.c.id, model.availability != expected.c.expected)
+            .values(availability=expected.c.expected)
+            .execution_options(synchronize_session=False)
+        )
+        fixed += result.rowcount
+
+    nights = _night_expected(now).subquery()
+    db.session.execute(insert(InventoryLedger).from_select(LEDGER_COLUMNS, select(
+        literal(Hotel.__tablename__), nights.c.hotel_id, nights.c.expected - nights.c.availability,
+        literal("reconcile"), nights.c.night, nights.c.night, literal(now, db.DateTime),
+    ).where(nights.c.availability != nights.c.expected)))
+    result = db.session.execute(
+        update(HotelNight)
+        .where(HotelNight.hotel_id == nights.c.hotel_id, HotelNight.night == nights.c.night,
+               HotelNight.availability != nights.c.expected)
+        .values(availability=nights.c.expected)
+        .execution_options(synchronize_session=False)
+    )
+    fixed += result.rowcount
+    result = db.session.execute(
+        update(Hotel)
+        .where(_is_split(Hotel), Hotel.availability != _lowest_night())
+        .values(availability=_lowest_night())
+        .execution_options(synchronize_session=False)
+    )
+    return fixed + result.rowcount
+
+
+def reconcile(fix=False, seed=False):
+    """
+    Returns (discrepancies, capacities seeded, rows fixed, rows left unchecked);
+    commits only when something changed. Missing capacities are seeded only
+    with `seed`.
+    """
+    now = datetime.utcnow()
+    created = init_missing_capacity(now) if seed else 0
+    discrepancies = find_discrepancies(now)
+    fixed = fix_discrepancies(now) if fix and discrepancies else 0
+    if created or fixed:
+        db.session.commit()
+    if discrepancies:
+        logger.warning("Availability drifted on %d rows (%d fixed)", len(discrepancies), fixed)
+    return discrepancies, created, fixed, count_missing_capacity()
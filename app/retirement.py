@@ -0,0 +1,54 @@
+"""
+Retirement of departed flights and hotels past their checkout date.
+
+`flask retire-inventory` flips is_active off for flights that have departed
+and hotels whose checkout_date has passed, a batch of ids per transaction.
+Rows stay in place because bookings, packages and the ledger point at them.
+Search filters on is_active. The partial indexes ix_flight_live_departure
+and ix_hotel_live_checkout contain live rows only, so a search scans
+sellable inventory however much history piles up. The admin lists live
+rows unless asked for retired ones.
+"""
+import logging
+from datetime import datetime
+from sqlalchemy import func, select, update
+from app import db
+from app.models import Flight, Hotel
+
+logger = logging.getLogger(__name__)
+
+# The column whose passing ends each model's sale
+EXPIRES = ((Flight, Flight.departure_time), (Hotel, Hotel.checkout_date))
+
+
+def expired(model, column, now):
+    return select(model.id).where(model.is_active, column < now).order_by(model.id)
+
+
+def count_expired(now=None):
+    """{table: live rows past their date}."""
+    now = now or datetime.utcnow()
+    return {
+        model.__tablename__: db.session.execute(select(func.count()).select_from(expired(model, column, now).subquery())).scalar()
+        for model, column in EXPIRES
+    }
+
+
+def retire(batch_size=1000, now=None):
+    """Retire expired rows one committed batch at a time; returns {table: rows retired}."""
+    now = now or datetime.utcnow()
+    retired = {}
+    for model, column in EXPIRES:
+        retired[model.__tablename__] = 0
+        while True:
+            ids = db.session.execute(expired(model, column, now).limit(batch_size)).scalars().all()
+            if not ids:
+                break
+            db.session.execute(
+                update(model).where(model.id.in_(ids)).values(is_active=False)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            retired[model.__tablename__] += len(ids)
+        logger.info("Retired %d %s rows", retired[model.__tablename__], model.__tablename__)
+    return retired
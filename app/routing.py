@@ -0,0 +1,73 @@
+import time
+from flask import current_app, g, has_app_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# Bind key of the read-only engine in SQLALCHEMY_BINDS
+READ_BIND = "read"
+
+# Admin endpoints that only list or show rows
+ADMIN_READ_ENDPOINTS = ("index_view", "details_view")
+
+
+class RoutingSession(Session):
+    """
+    Session that sends queries to the read engine on read-only requests.
+    Flushes and Core INSERT/UPDATE/DELETE statements always go to the primary
+    so writes never hit the replica.
+    """
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        writes = self._flushing or getattr(clause, "is_dml", False)
+        if bind is None and not writes and _replica_requested():
+            engine = self._db.engines.get(READ_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _replica_requested():
+    return has_app_context() and g.get("use_read_replica", False)
+
+
+def read_engine_uri(primary_uri):
+    """Build a read-only URI for a file-based SQLite primary, or None."""
+    url = make_url(primary_uri)
+    if not url.drivername.startswith("sqlite") or url.database in (None, "", ":memory:"):
+        return None
+    if url.query.get("uri"):
+        return None  # Already a driver-level URI, configure READ_DATABASE_URI explicitly
+    return f"sqlite:///file:{url.database}?mode=ro&uri=true"
+
+
+def use_read_replica():
+    """Route the rest of this request to the read engine, unless the user just wrote."""
+    if session.get("_rw_until", 0) > time.time():
+        return  # Read-your-writes: stay on the primary for a little while
+    g.use_read_replica = True
+
+
+def mark_recent_write():
+    """Pin this user's reads to the primary after a write they expect to see."""
+    g.use_read_replica = False
+    session["_rw_until"] = time.time() + current_app.config["READ_YOUR_WRITES_SECONDS"]
+
+
+def _set_sqlite_wal(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.close()
+
+
+def init_app(app, db):
+    """Enable WAL on the SQLite primary and route admin list views to the read engine."""
+    with app.app_context():
+        primary = db.engines[None]
+        if app.config["SQLITE_WAL"] and primary.url.drivername.startswith("sqlite"):
+            event.listen(primary, "connect", _set_sqlite_wal)
+
+    @app.before_request
+    def route_admin_reads():
+        endpoint = request.endpoint or ""
+        if request.method == "GET" and endpoint.rsplit(".", 1)[-1] in ADMIN_READ_ENDPOINTS:
+            use_read_replica()
@@ -0,0 +1,160 @@
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from flask import g, request
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+logger = logging.getLogger(__name__)
+
+PROFILE_SUFFIX = ".collapsed"
+
+
+class StackSampler:
+    """
+    Samples one thread's stack from a background thread every `interval` seconds.
+    The result is in collapsed-stack format ("outer;inner;leaf count"), ready for
+    flamegraph.pl or speedscope.
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+
+
+def _serializer(app):
+    return URLSafeTimedSerializer(app.config["SECRET_KEY"], salt="request-profiler")
+
+
+def make_profile_token(app):
+    """Token for the PROFILER_HEADER header that forces profiling of a request."""
+    return _serializer(app).dumps("profile")
+
+
+def _token_is_valid(app, token):
+    try:
+        _serializer(app).loads(token, max_age=app.config["PROFILER_TOKEN_MAX_AGE"])
+        return True
+    except BadSignature:
+        return False
+
+
+def _write_profile(directory, max_files, meta, stacks):
+    os.makedirs(directory, exist_ok=True)
+    name = f"{int(meta['started'] * 1000)}-{meta['duration_ms']:.0f}ms{PROFILE_SUFFIX}"
+    with open(os.path.join(directory, name), "w") as f:
+        for key, value in meta.items():
+            # A header is one line; the path or query string may carry a newline
+            value = str(value).replace("\r", " ").replace("\n", " ")
+            f.write(f"# {key}={value}\n")
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+
+    # Rotate: file names start with the timestamp, so the oldest sort first
+    files = sorted(n for n in os.listdir(directory) if n.endswith(PROFILE_SUFFIX))
+    for old in files[:-max_files]:
+        os.remove(os.path.join(directory, old))
+
+
+def read_profile(path, header_only=False):
+    """Return (meta, [(stack, count)]) for a profile file."""
+    meta, stacks = {}, []
+    with open(path) as f:
+        for line in f:
+            if line.startswith("# "):
+                key, _, value = line[2:].rstrip("\n").partition("=")
+                meta[key] = value
+            else:
+                stack, _, count = line.rstrip("\n").rpartition(" ")
+                if not count.isdigit():
+                    continue  # Rest of a header written before values were kept to one line
+                if header_only:
+                    break
+                stacks.append((stack, int(count)))
+    return meta, stacks
+
+
+def list_profiles(directory):
+    """Metadata of every captured profile, slowest request first."""
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in os.listdir(directory):
+        if name.endswith(PROFILE_SUFFIX):
+            meta, _ = read_profile(os.path.join(directory, name), header_only=True)
+            meta["name"] = name
+            profiles.append(meta)
+    return sorted(profiles, key=lambda meta: float(meta.get("duration_ms", 0)), reverse=True)
+
+
+def init_app(app):
+    """Profile a sample of requests (or those with a signed header) with a stack sampler."""
+    app.config.setdefault("PROFILER_SAMPLE_RATE", 0.0)
+    app.config.setdefault("PROFILER_HEADER", "X-Profile-Token")
+    app.config.setdefault("PROFILER_TOKEN_MAX_AGE", 3600)
+    app.config.setdefault("PROFILER_INTERVAL", 0.005)
+    app.config.setdefault("PROFILER_DIR", os.path.join(app.instance_path, "profiles"))
+    app.config.setdefault("PROFILER_MAX_FILES", 200)
+
+    @app.before_request
+    def maybe_start_profiler():
+        rate = app.config["PROFILER_SAMPLE_RATE"]
+        token = request.headers.get(app.config["PROFILER_HEADER"])
+        if not (rate and random.random() < rate) and not (token and _token_is_valid(app, token)):
+            return
+        sampler = StackSampler(threading.get_ident(), app.config["PROFILER_INTERVAL"])
+        sampler.start()
+        g.profiler = (sampler, time.time(), time.perf_counter())
+
+    @app.after_request
+    def stop_profiler(response):
+        profiler = g.pop("profiler", None)
+        if profiler is None:
+            return response
+        sampler, started, started_perf = profiler
+        sampler.stop()
+        meta = {
+            "started": started,
+            "duration_ms": (time.perf_counter() - started_perf) * 1000,
+            "method": request.method,
+            "path": request.path,
+            "endpoint": request.endpoint,
+            "status": response.status_code,
+            "samples": sum(sampler.stacks.values()),
+        }
+        directory, max_files = app.config["PROFILER_DIR"], app.config["PROFILER_MAX_FILES"]
+
+        # Write once the response has gone out, so the client doesn't wait on the disk
+        def write():
+            try:
+                _write_profile(directory, max_files, meta, sampler.stacks)
+            except OSError as e:
+                logger.warning("Could not write request profile: %s", e)
+
+        response.call_on_close(write)
+        return response
@@ -0,0 +1,173 @@
+"""
+Recurring flight schedules, materialized into Flight rows lazily.
+
+A FlightSchedule stands for every departure of a route: its weekdays at one
+time of day between valid_from and valid_to. Flight rows exist only for
+departures somebody can act on:
+
+- `flask materialize-schedules` inserts the departures of the next
+  SCHEDULE_HORIZON_DAYS in bulk (run it daily from cron), so the admin,
+  holds, carts and packages see ordinary flights;
+- a departure beyond the horizon is materialized when it is first booked.
+
+Flight search adds the schedules' own departures for SCHEDULE_SEARCH_DAYS
+after the searched date that have no Flight row yet, generated from the
+schedule rows rather than read from flight. The unique (schedule_id,
+departure_time) constraint makes materialization idempotent across
+processes. Each new instance gets its capacity recorded for reconciliation.
+"""
+import logging
+from datetime import date, datetime, timedelta
+from flask import current_app
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from app import alerts, db
+from app.models import Flight, FlightSchedule, InventoryCapacity
+
+logger = logging.getLogger(__name__)
+
+
+class Departure:
+    """A scheduled departure without a Flight row yet, shaped like one for the search results."""
+
+    fare_classes = ()
+
+    def __init__(self, schedule, departure_time):
+        self.schedule = schedule
+        self.schedule_id = schedule.id
+        self.airline = schedule.airline
+        self.flight_number = schedule.flight_number
+        self.departure_city = schedule.departure_city
+        self.destination = schedule.destination
+        self.departure_time = departure_time
+        self.arrival_time = departure_time + timedelta(minutes=schedule.duration_minutes)
+        self.price = schedule.price
+        self.availability = schedule.capacity
+
+
+def departures(schedule, first, last):
+    """Departure datetimes of `schedule` on days first..last inclusive."""
+    day = max(first, schedule.valid_from)
+    while day <= min(last, schedule.valid_to):
+        if str(day.weekday()) in schedule.weekdays:
+            yield datetime.combine(day, schedule.departure_time)
+        day += timedelta(days=1)
+
+
+def _materialized(schedule_ids, first, last):
+    """{(schedule_id, departure_time)} that already have a Flight row, in one query."""
+    if not schedule_ids:
+        return set()
+    rows = db.session.execute(
+        select(Flight.schedule_id, Flight.departure_time).where(
+            Flight.schedule_id.in_(schedule_ids),
+            Flight.departure_time >= datetime.combine(first, datetime.min.time()),
+            Flight.departure_time < datetime.combine(last + timedelta(days=1), datetime.min.time()),
+        )
+    ).all()
+    return {tuple(row) for row in rows}
+
+
+def _row(schedule, departure_time):
+    return {
+        "airline": schedule.airline,
+        "flight_number": schedule.flight_number,
+        "departure_city": schedule.departure_city,
+        "destination": schedule.destination,
+        "departure_time": departure_time,
+        "arrival_time": departure_time + timedelta(minutes=schedule.duration_minutes),
+        "price": schedule.price,
+        "availability": schedule.capacity,
+        "schedule_id": schedule.id,
+        "is_active": True,
+    }
+
+
+def _record_capacity(schedule, flight_ids):
+    db.session.execute(insert(InventoryCapacity), [
+        {"service_table": Flight.__tablename__, "item_id": flight_id, "capacity": schedule.capacity}
+        for flight_id in flight_ids
+    ])
+
+
+def materialize(schedule, departure_time):
+    """The Flight for one departure, inserted if it has none yet; the caller commits."""
+    if not schedule.is_active or not schedule.flies_on(departure_time.date()) \
+            or departure_time.time() != schedule.departure_time:
+        return None
+    existing = select(Flight).where(Flight.schedule_id == schedule.id, Flight.departure_time == departure_time)
+    flight = db.session.execute(existing).scalar_one_or_none()
+    if flight is not None:
+        return flight
+    try:
+        with db.session.begin_nested():
+            flight_id = db.session.execute(insert(Flight).values(_row(schedule, departure_time))).inserted_primary_key[0]
+            _record_capacity(schedule, [flight_id])
+            alerts.mark_changed(Flight.__tablename__, flight_id)
+    except IntegrityError:
+        pass  # Another request materialized it first
+    return db.session.execute(existing).scalar_one()
+
+
+def materialize_horizon(days=None, today=None):
+    """Insert every missing departure of the next `days` days, one commit per schedule; returns the count."""
+    days = current_app.config["SCHEDULE_HORIZON_DAYS"] if days is None else days
+    today = today or date.today()
+    last = today + timedelta(days=days)
+    now = datetime.utcnow()
+    schedules = db.session.execute(
+        select(FlightSchedule).where(
+            FlightSchedule.is_active, FlightSchedule.valid_to >= today, FlightSchedule.valid_from <= last,
+        ).order_by(FlightSchedule.id)
+    ).scalars().all()
+    created = 0
+    for schedule in schedules:
+        have = _materialized([schedule.id], today, last)
+        rows = [
+            _row(schedule, departure_time)
+            for departure_time in departures(schedule, today, last)
+            if departure_time > now and (schedule.id, departure_time) not in have
+        ]
+        if not rows:
+            continue
+        db.session.execute(insert(Flight), rows)
+        new = [Flight.schedule_id == schedule.id, Flight.departure_time.in_([row["departure_time"] for row in rows])]
+        _record_capacity(schedule, db.session.execute(select(Flight.id).where(*new)).scalars())
+        alerts.mark_changed_where(Flight, new)
+        db.session.commit()
+        created += len(rows)
+        logger.info("Materialized %d departures of schedule %d", len(rows), schedule.id)
+    return created
+
+
+def search(destination, departure_city, first, quantity, days=None):
+    """
+    Departures of matching schedules on `first` and the following days that
+    have no Flight row yet (those are found by the ordinary flight query).
+    """
+    days = current_app.config["SCHEDULE_SEARCH_DAYS"] if days is None else days
+    last = first + timedelta(days=days - 1)
+    schedules = db.session.execute(
+        select(FlightSchedule).where(
+            FlightSchedule.is_active,
+            FlightSchedule.valid_to >= first,
+            FlightSchedule.valid_from <= last,
+            FlightSchedule.destination.ilike(f"%{destination}%"),
+            FlightSchedule.departure_city.ilike(f"%{departure_city}%"),
+            FlightSchedule.capacity >= quantity,
+        )
+    ).scalars().all()
+    have = _materialized([schedule.id for schedule in schedules], first, last)
+    now = datetime.utcnow()
+    found = [
+        Departure(schedule, departure_time)
+        for schedule in schedules
+        for departure_time in departures(schedule, first, last)
+        if departure_time > now and (schedule.id, departure_time) not in have
+    ]
+    return sorted(found, key=lambda departure: departure.departure_time)
+
+
+def init_app(app):
+    app.config.setdefault("SCHEDULE_HORIZON_DAYS", 60)
+    app.config.setdefault("SCHEDULE_SEARCH_DAYS", 7)
@@ -0,0 +1,244 @@
+"""
+Fare classes and bitset seat maps.
+
+A flight's seats are one bit each in seat_map.taken (1 = taken), row by row
+in layout order, so a 300-seat aircraft is a 38-byte blob instead of 300
+rows. Each fare class owns a block of rows with its own price and seat
+count; class counts are booking limits nested under Flight.availability,
+which stays the flight's total. Counting free seats, checking chosen seats
+and finding N adjacent free seats for a group are shifts and masks on one
+Python int.
+
+The blob is written with a version check (UPDATE ... WHERE version = ?) and
+retried on conflict, so two bookings never get the same seat. Nothing here
+commits; the caller owns the transaction.
+"""
+import logging
+from sqlalchemy import select, update
+from app import db
+from app.models import FareClass, Flight, SeatMap
+
+logger = logging.getLogger(__name__)
+
+AISLE = "-"
+CABINS = (("F", "First"), ("J", "Business"), ("W", "Premium Economy"), ("Y", "Economy"))
+MAX_RETRIES = 5
+
+
+class SeatUnavailable(Exception):
+    """Raised when chosen seats are taken or outside the cabin, or too few are free."""
+
+
+def seat_letters(layout):
+    return layout.replace(AISLE, "")
+
+
+def row_mask(width, first_row, last_row):
+    """Bits of every seat in rows first_row..last_row (1-based)."""
+    return ((1 << ((last_row - first_row + 1) * width)) - 1) << ((first_row - 1) * width)
+
+
+def free_count(taken, mask):
+    return (~taken & mask).bit_count()
+
+
+def _row_starts(width, quantity, rows):
+    # Seats with room for `quantity` seats after them in the same row
+    in_row = (1 << (width - quantity + 1)) - 1
+    mask = 0
+    for row in range(rows):
+        mask |= in_row << (row * width)
+    return mask
+
+
+def find_block(free, quantity, width, rows):
+    """
+    Index of the first of `quantity` adjacent free seats, or None. A bit of
+    `starts` survives only if the next quantity-1 seats are free too; groups
+    that fit in a row never straddle two rows.
+    """
+    starts = free
+    for offset in range(1, quantity):
+        starts &= free >> offset
+    if quantity <= width:
+        starts &= _row_starts(width, quantity, rows)
+    if not starts:
+        return None
+    return (starts & -starts).bit_length() - 1
+
+
+def pick_seats(free, quantity, width, rows):
+    """Bits for `quantity` seats: one adjacent block if there is one, else the lowest free seats."""
+    start = find_block(free, quantity, width, rows)
+    if start is not None:
+        return ((1 << quantity) - 1) << start
+    if free.bit_count() < quantity:
+        raise SeatUnavailable(f"Fewer than {quantity} seats free")
+    picked = 0
+    for _ in range(quantity):
+        lowest = free & -free
+        picked |= lowest
+        free ^= lowest
+    return picked
+
+
+def seat_label(index, letters):
+    return f"{index // len(letters) + 1}{letters[index % len(letters)]}"
+
+
+def labels(bits, letters):
+    found = []
+    while bits:
+        lowest = bits & -bits
+        found.append(seat_label(lowest.bit_length() - 1, letters))
+        bits ^= lowest
+    return found
+
+
+def seat_bits(seats, letters, rows):
+    """Bits for labels like ['12A', '12B']; raises SeatUnavailable for unknown seats."""
+    bits = 0
+    for seat in seats:
+        seat = seat.strip().upper()
+        row, letter = seat[:-1], seat[-1:]
+        if not row.isdigit() or letter not in letters or not 1 <= int(row) <= rows:
+            raise SeatUnavailable(f"No seat {seat}")
+        bits |= 1 << ((int(row) - 1) * len(letters) + letters.index(letter))
+    return bits
+
+
+def _load(flight_id):
+    return db.session.execute(
+        select(SeatMap.layout, SeatMap.rows, SeatMap.taken, SeatMap.version).where(SeatMap.flight_id == flight_id)
+    ).first()
+
+
+def _write(flight_id, seat_map, taken):
+    result = db.session.execute(
+        update(SeatMap)
+        .where(SeatMap.flight_id == flight_id, SeatMap.version == seat_map.version)
+        .values(taken=taken.to_bytes(len(seat_map.taken), "little"), version=seat_map.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def fare_for(flight_id, code):
+    """The flight's fare class with this code, or None."""
+    if not code:
+        return None
+    return db.session.execute(
+        select(FareClass).where(FareClass.flight_id == flight_id, FareClass.code == code)
+    ).scalar_one_or_none()
+
+
+def flights_with_fare(code, quantity):
+    """Filter for Flight queries: a `code` cabin with `quantity` seats left (probes uq_fare_class_flight_code)."""
+    return (
+        select(FareClass.id)
+        .where(FareClass.flight_id == Flight.id, FareClass.code == code, FareClass.availability >= quantity)
+        .exists()
+    )
+
+
+def setup_flight(flight, layout, cabins):
+    """
+    Give a flight a seat map and fare classes. `cabins` is a list of
+    (code, name, rows, price) from the front of the aircraft back.
+    """
+    width = len(seat_letters(layout))
+    row = 1
+    fares = []
+    for code, name, rows, price in cabins:
+        fares.append(FareClass(flight_id=flight.id, code=code, name=name, price=price,
+                               availability=rows * width, first_row=row, last_row=row + rows - 1))
+        row += rows
+    total_rows = row - 1
+    db.session.add(SeatMap(flight_id=flight.id, layout=layout, rows=total_rows,
+                           taken=bytes(-(-total_rows * width // 8)), version=0))
+    db.session.add_all(fares)
+    return fares
+
+
+def allocate(fare, quantity, seats=None):
+    """
+    Take `quantity` seats in the fare's cabin, the chosen `seats` if given,
+    and return their labels. Flights without a seat map get no seats.
+    """
+    for _ in range(MAX_RETRIES):
+        seat_map = _load(fare.flight_id)
+        if seat_map is None:
+            return []
+        letters = seat_letters(seat_map.layout)
+        taken = int.from_bytes(seat_map.taken, "little")
+        free = ~taken & row_mask(len(letters), fare.first_row, fare.last_row)
+        if seats:
+            picked = seat_bits(seats, letters, seat_map.rows)
+            if picked.bit_count() != quantity:
+                raise SeatUnavailable(f"Choose exactly {quantity} seats")
+            if picked & ~free:
+                raise SeatUnavailable(f"{', '.join(labels(picked & ~free, letters))} not available in {fare.name}")
+        else:
+            picked = pick_seats(free, quantity, len(letters), seat_map.rows)
+        if _write(fare.flight_id, seat_map, taken | picked):
+            return labels(picked, letters)
+        logger.debug("Seat map of flight %s changed underneath us; retrying", fare.flight_id)
+    raise SeatUnavailable("Seat map is busy, please try again")
+
+
+def release_seats(flight_id, seats):
+    """Give seats back by label."""
+    if not seats:
+        return
+    for _ in range(MAX_RETRIES):
+        seat_map = _load(flight_id)
+        if seat_map is None:
+            return
+        letters = seat_letters(seat_map.layout)
+        bits = seat_bits([seat for seat in seats if seat], letters, seat_map.rows)
+        if _write(flight_id, seat_map, int.from_bytes(seat_map.taken, "little") & ~bits):
+            return
+    raise SeatUnavailable("Seat map is busy, please try again")
+
+
+def resize(assignment, quantity):
+    """Grow or shrink a booking's seats to `quantity`; returns the new labels."""
+    current = assignment.seat_list
+    if not current or len(current) == quantity:
+        return current
+    if quantity < len(current):
+        release_seats(assignment.flight_id, current[quantity:])
+        return current[:quantity]
+    return current + allocate(assignment.fare_class, quantity - len(current))
+
+
+def seat_rows(flight_id):
+    """[(row, [(label, taken)])] for rendering; aisles are (None, False)."""
+    seat_map = _load(flight_id)
+    if seat_map is None:
+        return []
+    letters = seat_letters(seat_map.layout)
+    taken = int.from_bytes(seat_map.taken, "little")
+    rows = []
+    for row in range(1, seat_map.rows + 1):
+        cells = []
+        column = 0
+        for char in seat_map.layout:
+            if char == AISLE:
+                cells.append((None, False))
+                continue
+            index = (row - 1) * len(letters) + column
+            cells.append((f"{row}{char}", bool(taken >> index & 1)))
+            column += 1
+        rows.append((row, cells))
+    return rows
+
+
+def free_by_fare(flight_id, fares):
+    """{fare class id: free seats}, counted with popcount over each cabin's rows."""
+    seat_map = _load(flight_id)
+    if seat_map is None:
+        return {}
+    width = len(seat_letters(seat_map.layout))
+    taken = int.from_bytes(seat_map.taken, "little")
+    return {fare.id: free_count(taken, row_mask(width, fare.first_row, fare.last_row)) for fare in fares}
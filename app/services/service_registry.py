@@ -1,15 +1,7 @@
 import logging
 
-# Set up logging for services
+# Level and handlers come from app.logging_config
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
-handler = logging.StreamHandler()
-formatter = logging.Formatter(
-    '%(asctime)s %(levelname)s %(name)s : %(message)s'
-)
-handler.setFormatter(formatter)
-if not logger.handlers:
-    logger.addHandler(handler)
 
 # Service registry dictionary
 service_registry = {}
@@ -0,0 +1,152 @@
+"""
+Opt-in capture of production traffic for benchmarks/replay.py.
+
+TrafficRecorder wraps the WSGI app and appends one JSON line per request to
+TRAFFIC_CAPTURE_PATH: the time, a pseudonymous client ("user:<id>" or a
+short hash of address and user agent), method, path, query string, the
+url-encoded form body, a whitelist of session keys (SESSION_KEYS), the
+response status and the duration in milliseconds. Response bodies, headers,
+cookies and JSON or multipart bodies are never written, nor are form bodies
+over MAX_FORM_BYTES. Static files, /metrics and the SSE stream are skipped.
+
+Form fields named in REDACT_FIELDS (passwords, CSRF tokens, names, emails and
+contact messages) are stored as "<redacted>"; the session whitelist leaves out
+names and emails, which replay looks up again from the user id.
+
+Capture is off unless TRAFFIC_CAPTURE_PATH is set when the app is created,
+e.g. create_app({"TRAFFIC_CAPTURE_PATH": "traffic.jsonl"});
+TRAFFIC_SESSION_KEYS and TRAFFIC_REDACT_FIELDS override the two lists.
+"""
+import atexit
+import hashlib
+import io
+import json
+import logging
+import threading
+import time
+from urllib.parse import parse_qsl
+
+logger = logging.getLogger(__name__)
+
+# Session keys that steer the views; names and emails are looked up again on replay
+SESSION_KEYS = (
+    "user_id", "user_authenticated", "admin_logged_in", "num_people", "destination",
+    "departure_city", "departure_time", "return_date", "check_in", "check_out",
+    "booking_date", "min_price", "max_price", "fare_class",
+)
+REDACTED = "<redacted>"
+REDACT_FIELDS = ("password", "confirm_password", "csrf_token", "email", "name", "message")
+SKIP_PREFIXES = ("/static/", "/metrics", "/availability/stream")
+MAX_FORM_BYTES = 64 * 1024
+
+
+class TrafficRecorder:
+    """
+    WSGI middleware that appends one compact JSON line per request:
+    timestamp, pseudonymous client, method, path, query, sanitized form fields,
+    whitelisted session state, status and duration.
+    """
+
+    def __init__(self, app, path, session_keys=SESSION_KEYS, redact_fields=REDACT_FIELDS):
+        self.app = app
+        self.wsgi_app = app.wsgi_app
+        self.session_keys = session_keys
+        self.redact_fields = set(redact_fields)
+        self._lock = threading.Lock()
+        self._file = open(path, "a", buffering=1, encoding="utf-8")  # Line buffered
+        atexit.register(self.close)
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def _session(self, environ):
+        """Whitelisted keys of the incoming (signed cookie) session."""
+        cookie_name = self.app.config["SESSION_COOKIE_NAME"]
+        cookie = None
+        for part in environ.get("HTTP_COOKIE", "").split(";"):
+            name, _, value = part.strip().partition("=")
+            if name == cookie_name:
+                cookie = value
+        if not cookie:
+            return {}
+        serializer = self.app.session_interface.get_signing_serializer(self.app)
+        try:
+            data = serializer.loads(cookie)
+        except Exception:
+            return {}  # Tampered or signed with another key
+        return {key: data[key] for key in self.session_keys if key in data}
+
+    def _form(self, environ):
+        """Sanitized url-encoded body; the body is put back for the app to read."""
+        if not environ.get("CONTENT_TYPE", "").startswith("application/x-www-form-urlencoded"):
+            return None
+        try:
+            length = int(environ.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            return None
+        if not length or length > MAX_FORM_BYTES:
+            return None
+        body = environ["wsgi.input"].read(length)
+        environ["wsgi.input"] = io.BytesIO(body)
+        return {
+            key: REDACTED if key in self.redact_fields else value
+            for key, value in parse_qsl(body.decode("utf-8", "replace"), keep_blank_values=True)
+        }
+
+    def _client(self, environ, state):
+        # Users by id, anonymous visitors by a hash of address and browser
+        if state.get("user_id"):
+            return f"user:{state['user_id']}"
+        seed = f"{environ.get('REMOTE_ADDR')}|{environ.get('HTTP_USER_AGENT')}"
+        return "anon:" + hashlib.sha1(seed.encode()).hexdigest()[:12]
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        if path.startswith(SKIP_PREFIXES):
+            return self.wsgi_app(environ, start_response)
+
+        state = self._session(environ)
+        record = {"ts": round(time.time(), 3), "client": self._client(environ, state),
+                  "method": environ.get("REQUEST_METHOD"), "path": path}
+        if environ.get("QUERY_STRING"):
+            record["query"] = environ["QUERY_STRING"]
+        form = self._form(environ)
+        if form:
+            record["form"] = form
+        if state:
+            record["session"] = state
+
+        status = []
+
+        def capture_status(status_line, headers, exc_info=None):
+            status.append(status_line)
+            return start_response(status_line, headers, exc_info)
+
+        started = time.perf_counter()
+        try:
+            return self.wsgi_app(environ, capture_status)
+        finally:
+            record["status"] = int(status[0].split(" ", 1)[0]) if status else 500
+            record["ms"] = round((time.perf_counter() - started) * 1000, 3)
+            line = json.dumps(record, separators=(",", ":"), default=str)
+            try:
+                with self._lock:
+                    self._file.write(line + "\n")
+            except (OSError, ValueError) as e:
+                logger.warning("Could not record request: %s", e)
+
+
+def init_app(app):
+    """Record sanitized traffic to TRAFFIC_CAPTURE_PATH (JSONL) when it is set."""
+    app.config.setdefault("TRAFFIC_CAPTURE_PATH", None)
+    app.config.setdefault("TRAFFIC_SESSION_KEYS", SESSION_KEYS)
+    app.config.setdefault("TRAFFIC_REDACT_FIELDS", REDACT_FIELDS)
+    if not app.config["TRAFFIC_CAPTURE_PATH"]:
+        return
+    app.wsgi_app = TrafficRecorder(
+        app, app.config["TRAFFIC_CAPTURE_PATH"],
+        app.config["TRAFFIC_SESSION_KEYS"], app.config["TRAFFIC_REDACT_FIELDS"],
+    )
+    logger.info("Recording traffic to %s", app.config["TRAFFIC_CAPTURE_PATH"])
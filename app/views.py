@@ -1,18 +1,23 @@
-from asyncio.log import logger
+import json
+import logging
 from datetime import datetime, timedelta
+from time import perf_counter
 from sqlite3 import IntegrityError
 from flask import (
+    abort,
     current_app,
     flash,
+    jsonify,
     redirect,
     render_template,
     request,
     session,
     url_for,
     Blueprint,
+    Response,
 )
 from sqlalchemy import func
-from app import db
+from app import db, metrics
 from app.context_managers import BookingContext
 from app.forms import (
     RegistrationForm,
@@ -22,17 +27,26 @@ from app.forms import (
     EditProfileForm,
     UpdateBookingForm
 )
-from app.models import Contact, Flight, Hotel, PackageDeal, User, Booking
-from sqlalchemy.orm import joinedload
+from app.models import (
+    Contact, FareClass, Flight, Hotel, HotelStay, NotificationOutbox, PackageDeal, PriceAlert, SeatAssignment, User, Booking,
+    FlightSchedule, WaitlistEntry,
+)
+from app import alerts, archive, checkout, inventory, pubsub, reconciliation, schedules, seatmap, waitlist, write_behind
+from sqlalchemy.orm import joinedload, selectinload
 from app.builders import PackageDealBuilder
-from app.decorators import login_required
+from app.decorators import login_required, query_budget, read_only
+from app.idempotency import idempotent
+from app.routing import mark_recent_write
+
 
+logger = logging.getLogger(__name__)
 
 # Initialize the blueprint
 bp = Blueprint("routes", __name__)
 
 
 @bp.route("/")
+@read_only
 def home():
     return render_template("home.html")
 
@@ -42,6 +56,12 @@ def about():
     return render_template("about.html")
 
 
+@bp.route("/metrics")
+def metrics_endpoint():
+    """Phase timings, DB pool and cache stats in the Prometheus text format."""
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
 @bp.route("/contact", methods=["GET", "POST"])
 def contact():
     form = ContactForm()  
@@ -72,12 +92,28 @@ def contact():
 
 
 @bp.route("/profile")
+@query_budget(10)
+@read_only
 def profile():
     user_id = session.get("user_id")
     if user_id:
         user = User.query.get(user_id)
         bookings = Booking.query.filter_by(user_id=user.id).all()
-        return render_template("profile.html", user=user, bookings=bookings)
+        # The archive is only read when the history tab asks for it
+        archived = archive.archived_for_user(user.id) if request.args.get("archived") else None
+        price_alerts = PriceAlert.query.filter_by(user_id=user.id).order_by(PriceAlert.start_date).all()
+        notifications = (
+            NotificationOutbox.query.filter_by(user_id=user.id)
+            .order_by(NotificationOutbox.id.desc())
+            .limit(10)
+            .all()
+        )
+        waiting = WaitlistEntry.query.filter_by(user_id=user.id).order_by(WaitlistEntry.created_at).all()
+        return render_template(
+            "profile.html", user=user, bookings=bookings, archived=archived,
+            price_alerts=price_alerts, notifications=notifications,
+            waiting=waiting, positions=waitlist.positions(waiting),
+        )
     return redirect(url_for("routes.login"))
 
 
@@ -106,6 +142,7 @@ def edit_profile():
 
         try:
             db.session.commit()
+            mark_recent_write()
             flash(f"Profile updated for {user.name}!", "success")
             session["user_name"] = user.name
             session["user_email"] = user.email
@@ -168,6 +205,9 @@ def admin_login():
     if request.method == 'POST':
         password = request.form['password']
         if password == 'admin123':
+            if 'admin' not in current_app.blueprints:
+                flash('The admin panel is not enabled on this server.', 'warning')
+                return redirect(url_for('routes.admin_login'))
             session['admin_logged_in'] = True
             flash('Admin login successful!', 'success')
             return redirect(url_for('admin.index'))
@@ -237,6 +277,9 @@ def add_service():
             return redirect(url_for("routes.add_service"))
 
         db.session.add(service)
+        db.session.flush()
+        reconciliation.set_capacity(type(service), service.id, service.availability)
+        alerts.mark_changed(service.__tablename__, service.id)
         db.session.commit()
         flash(f"{service_type.capitalize()} service added successfully!", "success")
         return redirect(url_for("routes.add_service"))
@@ -245,6 +288,7 @@ def add_service():
 
 @bp.route('/edit_booking/<int:booking_id>', methods=['GET', 'POST'])
 @login_required
+@idempotent
 def update_booking(booking_id):
     booking = Booking.query.get_or_404(booking_id)
     form = UpdateBookingForm(obj=booking)
@@ -265,7 +309,8 @@ def update_booking(booking_id):
                         availability_ok = False
 
             elif booking.service_type == 'Hotel' and booking.hotel:
-                if delta > 0:
+                # Stays are checked night by night by inventory.adjust below
+                if delta > 0 and booking.stay is None:
                     if booking.hotel.availability < delta:
                         flash(f"Not enough availability for the selected hotel. Available: {booking.hotel.availability}", "danger")
                         availability_ok = False
@@ -283,32 +328,27 @@ def update_booking(booking_id):
             if not availability_ok:
                 return redirect(url_for('routes.profile'))
 
-            # Adjust availability based on delta
-            if booking.service_type == 'Flight' and booking.flight:
-                if delta > 0:
-                    booking.flight.availability -= delta
-                elif delta < 0:
-                    booking.flight.availability += abs(delta)
-
-            elif booking.service_type == 'Hotel' and booking.hotel:
-                if delta > 0:
-                    booking.hotel.availability -= delta
-                elif delta < 0:
-                    booking.hotel.availability += abs(delta)
-
-            elif booking.service_type == 'PackageDeal' and booking.package_deal:
-                if delta > 0:
-                    booking.package_deal.flight.availability -= delta
-                    booking.package_deal.hotel.availability -= delta
-                elif delta < 0:
-                    booking.package_deal.flight.availability += abs(delta)
-                    booking.package_deal.hotel.availability += abs(delta)
+            # Adjust availability based on delta; a canceled booking holds no units
+            if booking.is_confirmed:
+                try:
+                    inventory.adjust(inventory.units_for_booking(booking), delta, "update", booking)
+                    if booking.seat_assignment is not None:
+                        booking.seat_assignment.seats = ",".join(
+                            seatmap.resize(booking.seat_assignment, new_num_people)
+                        )
+                except (inventory.InsufficientInventory, seatmap.SeatUnavailable):
+                    db.session.rollback()
+                    flash("Not enough availability left for the new number of people.", "danger")
+                    return redirect(url_for('routes.profile'))
 
             # Update num_people and total_price
             booking.num_people = new_num_people
             booking.total_price = booking.calculate_total_price()
+            if booking.is_confirmed and delta < 0:
+                waitlist.promote_for(booking)  # Same transaction as the release
 
             db.session.commit()
+            mark_recent_write()
             flash("Booking updated successfully.", "success")
             
            
@@ -317,13 +357,13 @@ def update_booking(booking_id):
 
         except IntegrityError as e:
             db.session.rollback()
-            logger.error(f"IntegrityError while updating booking ID {booking_id}: {e}")
+            logger.error("IntegrityError while updating booking ID %s: %s", booking_id, e)
             flash("An error occurred while updating your booking. Please try again.", "danger")
             return redirect(url_for('routes.profile'))
 
         except Exception as e:
             db.session.rollback()
-            logger.error(f"Exception while updating booking ID {booking_id}: {e}")
+            logger.error("Exception while updating booking ID %s: %s", booking_id, e)
             flash(f"Error: {str(e)}", "danger")
             return redirect(url_for('routes.profile'))
 
@@ -367,7 +407,7 @@ def create_package_deal(flight_id, hotel_id):
         flash("Package deal created successfully!", "success")
     except Exception as e:
         db.session.rollback()
-        logger.error(f"Error creating package deal: {e}")
+        logger.error("Error creating package deal: %s", e)
         flash("Failed to create package deal. Please try again.", "danger")
         return redirect(url_for("routes.search"))
 
@@ -387,26 +427,25 @@ def create_package_deal(flight_id, hotel_id):
     )
     db.session.add(booking)
     db.session.commit()
+    mark_recent_write()
 
     flash("Package deal booked successfully!", "success")
     return redirect(url_for("routes.profile"))
 
 
-@bp.route("/cancel-booking/<int:booking_id>", methods=["GET", "POST"])
+@bp.route("/cancel-booking/<int:booking_id>", methods=["POST"])
+@idempotent
 def cancel_booking(booking_id):
     booking = Booking.query.get_or_404(booking_id)
 
     if booking.is_confirmed:
-        if booking.service_type == "Hotel" and booking.hotel:
-            booking.hotel.availability += booking.num_people
-        elif booking.service_type == "Flight" and booking.flight:
-            booking.flight.availability += booking.num_people
-        elif booking.service_type == "PackageDeal" and booking.package_deal:
-            booking.hotel.availability += booking.num_people
-            booking.flight.availability += booking.num_people
-
+        inventory.release(inventory.units_for_booking(booking), booking.num_people, "cancel", booking)
+        if booking.seat_assignment is not None:
+            seatmap.release_seats(booking.seat_assignment.flight_id, booking.seat_assignment.seat_list)
         booking.is_confirmed = False
+        waitlist.promote_for(booking)  # Same transaction as the release
         db.session.commit()
+        mark_recent_write()
         flash("Booking has been canceled.", "success")
     else:
         flash("Booking is already canceled.", "info")
@@ -415,8 +454,11 @@ def cancel_booking(booking_id):
 
 
 @bp.route("/search", methods=["GET", "POST"])
+@query_budget(10)
+@read_only
 def search():
     results = []
+    departures = []
     destination = None
     check_in = None
     check_out = None
@@ -430,11 +472,11 @@ def search():
 
     if request.method == "POST":
         # Use context manager for search operation
-      with BookingContext(search):
+      with BookingContext("search") as ctx:
         # Initial selection of booking type
         if "booking_type" in request.form and "destination" not in request.form:
             booking_type = request.form.get("booking_type")
-            return render_template("search.html", booking_type=booking_type)
+            return render_template("search.html", booking_type=booking_type, cabins=seatmap.CABINS)
 
         # Extract search parameters from the form
         destination = request.form.get("destination")
@@ -490,6 +532,7 @@ def search():
                     flash("Invalid return date format.", "danger")
                     return redirect(url_for("routes.search"))
 
+            session["fare_class"] = request.form.get("fare_class") or None
             if departure_city:
                 session["departure_city"] = departure_city.strip()
             else:
@@ -537,8 +580,8 @@ def search():
                 session["booking_date"] = check_in_datetime.strftime(
                     "%Y-%m-%d"
                 )  # Assuming booking_date is check_in
-                logger.debug(f"Check-in date set to: {session['check_in']}")
-                logger.debug(f"Check-out date set to: {session['check_out']}")
+                logger.debug("Check-in date set to: %s", session["check_in"])
+                logger.debug("Check-out date set to: %s", session["check_out"])
             except ValueError:
                 flash("Invalid Check-in or Check-out date format.", "danger")
                 logger.error("Invalid Check-in or Check-out date format.")
@@ -548,6 +591,7 @@ def search():
             session.pop("departure_time", None)
             session.pop("return_date", None)
             session.pop("departure_city", None)
+            session.pop("fare_class", None)
             session.pop("price_range", None)
             logger.debug("Cleared irrelevant session data for hotel booking.")
 
@@ -596,6 +640,7 @@ def search():
             session.pop("departure_time", None)
             session.pop("return_date", None)
             session.pop("departure_city", None)
+            session.pop("fare_class", None)
 
         # Retrieve search results based on booking_type
         if booking_type == "Flight":
@@ -613,11 +658,14 @@ def search():
                 return redirect(url_for("routes.search"))
 
             query = Flight.query.filter(
+                Flight.is_active,
                 Flight.destination.ilike(f"%{destination}%"),
                 Flight.departure_city.ilike(f"%{departure_city}%"),
                 Flight.availability >= session["num_people"],
                 Flight.departure_time >= departure_time_obj,
-            )
+            ).options(selectinload(Flight.fare_classes))
+            if session.get("fare_class"):
+                query = query.filter(seatmap.flights_with_fare(session["fare_class"], session["num_people"]))
             if "return_date" in session:
                 return_date_str = session.get("return_date")
                 try:
@@ -626,8 +674,14 @@ def search():
                 except ValueError:
                     flash("Invalid return date format in session.", "danger")
                     return redirect(url_for("routes.search"))
+            ctx.phase("query")
             results = query.all()
-            if not results:
+            if not session.get("fare_class"):
+                # Scheduled departures not materialized yet have no cabins
+                departures = schedules.search(
+                    destination, departure_city, departure_time_obj.date(), session["num_people"]
+                )
+            if not results and not departures:
                 flash("No flights found matching your criteria.", "info")
 
         elif booking_type == "Hotel":
@@ -654,8 +708,8 @@ def search():
                         "Check-out date is not after Check-in date for hotel booking."
                     )
                     return redirect(url_for("routes.search"))
-                logger.debug(f"Parsed Hotel check-in datetime: {check_in_datetime}")
-                logger.debug(f"Parsed Hotel check-out datetime: {check_out_datetime}")
+                logger.debug("Parsed Hotel check-in datetime: %s", check_in_datetime)
+                logger.debug("Parsed Hotel check-out datetime: %s", check_out_datetime)
             except ValueError:
                 flash("Invalid Check-in or Check-out date format.", "danger")
                 logger.error(
@@ -665,16 +719,21 @@ def search():
 
             # Modify the query to include date filtering using func.date
             query = Hotel.query.filter(
+                Hotel.is_active,
                 Hotel.hotel_location.ilike(f"%{destination}%"),
-                Hotel.availability >= session["num_people"],
+                inventory.hotels_with_rooms(
+                    check_in_datetime.date(), check_out_datetime.date(), session["num_people"]
+                ),
                 func.date(Hotel.checkin_date) <= check_in_datetime.date(),
                 func.date(Hotel.checkout_date) >= check_out_datetime.date(),
             )
             logger.debug(
-                f"Hotel query filters applied: location={destination}, num_people={session['num_people']}, checkin_date<={check_in_datetime.date()}, checkout_date>={check_out_datetime.date()}"
+                "Hotel query filters applied: location=%s, num_people=%s, checkin_date<=%s, checkout_date>=%s",
+                destination, session["num_people"], check_in_datetime.date(), check_out_datetime.date(),
             )
+            ctx.phase("query")
             results = query.all()
-            logger.debug(f"Number of hotels found: {len(results)}")
+            logger.debug("Number of hotels found: %d", len(results))
             if not results:
                 flash("No hotels found matching your criteria.", "info")
                 logger.info("No hotels found matching the criteria.")
@@ -697,6 +756,8 @@ def search():
                 .join(Hotel, PackageDeal.hotel_id == Hotel.id)
                 .options(joinedload(PackageDeal.flight), joinedload(PackageDeal.hotel))
                 .filter(
+                    Flight.is_active,
+                    Hotel.is_active,
                     Flight.destination.ilike(f"%{destination}%"),
                     Flight.availability >= session["num_people"],
                     Hotel.hotel_location.ilike(f"%{destination}%"),
@@ -711,11 +772,14 @@ def search():
                         session["min_price"], session["max_price"]
                     )
                 )
+            ctx.phase("query")
             results = query.all()
             if not results:
                 flash("No package deals found matching your criteria.", "info")
-    return render_template(
+    started = perf_counter()
+    page = render_template(
         "search.html",
+        cabins=seatmap.CABINS,
         destination=destination,
         check_in=session.get("check_in"),
         check_out=session.get("check_out"),
@@ -726,8 +790,11 @@ def search():
         booking_type=booking_type,
         price_range=price_range,
         results=results,
+        departures=departures,
         currency=currency,
     )
+    metrics.observe_phase("search", "render", "success", perf_counter() - started)
+    return page
 
 
 @bp.route('/logout')
@@ -740,7 +807,389 @@ def logout():
     return redirect(url_for('routes.home'))
 
 
+@bp.route("/cart", methods=["GET"])
+@login_required
+@read_only
+def cart():
+    items = []
+    try:
+        if session.get("cart"):
+            items = checkout.load_items(checkout.parse_items(session["cart"]))
+    except checkout.CheckoutError as e:
+        flash(str(e), "warning")
+    total = sum(item["total_price"] for item in items)
+    return render_template("cart.html", items=items, total=total, currency="INR ")
+
+
+@bp.route("/cart/add/<string:booking_type>/<int:item_id>", methods=["POST"])
+@login_required
+def add_to_cart(booking_type, item_id):
+    items = session.get("cart", [])
+    try:
+        num_people = request.form.get("num_people") or session.get("num_people")
+        item = {"booking_type": booking_type, "item_id": item_id, "num_people": num_people}
+        nights = stay_dates() if booking_type == "Hotel" else None
+        if nights:
+            item.update(check_in=nights[0].isoformat(), check_out=nights[1].isoformat())
+        items = checkout.parse_items(items + [item])
+    except checkout.CheckoutError as e:
+        flash(str(e), "danger")
+        return redirect(url_for("routes.search"))
+    session["cart"] = items
+    flash(f"{booking_type} added to your cart.", "success")
+    return redirect(url_for("routes.cart"))
+
+
+@bp.route("/cart/remove/<int:index>", methods=["POST"])
+@login_required
+def remove_from_cart(index):
+    items = session.get("cart", [])
+    if 0 <= index < len(items):
+        items.pop(index)
+        session["cart"] = items
+    return redirect(url_for("routes.cart"))
+
+
+@bp.route("/cart/checkout", methods=["POST"])
+@login_required
+@idempotent
+def checkout_cart():
+    """Book the session cart, or the "items" of a JSON body, all or nothing."""
+    api = request.is_json
+    user = User.query.get(session.get("user_id"))
+    if user is None:
+        flash("You must be logged in to make a booking.", "danger")
+        return redirect(url_for("routes.login"))
+
+    with BookingContext("cart", outcome="rejected") as ctx:
+        try:
+            raw_items = (request.get_json(silent=True) or {}).get("items") if api else session.get("cart")
+            items = checkout.parse_items(raw_items)
+            ctx.phase("query")
+            hold = session.get("hold")
+            booking_ids = checkout.checkout(user, items, ctx, hold=hold)
+            db.session.commit()
+            if checkout.held_item(hold, items) is not None:
+                session.pop("hold")  # Consumed (or expired) along with the cart
+            mark_recent_write()
+            ctx.outcome = "success"
+        except checkout.CheckoutError as e:
+            db.session.rollback()
+            if api:
+                return jsonify(error=str(e)), 409
+            flash(str(e), "danger")
+            return redirect(url_for("routes.cart"))
+        except Exception as e:
+            db.session.rollback()
+            ctx.outcome = "error"
+            logger.error("Error during cart checkout: %s", e)
+            if api:
+                return jsonify(error="Checkout failed. Please try again."), 500
+            flash("An error occurred during checkout. Please try again.", "danger")
+            return redirect(url_for("routes.cart"))
+
+    if api:
+        return jsonify(booking_ids=booking_ids), 201
+    session.pop("cart", None)
+    flash(f"{len(booking_ids)} bookings confirmed!", "success")
+    return redirect(url_for("routes.profile"))
+
+
+def stay_dates():
+    """(check_in, check_out) dates of the searched hotel stay, or None."""
+    try:
+        check_in = datetime.strptime(session["check_in"], "%Y-%m-%d %H:%M:%S").date()
+        check_out = datetime.strptime(session["check_out"], "%Y-%m-%d %H:%M:%S").date()
+    except (KeyError, TypeError, ValueError):
+        return None
+    return (check_in, check_out) if check_out > check_in else None
+
+
+def take_inventory(booking_type, item_id, num_people, units=None):
+    """
+    Book out of the session's hold on this item if it has one, else reserve now.
+    `units` replaces the item's own units (a hotel stay's nights, a fare class
+    with its flight); a hold on the whole item is then given back. Returns True
+    when the units were reserved by the write-behind pipeline, which is only
+    used without `units` and for items write_behind.accepts().
+    """
+    hold = session.get("hold")
+    if hold and hold["booking_type"] == booking_type and hold["item_id"] == item_id:
+        session.pop("hold")
+        try:
+            if units is None:
+                inventory.convert_hold(hold["token"], booking_type, item_id, num_people)
+                return False
+            inventory.cancel_hold(hold["token"])
+        except inventory.HoldNotFound:
+            logger.info("Hold %s expired before checkout; reserving again", hold["token"])
+    if units is not None:
+        inventory.reserve(units, num_people, "book")
+        return False
+    units = inventory.units_for(booking_type, item_id)
+    if write_behind.enabled() and write_behind.accepts(units):
+        write_behind.reserve_for_request(units, num_people)
+        return True
+    inventory.reserve(units, num_people, "book")
+    return False
+
+
+@bp.route("/hold/<string:booking_type>/<int:item_id>", methods=["POST"])
+@login_required
+@idempotent
+def hold(booking_type, item_id):
+    if booking_type not in inventory.SERVICE_TYPES:
+        flash("Invalid booking type.", "danger")
+        return redirect(url_for("routes.search"))
+    try:
+        num_people = int(session.get("num_people"))
+        if num_people <= 0:
+            raise ValueError
+    except (TypeError, ValueError):
+        flash("Please search again before holding seats.", "danger")
+        return redirect(url_for("routes.search"))
+
+    # One hold per session: placing a new one gives the old one back. The old one
+    # leaves the session only once that is committed, or its units would leak
+    previous = session.get("hold")
+    try:
+        if previous:
+            inventory.cancel_hold(previous["token"])
+        new_hold = inventory.place_hold(booking_type, item_id, num_people, user_id=session.get("user_id"))
+        db.session.commit()
+    except inventory.InsufficientInventory:
+        db.session.rollback()
+        flash(f"Not enough availability to hold {num_people} for this {booking_type}.", "danger")
+        return redirect(url_for("routes.search"))
+    except inventory.HoldNotFound:
+        db.session.rollback()
+        flash(f"{booking_type} not found.", "danger")
+        return redirect(url_for("routes.search"))
+    mark_recent_write()
+
+    session["hold"] = {
+        "token": new_hold.token,
+        "booking_type": booking_type,
+        "item_id": item_id,
+        "quantity": num_people,
+        "expires_at": new_hold.expires_at.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    return redirect(url_for("routes.view_hold"))
+
+
+@bp.route("/hold", methods=["GET"])
+@login_required
+def view_hold():
+    current = session.get("hold")
+    if not current:
+        flash("You have no seats on hold.", "info")
+        return redirect(url_for("routes.search"))
+    return render_template("hold.html", hold=current)
+
+
+@bp.route("/hold/release", methods=["POST"])
+@login_required
+def release_hold():
+    current = session.pop("hold", None)
+    if current and inventory.cancel_hold(current["token"]):
+        db.session.commit()
+        mark_recent_write()
+        flash("Your hold has been released.", "info")
+    return redirect(url_for("routes.search"))
+
+
+@bp.route("/alerts", methods=["POST"])
+@login_required
+def create_alert():
+    """Save the current search as a price alert."""
+    booking_type = request.form.get("booking_type")
+    try:
+        if booking_type == "Flight":
+            start = datetime.strptime(session["departure_time"], "%Y-%m-%d").date()
+            end = start + timedelta(days=int(request.form.get("flex_days") or 0))
+        else:
+            start, end = stay_dates()
+        max_price = float(request.form["max_price"]) if request.form.get("max_price") else None
+        alert = alerts.subscribe(
+            session["user_id"],
+            booking_type,
+            session.get("destination"),
+            start,
+            end,
+            int(session.get("num_people") or 1),
+            max_price=max_price,
+            departure_city=session.get("departure_city") if booking_type == "Flight" else None,
+        )
+    except (KeyError, TypeError, ValueError):
+        flash("Please search again before creating an alert.", "danger")
+        return redirect(url_for("routes.search"))
+    except alerts.AlertError as e:
+        flash(str(e), "danger")
+        return redirect(url_for("routes.search"))
+    db.session.commit()
+    mark_recent_write()
+    flash(f"We will let you know when {alert.destination.title()} gets cheaper or frees up.", "success")
+    return redirect(url_for("routes.profile"))
+
+
+@bp.route("/alerts/<int:alert_id>/delete", methods=["POST"])
+@login_required
+def delete_alert(alert_id):
+    if alerts.unsubscribe(session["user_id"], alert_id):
+        db.session.commit()
+        mark_recent_write()
+        flash("Alert deleted.", "info")
+    return redirect(url_for("routes.profile"))
+
+
+@bp.route("/waitlist/<string:booking_type>/<int:item_id>", methods=["GET", "POST"])
+@login_required
+def waitlist_offer(booking_type, item_id):
+    """Offer a sold-out item's waitlist, and join it on POST."""
+    if booking_type not in inventory.SERVICE_TYPES:
+        flash("Invalid booking type.", "danger")
+        return redirect(url_for("routes.search"))
+    try:
+        num_people = int(session.get("num_people"))
+    except (TypeError, ValueError):
+        flash("Please search again before joining a waitlist.", "danger")
+        return redirect(url_for("routes.search"))
+    stay = stay_dates() if booking_type == "Hotel" else None
+    fare = seatmap.fare_for(item_id, session.get("fare_class")) if booking_type == "Flight" else None
+
+    if request.method == "POST":
+        try:
+            entry = waitlist.join(
+                session["user_id"],
+                session.get("user_name"),
+                session.get("user_email"),
+                session.get("destination") or "",
+                booking_type,
+                item_id,
+                num_people,
+                fare_class_id=fare.id if fare else None,
+                check_in=stay[0] if stay else None,
+                check_out=stay[1] if stay else None,
+            )
+            db.session.commit()
+        except waitlist.WaitlistError as e:
+            db.session.rollback()
+            flash(str(e), "danger")
+            return redirect(url_for("routes.search"))
+        mark_recent_write()
+        position = waitlist.positions([entry])[entry.id]
+        flash(f"You are number {position} on the waitlist. We will book it for you as soon as places free up.", "success")
+        return redirect(url_for("routes.profile"))
+
+    item = waitlist.find_item(booking_type, item_id)
+    if item is None:
+        flash(f"{booking_type} not found.", "danger")
+        return redirect(url_for("routes.search"))
+    return render_template(
+        "waitlist.html", booking_type=booking_type, item_id=item_id, num_people=num_people,
+        name=waitlist.describe(booking_type, item), stay=stay, fare=fare,
+    )
+
+
+@bp.route("/waitlist/<int:entry_id>/leave", methods=["POST"])
+@login_required
+def leave_waitlist(entry_id):
+    if waitlist.leave(session["user_id"], entry_id):
+        db.session.commit()
+        mark_recent_write()
+        flash("You have left the waitlist.", "info")
+    return redirect(url_for("routes.profile"))
+
+
+@bp.route("/flights/<int:flight_id>/seats", methods=["GET"])
+@read_only
+def flight_seats(flight_id):
+    flight = Flight.query.get_or_404(flight_id)
+    fares = flight.fare_classes
+    if not fares:
+        flash("This flight has no seat selection.", "info")
+        return redirect(url_for("routes.search"))
+    return render_template(
+        "seats.html",
+        flight=flight,
+        fares=fares,
+        rows=seatmap.seat_rows(flight_id),
+        free=seatmap.free_by_fare(flight_id, fares),
+        num_people=session.get("num_people", 1),
+    )
+
+
+@bp.route("/availability/stream", methods=["GET"])
+def availability_stream():
+    """Server-Sent Events with the latest availability of ?items=flight:1,hotel:2,fare_class:3."""
+    config = current_app.config
+    keys = pubsub.parse_keys(request.args.get("items", ""), config["SSE_MAX_KEYS"])
+    if not keys:
+        return Response("No items to watch", status=400, mimetype="text/plain")
+    broker = pubsub.broker()
+    client = f"user:{session['user_id']}" if session.get("user_id") else f"addr:{request.remote_addr}"
+    try:
+        subscription = broker.subscribe(keys, client)
+    except pubsub.TooManySubscribers as e:
+        logger.warning("Refused availability stream for %s: %s", client, e)
+        retry = config["SSE_RETRY_SECONDS"]
+        return Response(
+            f"retry: {retry * 1000}\n\n", status=503, mimetype="text/event-stream",
+            headers={"Retry-After": str(retry), "Cache-Control": "no-cache"},
+        )
+    heartbeat = config["SSE_HEARTBEAT_SECONDS"]
+    max_seconds = config["SSE_MAX_SECONDS"]
+
+    def events():
+        # The browser reconnects on its own once we close, so cap each stream
+        deadline = perf_counter() + max_seconds
+        try:
+            yield "retry: 3000\n\n"
+            while perf_counter() < deadline:
+                changed = subscription.wait(min(heartbeat, deadline - perf_counter()))
+                if changed:
+                    payload = json.dumps({f"{table}:{item_id}": value for (table, item_id), value in changed.items()})
+                    yield f"data: {payload}\n\n"
+                else:
+                    yield ": keepalive\n\n"
+        finally:
+            broker.unsubscribe(subscription)
+
+    response = Response(
+        events(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    # A client gone before the first event never runs the generator's finally
+    response.call_on_close(lambda: broker.unsubscribe(subscription))
+    return response
+
+
+@bp.route("/schedules/<int:schedule_id>/<string:departure>/book", methods=["POST"])
+@login_required
+def book_departure(schedule_id, departure):
+    """Materialize a scheduled departure on its first booking, then book it like any flight."""
+    schedule = FlightSchedule.query.get_or_404(schedule_id)
+    try:
+        departure_time = datetime.strptime(departure, "%Y-%m-%dT%H:%M")
+    except ValueError:
+        abort(404)
+    if departure_time <= datetime.utcnow():
+        flash("This flight has already departed.", "danger")
+        return redirect(url_for("routes.search"))
+    flight = schedules.materialize(schedule, departure_time)
+    if flight is None:
+        db.session.rollback()
+        flash("This flight is not scheduled on that date.", "danger")
+        return redirect(url_for("routes.search"))
+    db.session.commit()
+    mark_recent_write()
+    # 307 keeps the POST and its idempotency key
+    return redirect(url_for("routes.book", booking_type="Flight", item_id=flight.id), code=307)
+
+
 @bp.route("/book/<string:booking_type>/<int:item_id>", methods=["POST"])
+@idempotent
 def book(booking_type, item_id):
     user_id = session.get("user_id")
     user_name = session.get("user_name")
@@ -782,9 +1231,10 @@ def book(booking_type, item_id):
 
     booking = None
     total_price = 0
+    provisional = False
 
     # Start operation logging and timing within the context
-    with BookingContext(booking_type):
+    with BookingContext(booking_type, outcome="rejected", phase="query") as ctx:
         try:
             if booking_type == "Flight":
                 # Handle flight bookings
@@ -792,16 +1242,28 @@ def book(booking_type, item_id):
                 if not flight:
                     flash("Flight not found.", "danger")
                     return redirect(url_for("routes.search"))
-                if flight.availability < num_people:
+                # A fare class or a stay is reserved directly; write-behind only takes whole items
+                fare = seatmap.fare_for(flight.id, request.form.get("fare_class") or session.get("fare_class"))
+                try:
+                    provisional = take_inventory(
+                        booking_type, item_id, num_people,
+                        units=[(FareClass, fare.id), (Flight, flight.id)] if fare else None,
+                    )
+                    seats = seatmap.allocate(fare, num_people, request.form.getlist("seat")) if fare else []
+                except inventory.InsufficientInventory:
+                    db.session.rollback()
                     flash("Flight not available for the number of passengers.", "danger")
-                    return redirect(url_for("routes.search"))
-
-                # Update availability
-                flight.availability -= num_people
+                    return redirect(url_for("routes.waitlist_offer", booking_type=booking_type, item_id=item_id))
+                except seatmap.SeatUnavailable as e:
+                    db.session.rollback()
+                    flash(f"Seat selection failed: {e}", "danger")
+                    return redirect(url_for("routes.flight_seats", flight_id=flight.id))
 
                 # Calculate total price
-                flight_cost = flight.calculate_cost()
+                ctx.phase("pricing")
+                flight_cost = fare.calculate_cost() if fare else flight.calculate_cost()
                 if flight_cost is None:
+                    db.session.rollback()  # Give back the units take_inventory() reserved
                     flash("Failed to calculate flight cost.", "danger")
                     return redirect(url_for("routes.search"))
                 total_price = flight_cost * num_people
@@ -809,6 +1271,7 @@ def book(booking_type, item_id):
                 # Ensure flight_number exists
                 flight_number = getattr(flight, "flight_number", None)
                 if not flight_number:
+                    db.session.rollback()
                     flash("Flight number not found.", "danger")
                     return redirect(url_for("routes.search"))
 
@@ -826,6 +1289,10 @@ def book(booking_type, item_id):
                     total_price=total_price,
                     flight_number=flight_number,
                 )
+                if fare:
+                    booking.seat_assignment = SeatAssignment(
+                        flight_id=flight.id, fare_class_id=fare.id, seats=",".join(seats)
+                    )
 
             elif booking_type == "Hotel":
                 # Handle hotel bookings
@@ -833,16 +1300,22 @@ def book(booking_type, item_id):
                 if not hotel:
                     flash("Hotel not found.", "danger")
                     return redirect(url_for("routes.search"))
-                if hotel.availability < num_people:
+                stay = stay_dates()
+                try:
+                    provisional = take_inventory(
+                        booking_type, item_id, num_people,
+                        units=[inventory.stay_unit(item_id, *stay)] if stay else None,
+                    )
+                except inventory.InsufficientInventory:
+                    db.session.rollback()
                     flash("Hotel not available for the number of guests.", "danger")
-                    return redirect(url_for("routes.search"))
-
-                # Update availability
-                hotel.availability -= num_people
+                    return redirect(url_for("routes.waitlist_offer", booking_type=booking_type, item_id=item_id))
 
                 # Calculate total price
+                ctx.phase("pricing")
                 hotel_cost = hotel.calculate_cost()
                 if hotel_cost is None:
+                    db.session.rollback()
                     flash("Failed to calculate hotel cost.", "danger")
                     return redirect(url_for("routes.search"))
                 total_price = hotel_cost * num_people
@@ -861,6 +1334,8 @@ def book(booking_type, item_id):
                     total_price=total_price,
                     flight_number=None,
                 )
+                if stay is not None:
+                    booking.stay = HotelStay(hotel_id=hotel.id, check_in=stay[0], check_out=stay[1])
 
             elif booking_type == "PackageDeal":
                 # Handle package bookings
@@ -876,17 +1351,18 @@ def book(booking_type, item_id):
                     flash("Package deal is incomplete. Please contact support.", "danger")
                     return redirect(url_for("routes.search"))
 
-                if flight.availability < num_people or hotel.availability < num_people:
+                try:
+                    provisional = take_inventory(booking_type, item_id, num_people)
+                except inventory.InsufficientInventory:
+                    db.session.rollback()
                     flash("Package deal not available for the number of guests.", "danger")
-                    return redirect(url_for("routes.search"))
-
-                # Update availability for both flight and hotel
-                flight.availability -= num_people
-                hotel.availability -= num_people
+                    return redirect(url_for("routes.waitlist_offer", booking_type=booking_type, item_id=item_id))
 
                 # Calculate total price for the package
+                ctx.phase("pricing")
                 package_cost = package.calculate_cost()
                 if package_cost is None:
+                    db.session.rollback()
                     flash("Failed to calculate package cost.", "danger")
                     return redirect(url_for("routes.search"))
                 total_price = package_cost * num_people
@@ -894,6 +1370,7 @@ def book(booking_type, item_id):
                 # Ensure flight_number exists
                 flight_number = getattr(flight, "flight_number", None)
                 if not flight_number:
+                    db.session.rollback()
                     flash("Flight number not found in package deal.", "danger")
                     return redirect(url_for("routes.search"))
 
@@ -913,8 +1390,16 @@ def book(booking_type, item_id):
                 )
 
             # Save the booking in the database
-            db.session.add(booking)
-            db.session.commit()
+            ctx.phase("commit")
+            if provisional:
+                # Write-behind mode: durable in the local queue, committed by the writer thread
+                reference = write_behind.enqueue_for_request(booking)
+            else:
+                db.session.add(booking)
+                inventory.attribute(booking)
+                db.session.commit()
+            mark_recent_write()
+            ctx.outcome = "success"
 
             # Store the last booking details in session
             session["last_booking"] = {
@@ -923,21 +1408,27 @@ def book(booking_type, item_id):
                 "total_price": total_price,
                 "service_type": booking.service_type,
             }
-            flash(f"{booking_type} booking successful!", "success")
+            if provisional:
+                flash(f"{booking_type} booking received (reference {reference[:8]}). "
+                      "It will appear in your profile shortly.", "success")
+            else:
+                flash(f"{booking_type} booking successful!", "success")
             return redirect(url_for("routes.profile"))
 
         except IntegrityError as e:
             db.session.rollback()
+            ctx.outcome = "error"
             flash(
                 "An error occurred while processing your booking. Please try again.",
                 "danger",
             )
-            current_app.logger.error(f"IntegrityError during booking: {e}")
+            current_app.logger.error("IntegrityError during booking: %s", e)
             return redirect(url_for("routes.search"))
         except Exception as e:
             db.session.rollback()  
+            ctx.outcome = "error"
             flash(f"An error occurred: {e}", "danger")
-            current_app.logger.error(f"Error during booking: {e}")
+            current_app.logger.error("Error during booking: %s", e)
             return redirect(url_for("routes.search"))
 
 
@@ -0,0 +1,306 @@
+"""
+Waitlists for sold-out flights, hotels and packages.
+
+A party that could not book joins the item's queue (waitlist_entry). When a
+cancellation or a smaller booking gives units back, promote_for() runs in
+that same transaction over every queue those units can serve: the flight,
+the hotel, and the packages built on either. It reads those queues together
+oldest first, skipping parties larger than anything left, and books every
+entry that still fits through app/inventory.py like a normal booking. Each promotion is its own savepoint, so an entry whose fare class
+or nights are gone is simply passed over. The promoted party gets a
+notification_outbox row and leaves the queue.
+
+Only WAITLIST_PROMOTE_SCAN entries are read per release, which keeps a
+cancellation fast however long the queue is. `flask promote-waitlist`
+catches up on units freed any other way (admin edits, bulk updates,
+expired holds).
+"""
+import json
+import logging
+from datetime import date, datetime
+from flask import current_app
+from sqlalchemy import and_, case, func, or_, select, tuple_
+from app import db, inventory, seatmap
+from app.models import (
+    Booking, FareClass, Flight, Hotel, HotelNight, HotelStay, NotificationOutbox, PackageDeal, SeatAssignment,
+    WaitlistEntry,
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_ENTRIES_PER_USER = 10
+
+
+class WaitlistError(Exception):
+    """Raised for waitlist entries that cannot be saved; the message is safe to show the user."""
+
+
+def find_item(service_type, item_id):
+    model = {"Flight": Flight, "Hotel": Hotel, "PackageDeal": PackageDeal}.get(service_type)
+    return db.session.get(model, item_id) if model else None
+
+
+def describe(service_type, item):
+    if service_type == "Flight":
+        return f"{item.airline} {item.flight_number}"
+    if service_type == "Hotel":
+        return item.hotel_name
+    return f"the {item.hotel.hotel_name} package"
+
+
+def room_for(entry):
+    """Units the entry's party could book right now."""
+    if entry.service_type == "Flight":
+        room = db.session.execute(select(Flight.availability).where(Flight.id == entry.item_id)).scalar() or 0
+        if entry.fare_class_id:
+            fare = db.session.execute(select(FareClass.availability).where(FareClass.id == entry.fare_class_id)).scalar()
+            room = min(room, fare or 0)
+        return room
+    if entry.service_type == "Hotel":
+        if entry.check_in:
+            return inventory.stay_availability(entry.item_id, entry.check_in, entry.check_out)
+        return db.session.execute(select(Hotel.availability).where(Hotel.id == entry.item_id)).scalar() or 0
+    return _package_room(entry.item_id)
+
+
+def _package_room(package_id):
+    return db.session.execute(
+        select(case((Flight.availability < Hotel.availability, Flight.availability), else_=Hotel.availability))
+        .join(PackageDeal, PackageDeal.flight_id == Flight.id)
+        .join(Hotel, Hotel.id == PackageDeal.hotel_id)
+        .where(PackageDeal.id == package_id)
+    ).scalar() or 0
+
+
+def _most_free(service_type, item_id):
+    """An upper bound on any party's room: parties larger than this cannot fit."""
+    if service_type == "Hotel":
+        # A split hotel's own counter is its emptiest night; a stay may fit on its fullest
+        fullest = db.session.execute(
+            select(func.max(HotelNight.availability)).where(HotelNight.hotel_id == item_id)
+        ).scalar()
+        if fullest is not None:
+            return fullest
+    if service_type == "PackageDeal":
+        return _package_room(item_id)
+    model = Flight if service_type == "Flight" else Hotel
+    return db.session.execute(select(model.availability).where(model.id == item_id)).scalar() or 0
+
+
+def join(user_id, name, email, destination, service_type, item_id, num_people,
+         fare_class_id=None, check_in=None, check_out=None):
+    """Queue a party for a sold-out item; the caller commits."""
+    item = find_item(service_type, item_id)
+    if item is None:
+        raise WaitlistError(f"{service_type} not found.")
+    if not getattr(item, "is_active", True):
+        raise WaitlistError(f"This {service_type} is no longer on sale.")
+    if num_people <= 0:
+        raise WaitlistError("Please enter a valid number of people.")
+    if check_in and (check_out <= check_in or check_in < date.today()):
+        raise WaitlistError("Please search for future stay dates first.")
+    waiting = db.session.execute(
+        select(WaitlistEntry.service_type, WaitlistEntry.item_id).where(WaitlistEntry.user_id == user_id)
+    ).all()
+    if (service_type, item_id) in waiting:
+        raise WaitlistError("You are already on the waitlist for this item.")
+    if len(waiting) >= MAX_ENTRIES_PER_USER:
+        raise WaitlistError(f"You can wait for at most {MAX_ENTRIES_PER_USER} items at a time.")
+    entry = WaitlistEntry(
+        user_id=user_id,
+        name=name,
+        email=email,
+        destination=destination,
+        service_type=service_type,
+        item_id=item_id,
+        num_people=num_people,
+        fare_class_id=fare_class_id,
+        check_in=check_in,
+        check_out=check_out,
+        created_at=datetime.utcnow(),
+    )
+    if room_for(entry) >= num_people:
+        raise WaitlistError("There is room for your party now; please book it directly.")
+    db.session.add(entry)
+    return entry
+
+
+def leave(user_id, entry_id):
+    """Remove one of the user's entries; returns False if it is not theirs."""
+    entry = db.session.get(WaitlistEntry, entry_id)
+    if entry is None or entry.user_id != user_id:
+        return False
+    db.session.delete(entry)
+    return True
+
+
+def positions(entries):
+    """{entry id: 1-based place in its item's queue}, one indexed count per entry."""
+    return {
+        entry.id: 1 + db.session.execute(
+            select(func.count()).select_from(WaitlistEntry).where(
+                WaitlistEntry.service_type == entry.service_type,
+                WaitlistEntry.item_id == entry.item_id,
+                tuple_(WaitlistEntry.created_at, WaitlistEntry.id) < tuple_(entry.created_at, entry.id),
+            )
+        ).scalar()
+        for entry in entries
+    }
+
+
+def _book(entry):
+    """Reserve and create the entry's booking, or raise InsufficientInventory / SeatUnavailable."""
+    item = find_item(entry.service_type, entry.item_id)
+    booking = Booking(
+        user_id=entry.user_id,
+        name=entry.name,
+        email=entry.email,
+        destination=entry.destination,
+        num_people=entry.num_people,
+        service_type=entry.service_type,
+        total_price=0,
+    )
+    if entry.service_type == "Flight":
+        booking.flight_id = item.id
+        booking.flight_number = item.flight_number
+        fare = entry.fare_class
+        units = [(FareClass, fare.id), (Flight, item.id)] if fare else [(Flight, item.id)]
+        booking.total_price = (fare or item).calculate_cost() * entry.num_people
+    elif entry.service_type == "Hotel":
+        booking.hotel_id = item.id
+        units = [inventory.stay_unit(item.id, entry.check_in, entry.check_out)] if entry.check_in else [(Hotel, item.id)]
+        booking.total_price = item.calculate_cost() * entry.num_people
+    else:
+        booking.flight_id = item.flight_id
+        booking.hotel_id = item.hotel_id
+        booking.package_deal_id = item.id
+        booking.flight_number = item.flight.flight_number
+        units = inventory.units_for("PackageDeal", item.id)
+        booking.total_price = item.calculate_cost() * entry.num_people
+    db.session.add(booking)
+    inventory.reserve(units, entry.num_people, "waitlist", booking)
+    if entry.service_type == "Flight" and entry.fare_class is not None:
+        seats = seatmap.allocate(entry.fare_class, entry.num_people)
+        booking.seat_assignment = SeatAssignment(
+            flight_id=item.id, fare_class_id=entry.fare_class_id, seats=",".join(seats)
+        )
+    if entry.check_in:
+        booking.stay = HotelStay(hotel_id=item.id, check_in=entry.check_in, check_out=entry.check_out)
+    db.session.flush()
+    return booking, item
+
+
+def _notify(entry, booking, item, now):
+    db.session.add(NotificationOutbox(
+        user_id=entry.user_id,
+        kind="waitlist",
+        subject=f"You are booked on {describe(entry.service_type, item)}",
+        body=json.dumps({
+            "booking_id": booking.id,
+            "service_type": entry.service_type,
+            "item_id": entry.item_id,
+            "num_people": entry.num_people,
+            "total_price": booking.total_price,
+            "waiting_since": entry.created_at.isoformat(),
+        }),
+        created_at=now,
+    ))
+
+
+def promote(service_type, item_id, limit=None, now=None):
+    """
+    Book the oldest waiting parties that fit the item's free units, in the
+    caller's transaction; returns the new bookings. The caller commits.
+    """
+    return promote_items([(service_type, item_id)], limit, now)
+
+
+def promote_items(items, limit=None, now=None):
+    """
+    promote() over several (service_type, item_id) queues at once: at most
+    `limit` entries are read across all of them, oldest first.
+    """
+    limit = limit or current_app.config["WAITLIST_PROMOTE_SCAN"]
+    now = now or datetime.utcnow()
+    promoted = []
+    # Upper bounds on each queue's room; promotions only ever lower them
+    most = {item: _most_free(*item) for item in dict.fromkeys(items)}
+    queues = [
+        and_(WaitlistEntry.service_type == service_type, WaitlistEntry.item_id == item_id,
+             WaitlistEntry.num_people <= free)
+        for (service_type, item_id), free in most.items() if free > 0
+    ]
+    if not queues:
+        return promoted
+    entries = db.session.execute(
+        select(WaitlistEntry)
+        .where(or_(*queues))
+        .order_by(WaitlistEntry.created_at, WaitlistEntry.id)
+        .limit(limit)
+    ).scalars().all()
+    for entry in entries:
+        key = (entry.service_type, entry.item_id)
+        if entry.num_people > most[key] or room_for(entry) < entry.num_people:
+            continue
+        try:
+            with db.session.begin_nested():
+                booking, item = _book(entry)
+                _notify(entry, booking, item, now)
+                db.session.delete(entry)
+        except (inventory.InsufficientInventory, seatmap.SeatUnavailable):
+            continue
+        promoted.append(booking)
+        most[key] = _most_free(*key)
+        if all(free <= 0 for free in most.values()):
+            break
+    if promoted:
+        logger.info("Promoted %d waitlisted parties on %s", len(promoted),
+                    ", ".join(f"{service_type} {item_id}" for service_type, item_id in most))
+    return promoted
+
+
+def released_items(booking, limit=None):
+    """
+    Queues a released booking's units can serve: its flight, its hotel and
+    the packages built on either that have waiters (at most `limit`).
+    """
+    limit = limit or current_app.config["WAITLIST_PROMOTE_SCAN"]
+    items = []
+    built_on = []
+    if booking.service_type in ("Flight", "PackageDeal") and booking.flight_id:
+        items.append(("Flight", booking.flight_id))
+        built_on.append(PackageDeal.flight_id == booking.flight_id)
+    if booking.service_type in ("Hotel", "PackageDeal") and booking.hotel_id:
+        items.append(("Hotel", booking.hotel_id))
+        built_on.append(PackageDeal.hotel_id == booking.hotel_id)
+    if built_on:
+        packages = db.session.execute(
+            select(WaitlistEntry.item_id)
+            .where(WaitlistEntry.service_type == "PackageDeal",
+                   WaitlistEntry.item_id.in_(select(PackageDeal.id).where(or_(*built_on))))
+            .distinct()
+            .limit(limit)
+        ).scalars().all()
+        items.extend(("PackageDeal", package_id) for package_id in packages)
+    return items
+
+
+def promote_for(booking):
+    """Promote waiters on every queue the units a released booking gave back can serve."""
+    return promote_items(released_items(booking))
+
+
+def promote_all(limit=None):
+    """Promote on every item with waiters, one commit per item; returns the number of bookings made."""
+    items = db.session.execute(
+        select(WaitlistEntry.service_type, WaitlistEntry.item_id).distinct()
+    ).all()
+    made = 0
+    for service_type, item_id in items:
+        made += len(promote(service_type, item_id, limit))
+        db.session.commit()
+    return made
+
+
+def init_app(app):
+    app.config.setdefault("WAITLIST_PROMOTE_SCAN", 50)
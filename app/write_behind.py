@@ -0,0 +1,517 @@
+"""
+Write-behind booking ingest for flash sales (BOOKING_WRITE_BEHIND = True).
+
+    request:  reserve units on in-memory counters -> fsync the booking to a local
+              JSONL queue -> return a provisional confirmation
+    writer:   one background thread group-commits batches of bookings, each
+              reserving its units with inventory.reserve()'s conditional UPDATE
+
+The counters track units reserved but not yet committed on top of the
+availability last read from the database, so they only work when a single
+process serves bookings. Even then holds, carts, booking edits and waitlist
+promotions take units straight from the database, so the counters are only
+an admission check: the writer reserves every entry again with the same
+conditional UPDATE as a direct booking, and an entry that no longer fits is
+dead-lettered instead of driving availability below zero. Only whole flights
+and hotels go through write-behind; fare classes and hotel stays are booked
+directly. The queue file enforces that: its owner holds an
+exclusive flock on it. Any other process finds write-behind unavailable and
+books straight against the database, and `flask drain-booking-queue`
+refuses to run while a server owns the queue. On start-up the queue file is replayed: entries whose
+reference is not yet in ingested_booking are committed again, so a crash loses
+nothing that was acknowledged. `flask drain-booking-queue` does the same offline.
+Every WRITE_BEHIND_RECONCILE_SECONDS the writer re-reads the cached counters and
+logs any that drifted, i.e. availability changed outside this process.
+
+Entries whose reference is already in ingested_booking are skipped, so a
+replay never commits a booking twice. A batch that still fails
+WRITE_BEHIND_MAX_RETRIES times is split and retried entry by entry; entries
+that fail on their own are appended to WRITE_BEHIND_DEAD_LETTER_PATH with
+their error and their units released, so one bad booking cannot hold up the
+ones behind it.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from flask import current_app, g, has_app_context
+from sqlalchemy import select
+from app import db, metrics
+from app.inventory import InsufficientInventory, reserve
+from app.models import Booking, FareClass, Flight, Hotel, HotelNight, IngestedBooking
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, the single-process rule is on the operator
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MODELS = {model.__tablename__: model for model in (Flight, Hotel)}
+
+_create_lock = threading.Lock()
+
+
+def load_availability(units):
+    """{(model, id): availability} straight from the database; missing rows count as 0."""
+    found = {unit: 0 for unit in units}
+    for model in {model for model, _ in units}:
+        ids = [item_id for m, item_id in units if m is model]
+        for item_id, availability in db.session.execute(
+            select(model.id, model.availability).where(model.id.in_(ids))
+        ):
+            found[(model, item_id)] = availability
+    return found
+
+
+class Counters:
+    """Availability per row = last value read from the database minus uncommitted reservations."""
+
+    def __init__(self, refresh_seconds):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._known = {}  # (model, id) -> (availability in the database, read at)
+        self._pending = {}  # (model, id) -> units reserved but not yet committed
+
+    def _stale(self, units):
+        now = time.monotonic()
+        with self._lock:
+            return [u for u in units if u not in self._known or now - self._known[u][1] > self.refresh_seconds]
+
+    def _store(self, availability):
+        now = time.monotonic()
+        with self._lock:
+            for unit, value in availability.items():
+                self._known[unit] = (value, now)
+
+    def reserve(self, units, quantity):
+        stale = self._stale(units)
+        if stale:
+            self._store(load_availability(stale))
+        with self._lock:
+            for model, item_id in units:
+                if self._known[(model, item_id)][0] - self._pending.get((model, item_id), 0) < quantity:
+                    raise InsufficientInventory(model, item_id, quantity)
+            for unit in units:
+                self._pending[unit] = self._pending.get(unit, 0) + quantity
+
+    def add_pending(self, units, quantity):
+        """Count units already admitted earlier, e.g. recovered from the queue."""
+        with self._lock:
+            for unit in units:
+                self._pending[unit] = self._pending.get(unit, 0) + quantity
+
+    def release(self, units, quantity):
+        self.add_pending(units, -quantity)
+
+    def committed(self, totals, fresh):
+        """A batch is in the database: move its units from pending into the fresh values."""
+        now = time.monotonic()
+        with self._lock:
+            for unit, quantity in totals.items():
+                self._pending[unit] -= quantity
+                if not self._pending[unit]:
+                    del self._pending[unit]
+            for unit, value in fresh.items():
+                self._known[unit] = (value, now)
+
+    def forget(self, model):
+        """Re-read every `model` counter on next use, e.g. after a bulk update."""
+        with self._lock:
+            self._known = {unit: known for unit, known in self._known.items() if unit[0] is not model}
+
+    def pending_units(self):
+        with self._lock:
+            return sum(self._pending.values())
+
+
+class QueueLocked(Exception):
+    """Raised when another process already owns the write-behind queue file."""
+
+
+class DurableQueue:
+    """Append-only JSONL file, locked to one process; every entry is on disk before the request returns."""
+
+    def __init__(self, path, fsync=True):
+        self.path = path
+        self.fsync = fsync
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                self._file.close()
+                raise QueueLocked(f"{path} is owned by another process")
+
+    def append(self, entry):
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self.lock:
+            self._file.write(line)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def read_all(self):
+        with open(self.path, encoding="utf-8") as f:
+            entries = []
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    logger.warning("Skipping torn line at the end of %s", self.path)
+            return entries
+
+    def truncate(self):
+        """Drop every entry; only call with self.lock held and nothing outstanding."""
+        self._file.truncate(0)
+        self._file.seek(0)
+
+    def close(self):
+        with self.lock:
+            self._file.close()
+
+
+def _booking_row(booking):
+    row = {c.key: getattr(booking, c.key) for c in Booking.__table__.columns if c.key != "id"}
+    row["booking_date"] = (row["booking_date"] or datetime.utcnow()).isoformat()
+    row["is_confirmed"] = True if row["is_confirmed"] is None else row["is_confirmed"]
+    return row
+
+
+def _entry_units(entry):
+    return [(MODELS[table], item_id) for table, item_id in entry["units"]]
+
+
+class WriteBehindPipeline:
+    def __init__(self, app):
+        config = app.config
+        self.app = app
+        self.batch_size = config["WRITE_BEHIND_BATCH_SIZE"]
+        self.flush_interval = config["WRITE_BEHIND_FLUSH_INTERVAL"]
+        self.reconcile_seconds = config["WRITE_BEHIND_RECONCILE_SECONDS"]
+        self.max_retries = config["WRITE_BEHIND_MAX_RETRIES"]
+        self.dead_letter_path = config["WRITE_BEHIND_DEAD_LETTER_PATH"] or config["WRITE_BEHIND_QUEUE_PATH"] + ".dead"
+        self.queue = DurableQueue(config["WRITE_BEHIND_QUEUE_PATH"], fsync=config["WRITE_BEHIND_FSYNC"])
+        self.counters = Counters(config["WRITE_BEHIND_REFRESH_SECONDS"])
+        self.stats = {
+            "enqueued": 0, "committed": 0, "batches": 0, "failed_batches": 0, "recovered": 0, "skipped": 0,
+            "dead_lettered": 0,
+        }
+        self._entries = deque()
+        self._outstanding = 0  # In the file but not yet committed
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = None
+
+    # Request side
+
+    def reserve(self, units, quantity):
+        self.counters.reserve(units, quantity)
+
+    def enqueue(self, booking, units, quantity):
+        """Make the booking durable and hand it to the writer; returns its reference."""
+        entry = {
+            "ref": uuid.uuid4().hex,
+            "booking": _booking_row(booking),
+            "units": [[model.__tablename__, item_id] for model, item_id in units],
+            "quantity": quantity,
+        }
+        try:
+            with self._cond:
+                self._outstanding += 1
+            self.queue.append(entry)
+        except Exception:
+            with self._cond:
+                self._outstanding -= 1
+            self.counters.release(units, quantity)
+            raise
+        with self._cond:
+            self._entries.append(entry)
+            self.stats["enqueued"] += 1
+            self._cond.notify()
+        return entry["ref"]
+
+    # Writer side
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="booking-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout=10):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _take_batch(self):
+        with self._cond:
+            while not self._entries and not self._stopping:
+                self._cond.wait()
+            if not self._entries:
+                return []
+        # Group commit: give concurrent requests a moment to join this batch
+        if self.flush_interval and len(self._entries) < self.batch_size:
+            time.sleep(self.flush_interval)
+        with self._cond:
+            count = min(self.batch_size, len(self._entries))
+            return [self._entries.popleft() for _ in range(count)]
+
+    def _run(self):
+        last_reconcile = time.monotonic()
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return
+            if self.reconcile_seconds and time.monotonic() - last_reconcile > self.reconcile_seconds:
+                last_reconcile = time.monotonic()
+                with self.app.app_context():
+                    for row, (cached, actual) in self.reconcile().items():
+                        logger.warning("Write-behind counter for %s drifted: cached %s, database %s", row, cached, actual)
+            for attempt in range(1, self.max_retries + 1):
+                try:
+                    with self.app.app_context():
+                        self.commit_batch(batch)
+                    break
+                except Exception as e:
+                    self.stats["failed_batches"] += 1
+                    logger.error("Write-behind batch of %d bookings failed (attempt %d): %s", len(batch), attempt, e)
+                    if attempt < self.max_retries:
+                        time.sleep(1)
+            else:
+                with self.app.app_context():
+                    self.commit_one_by_one(batch)
+
+    def commit_one_by_one(self, batch):
+        """Commit a failing batch entry by entry; entries that still fail go to the dead-letter file."""
+        for entry in batch:
+            try:
+                self.commit_batch([entry])
+            except Exception as e:
+                self.dead_letter(entry, e)
+
+    def dead_letter(self, entry, error):
+        """Set an entry aside for a human: append it with its error and give its units back."""
+        record = dict(entry, error=str(error), failed_at=datetime.utcnow().isoformat())
+        with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.counters.release(_entry_units(entry), entry["quantity"])
+        with self._cond:
+            self._outstanding -= 1
+            self.stats["dead_lettered"] += 1
+        logger.error("Write-behind booking %s moved to %s: %s", entry["ref"], self.dead_letter_path, error)
+        self._maybe_truncate()
+
+    def _ingested(self, refs):
+        """The refs among `refs` that are already committed."""
+        done = set()
+        for start in range(0, len(refs), 500):
+            done.update(db.session.execute(
+                select(IngestedBooking.ref).where(IngestedBooking.ref.in_(refs[start:start + 500]))
+            ).scalars())
+        return done
+
+    def commit_batch(self, batch):
+        """
+        Insert a batch of bookings in one transaction, each reserving its units
+        in its own savepoint with the conditional UPDATE of inventory.reserve().
+        Entries already in ingested_booking (committed by a replay elsewhere)
+        are dropped instead of inserted twice; entries whose units ran out since
+        the counters were read are dead-lettered once the rest has committed.
+        """
+        done = self._ingested([entry["ref"] for entry in batch])
+        for entry in batch:
+            if entry["ref"] in done:
+                self.counters.release(_entry_units(entry), entry["quantity"])
+                self.stats["skipped"] += 1
+        batch_size = len(batch)
+        batch = [entry for entry in batch if entry["ref"] not in done]
+        if not batch:
+            with self._cond:
+                self._outstanding -= batch_size
+            self._maybe_truncate()
+            return
+        refused = []
+        totals = {}
+        try:
+            for entry in batch:
+                units = _entry_units(entry)
+                booking = Booking(**dict(
+                    entry["booking"], booking_date=datetime.fromisoformat(entry["booking"]["booking_date"])
+                ))
+                try:
+                    with db.session.begin_nested():
+                        db.session.add(booking)
+                        reserve(units, entry["quantity"], "write_behind", booking)
+                        db.session.flush()
+                        db.session.add(IngestedBooking(ref=entry["ref"], booking_id=booking.id))
+                except InsufficientInventory as e:
+                    refused.append((entry, e))
+                    continue
+                for unit in units:
+                    totals[unit] = totals.get(unit, 0) + entry["quantity"]
+            # Refused rows are re-read too: the counters believed they had room
+            fresh = load_availability(list({unit for entry in batch for unit in _entry_units(entry)}))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        self.counters.committed(totals, fresh)
+        with self._cond:
+            self._outstanding -= batch_size - len(refused)
+            self.stats["committed"] += len(batch) - len(refused)
+            self.stats["batches"] += 1
+        for entry, error in refused:
+            self.dead_letter(entry, error)  # Releases its counters and outstanding slot
+        self._maybe_truncate()
+
+    def _maybe_truncate(self):
+        with self.queue.lock:
+            with self._cond:
+                if self._outstanding == 0:
+                    self.queue.truncate()
+
+    # Recovery
+
+    def recover(self):
+        """Queue entries not yet in ingested_booking go back to the writer; returns how many."""
+        entries = self.queue.read_all()
+        done = self._ingested([entry["ref"] for entry in entries])
+        pending = [entry for entry in entries if entry["ref"] not in done]
+        with self._cond:
+            for entry in pending:
+                self.counters.add_pending(_entry_units(entry), entry["quantity"])
+                self._entries.append(entry)
+            self._outstanding += len(pending)
+            self.stats["recovered"] += len(pending)
+        if pending:
+            logger.warning("Recovered %d uncommitted bookings from %s", len(pending), self.queue.path)
+        else:
+            self._maybe_truncate()
+        return len(pending)
+
+    def drain(self):
+        """Commit everything queued from the calling thread (writer not running); returns how many committed."""
+        before = self.stats["committed"]
+        while self._entries:
+            count = min(self.batch_size, len(self._entries))
+            batch = [self._entries.popleft() for _ in range(count)]
+            try:
+                self.commit_batch(batch)
+            except Exception as e:
+                logger.error("Write-behind batch of %d bookings failed, committing one by one: %s", len(batch), e)
+                self.commit_one_by_one(batch)
+        return self.stats["committed"] - before
+
+    def reconcile(self):
+        """Re-read every cached counter from the database; returns rows whose value had drifted."""
+        with self.counters._lock:
+            cached = {unit: value for unit, (value, _) in self.counters._known.items()}
+        fresh = load_availability(list(cached))
+        drifted = {f"{model.__tablename__}:{item_id}": (cached[(model, item_id)], value)
+                   for (model, item_id), value in fresh.items() if value != cached[(model, item_id)]}
+        self.counters._store(fresh)
+        return drifted
+
+
+def pipeline(app=None):
+    """The app's pipeline, created, recovered and started on first use."""
+    app = app or current_app._get_current_object()
+    existing = app.extensions.get("write_behind")
+    if existing is not None:
+        return existing
+    with _create_lock:
+        if "write_behind" not in app.extensions:
+            created = WriteBehindPipeline(app)
+            with app.app_context():
+                created.recover()
+            created.start()
+            app.extensions["write_behind"] = created
+    return app.extensions["write_behind"]
+
+
+def enabled():
+    """
+    Whether this request books through write-behind: BOOKING_WRITE_BEHIND is on
+    and this process owns the queue. A process that cannot get the queue turns
+    write-behind off for itself and books directly.
+    """
+    app = current_app._get_current_object()
+    if not app.config["BOOKING_WRITE_BEHIND"]:
+        return False
+    try:
+        pipeline(app)
+    except QueueLocked as e:
+        logger.error("Write-behind disabled in this process: %s", e)
+        app.config["BOOKING_WRITE_BEHIND"] = False
+        return False
+    return True
+
+
+def accepts(units):
+    """
+    Whether write-behind can book `units`. Its counters only know a row's own
+    availability, so flights with fare classes and hotels split into nights are
+    booked directly, as is anything that is not a whole flight or hotel.
+    """
+    if any(model not in MODELS.values() for model, _ in units):
+        return False
+    flights = [item_id for model, item_id in units if model is Flight]
+    hotels = [item_id for model, item_id in units if model is Hotel]
+    if flights and db.session.scalar(select(FareClass.id).where(FareClass.flight_id.in_(flights)).limit(1)):
+        return False
+    if hotels and db.session.scalar(select(HotelNight.hotel_id).where(HotelNight.hotel_id.in_(hotels)).limit(1)):
+        return False
+    return True
+
+
+def init_app(app):
+    app.config.setdefault("BOOKING_WRITE_BEHIND", False)
+    app.config.setdefault("WRITE_BEHIND_QUEUE_PATH", os.path.join(app.instance_path, "booking-queue.jsonl"))
+    app.config.setdefault("WRITE_BEHIND_FSYNC", True)
+    app.config.setdefault("WRITE_BEHIND_BATCH_SIZE", 200)
+    app.config.setdefault("WRITE_BEHIND_FLUSH_INTERVAL", 0.01)
+    app.config.setdefault("WRITE_BEHIND_REFRESH_SECONDS", 5)
+    app.config.setdefault("WRITE_BEHIND_RECONCILE_SECONDS", 60)
+    app.config.setdefault("WRITE_BEHIND_MAX_RETRIES", 3)
+    app.config.setdefault("WRITE_BEHIND_DEAD_LETTER_PATH", None)  # Default: the queue path + ".dead"
+    app.teardown_request(_release_abandoned)
+
+
+@metrics.register_collector
+def write_behind_stats():
+    current = current_app.extensions.get("write_behind") if has_app_context() else None
+    if current is None:
+        return
+    yield "write_behind_queue_depth", {}, len(current._entries)
+    yield "write_behind_pending_units", {}, current.counters.pending_units()
+    for name, value in current.stats.items():
+        yield f"write_behind_{name}", {}, value
+
+
+def reserve_for_request(units, quantity):
+    """Reserve on the counters; released at teardown unless enqueue_for_request() ran."""
+    pipeline().reserve(units, quantity)
+    g.write_behind_reservation = (units, quantity)
+
+
+def enqueue_for_request(booking):
+    units, quantity = g.pop("write_behind_reservation")
+    return pipeline().enqueue(booking, units, quantity)
+
+
+def _release_abandoned(exc):
+    reservation = g.pop("write_behind_reservation", None)
+    if reservation is not None:
+        pipeline().counters.release(*reservation)
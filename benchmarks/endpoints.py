@@ -0,0 +1,365 @@
+"""
+End-to-end endpoint benchmark against a generated dataset.
+
+    flask generate-data --output instance/bench.db --scale 0.1
+    python -m benchmarks.endpoints --db instance/bench.db --requests 200 --concurrency 4
+    python -m benchmarks.endpoints --db instance/bench.db --server --save-baseline
+
+Each scenario is driven by --concurrency clients, each logged in as its own
+user, through the Flask test client or (--server) over HTTP against a local
+threaded WSGI server. The dataset is copied first, so bookings made by the
+run never touch the original file. Results are written as JSON and compared
+with --baseline; the exit status is 1 when a scenario regressed.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+ADMIN_LISTS = ("user", "booking", "flight", "hotel", "packagedeal")
+
+
+class TestClient:
+    """One browser session through app.test_client()."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def get(self, path):
+        return self.client.get(path).status_code
+
+    def post(self, path, data):
+        return self.client.post(path, data=data).status_code
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None  # Measure the view itself, like the test client does
+
+
+class HttpClient:
+    """One browser session over HTTP with its own cookie jar."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect()
+        )
+
+    def _open(self, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        try:
+            with self.opener.open(self.base_url + path, body) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def get(self, path):
+        return self._open(path)
+
+    def post(self, path, data):
+        return self._open(path, data)
+
+
+class Dataset:
+    """Row counts and per-user bookings of the benchmark copy, read once up front."""
+
+    def __init__(self, path):
+        from app.datagen import CITIES, DEFAULT_START, zipf_weights
+
+        self.cities = CITIES
+        self.city_weights = zipf_weights(len(CITIES))
+        self.start = DEFAULT_START
+        conn = sqlite3.connect(path)
+        try:
+            count = lambda table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            self.flights, self.hotels, self.packages = count("flight"), count("hotel"), count("package_deal")
+            # The busiest users have the most bookings to cancel and update
+            self.users = [
+                row[0] for row in conn.execute(
+                    "SELECT user_id FROM booking WHERE is_confirmed GROUP BY user_id ORDER BY COUNT(*) DESC LIMIT 256"
+                )
+            ]
+            self._conn_path = path
+        finally:
+            conn.close()
+
+    def confirmed_bookings(self, user_id):
+        conn = sqlite3.connect(self._conn_path)
+        try:
+            return [row[0] for row in conn.execute(
+                "SELECT id FROM booking WHERE user_id = ? AND is_confirmed ORDER BY id", (user_id,)
+            )]
+        finally:
+            conn.close()
+
+    def city(self, rng):
+        return rng.choices(self.cities, cum_weights=self.city_weights)[0]
+
+    def date(self, rng, low, high):
+        return (self.start + timedelta(days=rng.randrange(low, high))).strftime("%Y-%m-%d")
+
+
+def search_form(dataset, rng, booking_type):
+    destination = dataset.city(rng)
+    form = {"booking_type": booking_type, "destination": destination, "guests": rng.choice((1, 2))}
+    if booking_type == "Flight":
+        departure_city = dataset.city(rng)
+        while departure_city == destination:
+            departure_city = dataset.city(rng)
+        form.update(departure_city=departure_city, departure_time=dataset.date(rng, 0, 120))
+    else:
+        check_in = rng.randrange(30, 240)
+        form.update(check_in=dataset.date(rng, check_in, check_in + 1),
+                    check_out=dataset.date(rng, check_in + 1, check_in + 4))
+    return form
+
+
+class Worker:
+    """A logged-in client plus the state its scenarios draw on."""
+
+    def __init__(self, client, dataset, user_id, seed):
+        self.client = client
+        self.dataset = dataset
+        self.rng = random.Random(seed)
+        self.bookings = dataset.confirmed_bookings(user_id)
+        client.post("/login", {"email": f"user{user_id}@example.com", "password": "password"})
+        client.post("/admin-login", {"password": "admin123"})
+        # book() reads the destination and party size that a search leaves in the session
+        client.post("/search", search_form(dataset, self.rng, "Hotel"))
+
+    def search_flight(self):
+        return self.client.post("/search", search_form(self.dataset, self.rng, "Flight"))
+
+    def search_hotel(self):
+        return self.client.post("/search", search_form(self.dataset, self.rng, "Hotel"))
+
+    def search_package(self):
+        return self.client.post("/search", search_form(self.dataset, self.rng, "PackageDeal"))
+
+    def book(self):
+        booking_type, count = self.rng.choice((
+            ("Flight", self.dataset.flights), ("Hotel", self.dataset.hotels), ("PackageDeal", self.dataset.packages),
+        ))
+        return self.client.post(f"/book/{booking_type}/{self.rng.randint(1, count)}", {})
+
+    def update_booking(self):
+        if not self.bookings:
+            return None
+        booking_id = self.rng.choice(self.bookings)
+        return self.client.post(f"/edit_booking/{booking_id}", {"num_people": self.rng.randint(1, 3)})
+
+    def cancel_booking(self):
+        if not self.bookings:
+            return None
+        return self.client.post(f"/cancel-booking/{self.bookings.pop()}", {})
+
+    def profile(self):
+        return self.client.get("/profile")
+
+    def admin_list(self, view):
+        return self.client.get(f"/admin/{view}/")
+
+
+SCENARIOS = {
+    "search_flight": Worker.search_flight,
+    "search_hotel": Worker.search_hotel,
+    "search_package": Worker.search_package,
+    "book": Worker.book,
+    "update_booking": Worker.update_booking,
+    "cancel_booking": Worker.cancel_booking,
+    "profile": Worker.profile,
+}
+for _view in ADMIN_LISTS:
+    SCENARIOS[f"admin_{_view}"] = lambda worker, view=_view: worker.admin_list(view)
+
+
+def percentile(ordered, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))]
+
+
+def run_scenario(workers, action, requests):
+    """Split `requests` calls of `action` across the workers; return the summary."""
+    latencies, errors, skipped = [], [0], [0]
+    lock = threading.Lock()
+
+    def drive(worker, count):
+        local, local_errors, local_skipped = [], 0, 0
+        for _ in range(count):
+            started = time.perf_counter()
+            status = action(worker)
+            elapsed = (time.perf_counter() - started) * 1000
+            if status is None:
+                local_skipped += 1
+                continue
+            local.append(elapsed)
+            if status >= 500:
+                local_errors += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+            skipped[0] += local_skipped
+
+    share, extra = divmod(requests, len(workers))
+    threads = [
+        threading.Thread(target=drive, args=(worker, share + (1 if i < extra else 0)))
+        for i, worker in enumerate(workers)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    rounded = lambda value: round(value, 3) if value is not None else None
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "skipped": skipped[0],
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else None,
+        "mean_ms": rounded(sum(latencies) / len(latencies) if latencies else None),
+        "p50_ms": rounded(percentile(latencies, 50)),
+        "p95_ms": rounded(percentile(latencies, 95)),
+        "p99_ms": rounded(percentile(latencies, 99)),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Scenarios whose p95 grew or throughput fell by more than `tolerance`."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous or not current["requests"]:
+            continue
+        if previous.get("p95_ms") and current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']} -> {current['p95_ms']} ms")
+        if previous.get("throughput_rps") and current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {previous['throughput_rps']} -> {current['throughput_rps']} req/s")
+        if current["errors"] > previous.get("errors", 0):
+            regressions.append(f"{name}: errors {previous.get('errors', 0)} -> {current['errors']}")
+    return regressions
+
+
+def create_benchmark_app(db_path):
+    from app import create_app
+
+    return create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+        "WTF_CSRF_ENABLED": False,  # Clients post forms directly
+        "ADMIN_ENABLED": True,
+        "LOG_FILE": None,
+        "LOG_TO_CONSOLE": False,
+        "LOG_REQUESTS": False,
+        "PROFILER_SAMPLE_RATE": 0.0,
+    })
+
+
+def run(db, requests, concurrency, scenarios, server=False, seed=1):
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    db_path = os.path.join(workdir, "bench.db")
+    shutil.copy(db, db_path)
+    httpd = None
+    try:
+        app = create_benchmark_app(db_path)
+        dataset = Dataset(db_path)
+        if len(dataset.users) < concurrency:
+            raise SystemExit(f"{db} has bookings for only {len(dataset.users)} users; lower --concurrency")
+
+        if server:
+            from werkzeug.serving import make_server
+
+            httpd = make_server("127.0.0.1", 0, app, threaded=True)
+            threading.Thread(target=httpd.serve_forever, daemon=True).start()
+            make_client = lambda: HttpClient(f"http://127.0.0.1:{httpd.server_port}")
+        else:
+            make_client = lambda: TestClient(app)
+
+        workers = [Worker(make_client(), dataset, dataset.users[i], seed + i) for i in range(concurrency)]
+        results = {}
+        for name in scenarios:
+            results[name] = run_scenario(workers, SCENARIOS[name], requests)
+            print(f"{name:18} {results[name]['requests']:>6} req  {results[name]['throughput_rps']:>8} req/s  "
+                  f"p50 {results[name]['p50_ms']} ms  p95 {results[name]['p95_ms']} ms  "
+                  f"p99 {results[name]['p99_ms']} ms  errors {results[name]['errors']}")
+        return results
+    finally:
+        if httpd is not None:
+            httpd.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", default=os.path.join(ROOT, "instance", "bench.db"), help="dataset from `flask generate-data`")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=1, help="concurrent clients")
+    parser.add_argument("--server", action="store_true", help="go over HTTP to a local threaded server")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="run only these (repeatable)")
+    parser.add_argument("--output", default=None, help="write results JSON here")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="results JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown (default 0.2)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} not found; create it with `flask generate-data --output {args.db}`")
+
+    results = run(args.db, args.requests, args.concurrency, args.scenario or list(SCENARIOS), args.server, args.seed)
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "dataset": os.path.abspath(args.db),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "mode": "server" if args.server else "test-client",
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare against; run with --save-baseline to create one.")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline["meta"].get("mode") != report["meta"]["mode"] or baseline["meta"].get("concurrency") != args.concurrency:
+        print("Warning: baseline was recorded with a different mode or concurrency.")
+    regressions = compare(results, baseline["results"], args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
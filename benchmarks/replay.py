@@ -0,0 +1,230 @@
+"""
+Replay traffic recorded with TRAFFIC_CAPTURE_PATH against a database snapshot.
+
+    TRAFFIC_CAPTURE_PATH=traffic.jsonl   (set in the app config while serving)
+    python -m benchmarks.replay traffic.jsonl --db snapshot.db --speed 5 --output old.json
+    git checkout my-branch
+    python -m benchmarks.replay traffic.jsonl --db snapshot.db --speed 5 --compare old.json
+
+Requests are re-driven in their recorded order, one test client per recorded
+client, at the original pace (--speed 1), faster (--speed 5) or back to back
+(--speed 0). The snapshot is copied first, so every run starts from the same
+data. Before each request the recorded session state is restored, so a
+capture that starts mid-session still replays logged-in traffic.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from benchmarks.endpoints import create_benchmark_app, percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def read_capture(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class Replayer:
+    def __init__(self, app, db_path, password):
+        from app.log_analyzer import NUMBERS_IN_PATH
+        from app.traffic import REDACTED
+
+        self.app = app
+        self.adapter = app.url_map.bind("localhost")
+        self.numbers_in_path = NUMBERS_IN_PATH
+        self.redacted = REDACTED
+        self.session_keys = app.config["TRAFFIC_SESSION_KEYS"]
+        self.password = password
+        self.clients = {}
+        self.users = {}
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+
+    def endpoint(self, method, path):
+        try:
+            return self.adapter.match(path, method=method)[0]
+        except Exception:
+            return self.numbers_in_path.sub("/<int>", path)  # 404s, redirects to slash URLs
+
+    def user(self, user_id):
+        if user_id not in self.users:
+            row = self.conn.execute("SELECT name, email FROM user WHERE id = ?", (user_id,)).fetchone()
+            self.users[user_id] = row or ("Replay User", "replay@example.com")
+        return self.users[user_id]
+
+    def restore_session(self, client, state):
+        """Make the client's session match the recorded whitelisted state."""
+        with client.session_transaction() as sess:
+            for key in self.session_keys:
+                if key in state:
+                    sess[key] = state[key]
+                else:
+                    sess.pop(key, None)
+            if state.get("user_id"):
+                sess["user_name"], sess["user_email"] = self.user(state["user_id"])
+            else:
+                sess.pop("user_name", None)
+                sess.pop("user_email", None)
+
+    def form(self, record):
+        """Recorded form with redacted fields filled with replay values."""
+        name, email = self.user(record["session"]["user_id"]) if record.get("session", {}).get("user_id") else (
+            "Replay User", "replay@example.com")
+        fill = {"email": email, "name": name}
+        form = {}
+        for key, value in record.get("form", {}).items():
+            if value == self.redacted:
+                if key == "csrf_token":
+                    continue  # CSRF is disabled for the replay app
+                value = fill.get(key, self.password)
+            form[key] = value
+        return form
+
+    def send(self, record):
+        """Replay one request; returns (endpoint, elapsed ms, status)."""
+        client = self.clients.get(record["client"])
+        if client is None:
+            client = self.clients[record["client"]] = self.app.test_client()
+        self.restore_session(client, record.get("session", {}))
+        data = self.form(record) if record.get("form") else None
+
+        started = time.perf_counter()
+        response = client.open(record["path"], method=record["method"],
+                               query_string=record.get("query"), data=data)
+        elapsed = (time.perf_counter() - started) * 1000
+        response.close()
+        return self.endpoint(record["method"], record["path"]), elapsed, response.status_code
+
+
+def summarize(latencies):
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+    }
+
+
+def replay(capture, db, speed, password, limit=None):
+    workdir = tempfile.mkdtemp(prefix="replay-")
+    db_path = os.path.join(workdir, "snapshot.db")
+    shutil.copy(db, db_path)
+    try:
+        app = create_benchmark_app(db_path)
+        replayer = Replayer(app, db_path, password)
+        replayed = defaultdict(list)
+        recorded = defaultdict(list)
+        mismatches = defaultdict(int)
+        max_lag = 0.0
+        first_ts = started = None
+
+        for count, record in enumerate(read_capture(capture)):
+            if limit is not None and count >= limit:
+                break
+            if first_ts is None:
+                first_ts, started = record["ts"], time.perf_counter()
+            if speed:
+                due = started + (record["ts"] - first_ts) / speed
+                wait = due - time.perf_counter()
+                if wait > 0:
+                    time.sleep(wait)
+                else:
+                    max_lag = max(max_lag, -wait)
+
+            endpoint, elapsed, status = replayer.send(record)
+            replayed[endpoint].append(elapsed)
+            if "ms" in record:
+                recorded[endpoint].append(record["ms"])
+            if status != record.get("status"):
+                mismatches[endpoint] += 1
+
+        replayer.conn.close()
+        wall = time.perf_counter() - started if started is not None else 0.0
+        return {
+            "requests": sum(len(v) for v in replayed.values()),
+            "wall_seconds": round(wall, 3),
+            "max_lag_seconds": round(max_lag, 3),
+            "endpoints": {
+                name: dict(summarize(latencies), status_mismatches=mismatches[name])
+                for name, latencies in sorted(replayed.items())
+            },
+            "recorded": {name: summarize(latencies) for name, latencies in sorted(recorded.items())},
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _delta(old, new):
+    if not old:
+        return "     n/a"
+    return f"{(new - old) / old * 100:+7.1f}%"
+
+
+def format_comparison(baseline, current):
+    lines = [f"{'endpoint':32} {'requests':>8} {'p50 old':>9} {'p50 new':>9} {'delta':>8} "
+             f"{'p95 old':>9} {'p95 new':>9} {'delta':>8}"]
+    for name, new in current.items():
+        old = baseline.get(name)
+        if old is None:
+            lines.append(f"{name[:32]:32} {new['requests']:>8} {'':>9} {new['p50_ms']:>9} {'new':>8}")
+            continue
+        lines.append(
+            f"{name[:32]:32} {new['requests']:>8} {old['p50_ms']:>9} {new['p50_ms']:>9} "
+            f"{_delta(old['p50_ms'], new['p50_ms'])} {old['p95_ms']:>9} {new['p95_ms']:>9} "
+            f"{_delta(old['p95_ms'], new['p95_ms'])}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("capture", help="JSONL file written by the traffic recorder")
+    parser.add_argument("--db", required=True, help="database snapshot taken when the capture started")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = recorded pace, 5 = five times faster, 0 = no pauses")
+    parser.add_argument("--limit", type=int, default=None, help="replay only the first N requests")
+    parser.add_argument("--password", default="password", help="used wherever a password was redacted")
+    parser.add_argument("--output", default=None, help="write the results JSON here")
+    parser.add_argument("--compare", default=None, help="results JSON of another code version")
+    args = parser.parse_args(argv)
+
+    results = replay(args.capture, args.db, args.speed, args.password, args.limit)
+    results["meta"] = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "capture": os.path.abspath(args.capture),
+        "speed": args.speed,
+    }
+    print(f"Replayed {results['requests']} requests in {results['wall_seconds']}s "
+          f"(max lag behind schedule {results['max_lag_seconds']}s)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    # Without --compare, measure against the latencies seen when the traffic was recorded
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["endpoints"]
+    else:
+        baseline = results["recorded"]
+    print(format_comparison(baseline, results["endpoints"]))
+    mismatched = {name: s["status_mismatches"] for name, s in results["endpoints"].items() if s["status_mismatches"]}
+    if mismatched:
+        print(f"Status codes differing from the recording: {mismatched}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+Cold-start benchmark: time `create_app()` in fresh interpreters.
+
+    python -m benchmarks.startup --runs 10 --max-ms 1500
+
+Exits with status 1 when the median cold start exceeds --max-ms, so it can
+guard CI against slow imports creeping back in. --importtime prints the
+slowest modules reported by `python -X importtime`.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STARTUP_SNIPPET = (
+    "import time; t = time.perf_counter(); "
+    "from app import create_app; create_app(); "
+    "print((time.perf_counter() - t) * 1000)"
+)
+
+
+def measure(runs, admin_enabled):
+    """Return the create_app() wall time of each run in milliseconds."""
+    env = dict(os.environ, ADMIN_ENABLED="1" if admin_enabled else "0")
+    timings = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", STARTUP_SNIPPET],
+            cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+        )
+        timings.append(float(out.stdout.strip().splitlines()[-1]))
+    return timings
+
+
+def slowest_imports(limit):
+    """Return (cumulative_us, module) for the slowest imports of the app."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "from app import create_app; create_app()"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), module.rstrip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=None, help="fail if the median exceeds this")
+    parser.add_argument("--no-admin", action="store_true", help="measure a web-only worker (ADMIN_ENABLED=0)")
+    parser.add_argument("--importtime", type=int, default=0, metavar="N", help="show the N slowest imports")
+    args = parser.parse_args(argv)
+
+    timings = measure(args.runs, admin_enabled=not args.no_admin)
+    median = statistics.median(timings)
+    print(f"create_app() cold start: median {median:.1f} ms, min {min(timings):.1f} ms, "
+          f"max {max(timings):.1f} ms over {args.runs} runs")
+
+    for cumulative, module in slowest_imports(args.importtime) if args.importtime else []:
+        print(f"{cumulative / 1000:9.1f} ms  {module}")
+
+    if args.max_ms is not None and median > args.max_ms:
+        print(f"FAIL: median cold start {median:.1f} ms exceeds budget of {args.max_ms:.1f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""booking archive: booking_archive table
+
+Revision ID: 066db52c93de
+Revises: c1f71a1c6fda
+Create Date: 2026-10-19 09:56:49.271745
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '066db52c93de'
+down_revision = 'c1f71a1c6fda'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # `flask init-db` may have created this table already
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('booking_archive'):
+        op.create_table('booking_archive',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('destination', sa.String(length=60), nullable=False),
+        sa.Column('booking_date', sa.DateTime(), nullable=False),
+        sa.Column('num_people', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('flight_number', sa.String(length=50), nullable=True),
+        sa.Column('total_price', sa.Integer(), nullable=False),
+        sa.Column('service_type', sa.String(length=50), nullable=False),
+        sa.Column('flight_id', sa.Integer(), nullable=True),
+        sa.Column('hotel_id', sa.Integer(), nullable=True),
+        sa.Column('package_deal_id', sa.Integer(), nullable=True),
+        sa.Column('is_confirmed', sa.Boolean(), nullable=False),
+        sa.Column('check_in', sa.Date(), nullable=True),
+        sa.Column('check_out', sa.Date(), nullable=True),
+        sa.Column('seats', sa.String(length=400), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('booking_archive', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_booking_archive_user_id'), ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('booking_archive', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_booking_archive_user_id'))
+    op.drop_table('booking_archive')
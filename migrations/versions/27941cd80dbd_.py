@@ -0,0 +1,63 @@
+"""inventory ledger: inventory_ledger and inventory_snapshot tables
+
+Revision ID: 27941cd80dbd
+Revises: 31bf3ec26f16
+Create Date: 2026-10-19 09:42:44.423299
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '27941cd80dbd'
+down_revision = '31bf3ec26f16'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # `flask init-db` may have created these tables already
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('inventory_ledger'):
+        op.create_table('inventory_ledger',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('service_table', sa.String(length=20), nullable=False),
+        sa.Column('item_id', sa.Integer(), nullable=False),
+        sa.Column('delta', sa.Integer(), nullable=False),
+        sa.Column('reason', sa.String(length=30), nullable=False),
+        sa.Column('booking_id', sa.Integer(), nullable=True),
+        sa.Column('first_night', sa.Date(), nullable=True),
+        sa.Column('last_night', sa.Date(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['booking_id'], ['booking.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('inventory_ledger', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_inventory_ledger_created_at'), ['created_at'], unique=False)
+            batch_op.create_index('ix_inventory_ledger_item', ['service_table', 'item_id', 'id'], unique=False)
+
+    if not inspector.has_table('inventory_snapshot'):
+        op.create_table('inventory_snapshot',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('service_table', sa.String(length=20), nullable=False),
+        sa.Column('item_id', sa.Integer(), nullable=False),
+        sa.Column('night', sa.Date(), nullable=True),
+        sa.Column('availability', sa.Integer(), nullable=False),
+        sa.Column('ledger_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('inventory_snapshot', schema=None) as batch_op:
+            batch_op.create_index('ix_inventory_snapshot_item', ['service_table', 'item_id', 'ledger_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('inventory_snapshot', schema=None) as batch_op:
+        batch_op.drop_index('ix_inventory_snapshot_item')
+    op.drop_table('inventory_snapshot')
+
+    with op.batch_alter_table('inventory_ledger', schema=None) as batch_op:
+        batch_op.drop_index('ix_inventory_ledger_item')
+        batch_op.drop_index(batch_op.f('ix_inventory_ledger_created_at'))
+    op.drop_table('inventory_ledger')
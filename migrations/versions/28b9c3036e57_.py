@@ -0,0 +1,33 @@
+"""write-behind bookings: ingested_booking table
+
+Revision ID: 28b9c3036e57
+Revises: 728f6db9d2e3
+Create Date: 2026-10-19 09:14:03.567646
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '28b9c3036e57'
+down_revision = '728f6db9d2e3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # `flask init-db` may have created this table already
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('ingested_booking'):
+        op.create_table('ingested_booking',
+        sa.Column('ref', sa.String(length=32), nullable=False),
+        sa.Column('booking_id', sa.Integer(), nullable=False),
+        sa.Column('ingested_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['booking_id'], ['booking.id'], ),
+        sa.PrimaryKeyConstraint('ref')
+        )
+
+
+def downgrade():
+    op.drop_table('ingested_booking')
@@ -0,0 +1,70 @@
+"""fare classes and seat maps: fare_class, seat_map and seat_assignment tables
+
+Revision ID: 31bf3ec26f16
+Revises: 94cb83a09d5f
+Create Date: 2026-10-19 09:35:15.657856
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '31bf3ec26f16'
+down_revision = '94cb83a09d5f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # `flask init-db` may have created these tables already
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('fare_class'):
+        op.create_table('fare_class',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('flight_id', sa.Integer(), nullable=False),
+        sa.Column('code', sa.String(length=1), nullable=False),
+        sa.Column('name', sa.String(length=40), nullable=False),
+        sa.Column('price', sa.Float(), nullable=False),
+        sa.Column('availability', sa.Integer(), nullable=False),
+        sa.Column('first_row', sa.Integer(), nullable=False),
+        sa.Column('last_row', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['flight_id'], ['flight.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('flight_id', 'code', name='uq_fare_class_flight_code')
+        )
+
+    if not inspector.has_table('seat_map'):
+        op.create_table('seat_map',
+        sa.Column('flight_id', sa.Integer(), nullable=False),
+        sa.Column('layout', sa.String(length=20), nullable=False),
+        sa.Column('rows', sa.Integer(), nullable=False),
+        sa.Column('taken', sa.LargeBinary(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['flight_id'], ['flight.id'], ),
+        sa.PrimaryKeyConstraint('flight_id')
+        )
+
+    if not inspector.has_table('seat_assignment'):
+        op.create_table('seat_assignment',
+        sa.Column('booking_id', sa.Integer(), nullable=False),
+        sa.Column('flight_id', sa.Integer(), nullable=False),
+        sa.Column('fare_class_id', sa.Integer(), nullable=False),
+        sa.Column('seats', sa.String(length=400), nullable=False),
+        sa.ForeignKeyConstraint(['booking_id'], ['booking.id'], ),
+        sa.ForeignKeyConstraint(['fare_class_id'], ['fare_class.id'], ),
+        sa.ForeignKeyConstraint(['flight_id'], ['flight.id'], ),
+        sa.PrimaryKeyConstraint('booking_id')
+        )
+        with op.batch_alter_table('seat_assignment', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_seat_assignment_flight_id'), ['flight_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('seat_assignment', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_seat_assignment_flight_id'))
+    op.drop_table('seat_assignment')
+
+    op.drop_table('seat_map')
+
+    op.drop_table('fare_class')
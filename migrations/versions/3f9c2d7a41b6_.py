@@ -0,0 +1,48 @@
+"""retire flights and hotels: is_active flag and partial indexes over live rows
+
+Revision ID: 3f9c2d7a41b6
+Revises: 8ec0777c942d
+Create Date: 2026-10-18 10:12:41.381204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c2d7a41b6'
+down_revision = '8ec0777c942d'
+branch_labels = None
+depends_on = None
+
+
+def _has_column(table, column):
+    return column in {c['name'] for c in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def _has_index(table, name):
+    return name in {i['name'] for i in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    # Tables made by `flask init-db` may already have all of this
+    for table in ('flight', 'hotel'):
+        if not _has_column(table, 'is_active'):
+            with op.batch_alter_table(table, schema=None) as batch_op:
+                batch_op.add_column(sa.Column('is_active', sa.Boolean(), server_default=sa.true(), nullable=False))
+
+    if not _has_index('flight', 'ix_flight_live_departure'):
+        op.create_index('ix_flight_live_departure', 'flight', ['departure_time'],
+                        sqlite_where=sa.text('is_active = 1'), postgresql_where=sa.text('is_active'))
+    if not _has_index('hotel', 'ix_hotel_live_checkout'):
+        op.create_index('ix_hotel_live_checkout', 'hotel', ['checkout_date'],
+                        sqlite_where=sa.text('is_active = 1'), postgresql_where=sa.text('is_active'))
+
+
+def downgrade():
+    op.drop_index('ix_hotel_live_checkout', table_name='hotel')
+    op.drop_index('ix_flight_live_departure', table_name='flight')
+    with op.batch_alter_table('hotel', schema=None) as batch_op:
+        batch_op.drop_column('is_active')
+    with op.batch_alter_table('flight', schema=None) as batch_op:
+        batch_op.drop_column('is_active')
@@ -0,0 +1,32 @@
+"""availability reconciliation: inventory_capacity table
+
+Revision ID: 49239273bad5
+Revises: 28b9c3036e57
+Create Date: 2026-10-19 09:21:40.642892
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '49239273bad5'
+down_revision = '28b9c3036e57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # `flask init-db` may have created this table already
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('inventory_capacity'):
+        op.create_table('inventory_capacity',
+        sa.Column('service_table', sa.String(length=20), nullable=False),
+        sa.Column('item_id', sa.Integer(), nullable=False),
+        sa.Column('capacity', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('service_table', 'item_id')
+        )
+
+
+def downgrade():
+    op.drop_table('inventory_capacity')
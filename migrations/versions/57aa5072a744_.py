@@ -0,0 +1,49 @@
+"""waitlists: waitlist_entry table
+
+Revision ID: 57aa5072a744
+Revises: 066db52c93de
+Create Date: 2026-10-19 09:63:43.229522
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '57aa5072a744'
+down_revision = '066db52c93de'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # `flask init-db` may have created this table already
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('waitlist_entry'):
+        op.create_table('waitlist_entry',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('service_type', sa.String(length=20), nullable=False),
+        sa.Column('item_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('destination', sa.String(length=60), nullable=False),
+        sa.Column('num_people', sa.Integer(), nullable=False),
+        sa.Column('fare_class_id', sa.Integer(), nullable=True),
+        sa.Column('check_in', sa.Date(), nullable=True),
+        sa.Column('check_out', sa.Date(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['fare_class_id'], ['fare_class.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('waitlist_entry', schema=None) as batch_op:
+            batch_op.create_index('ix_waitlist_entry_queue', ['service_type', 'item_id', 'created_at', 'id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_waitlist_entry_user_id'), ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('waitlist_entry', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_waitlist_entry_user_id'))
+        batch_op.drop_index('ix_waitlist_entry_queue')
+    op.drop_table('waitlist_entry')
@@ -0,0 +1,38 @@
+"""idempotency keys: idempotency_key table
+
+Revision ID: 728f6db9d2e3
+Revises: ab14d18a4840
+Create Date: 2026-10-19 09:07:46.693262
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '728f6db9d2e3'
+down_revision = 'ab14d18a4840'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # `flask init-db` may have created this table already
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('idempotency_key'):
+        op.create_table('idempotency_key',
+        sa.Column('key', sa.String(length=64), nullable=False),
+        sa.Column('request', sa.String(length=255), nullable=False),
+        sa.Column('status_code', sa.Integer(), nullable=True),
+        sa.Column('response', sa.Text(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('key')
+        )
+        with op.batch_alter_table('idempotency_key', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_idempotency_key_expires_at'), ['expires_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('idempotency_key', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_idempotency_key_expires_at'))
+    op.drop_table('idempotency_key')
@@ -0,0 +1,50 @@
+"""per-night hotel availability: hotel_night and hotel_stay tables
+
+Revision ID: 94cb83a09d5f
+Revises: 49239273bad5
+Create Date: 2026-10-19 09:28:06.841449
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '94cb83a09d5f'
+down_revision = '49239273bad5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # `flask init-db` may have created these tables already
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('hotel_night'):
+        op.create_table('hotel_night',
+        sa.Column('hotel_id', sa.Integer(), nullable=False),
+        sa.Column('night', sa.Date(), nullable=False),
+        sa.Column('availability', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['hotel_id'], ['hotel.id'], ),
+        sa.PrimaryKeyConstraint('hotel_id', 'night')
+        )
+
+    if not inspector.has_table('hotel_stay'):
+        op.create_table('hotel_stay',
+        sa.Column('booking_id', sa.Integer(), nullable=False),
+        sa.Column('hotel_id', sa.Integer(), nullable=False),
+        sa.Column('check_in', sa.Date(), nullable=False),
+        sa.Column('check_out', sa.Date(), nullable=False),
+        sa.ForeignKeyConstraint(['booking_id'], ['booking.id'], ),
+        sa.ForeignKeyConstraint(['hotel_id'], ['hotel.id'], ),
+        sa.PrimaryKeyConstraint('booking_id')
+        )
+        with op.batch_alter_table('hotel_stay', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_hotel_stay_hotel_id'), ['hotel_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('hotel_stay', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_hotel_stay_hotel_id'))
+    op.drop_table('hotel_stay')
+
+    op.drop_table('hotel_night')
@@ -0,0 +1,47 @@
+"""seat holds: inventory_hold table
+
+Revision ID: ab14d18a4840
+Revises: b74e1c5a9d20
+Create Date: 2026-10-19 09:00:40.250217
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ab14d18a4840'
+down_revision = 'b74e1c5a9d20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # `flask init-db` may have created this table already
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('inventory_hold'):
+        op.create_table('inventory_hold',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('token', sa.String(length=32), nullable=False),
+        sa.Column('service_type', sa.String(length=50), nullable=False),
+        sa.Column('item_id', sa.Integer(), nullable=False),
+        sa.Column('flight_id', sa.Integer(), nullable=True),
+        sa.Column('hotel_id', sa.Integer(), nullable=True),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['flight_id'], ['flight.id'], ),
+        sa.ForeignKeyConstraint(['hotel_id'], ['hotel.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('token')
+        )
+        with op.batch_alter_table('inventory_hold', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_inventory_hold_expires_at'), ['expires_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('inventory_hold', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_inventory_hold_expires_at'))
+    op.drop_table('inventory_hold')
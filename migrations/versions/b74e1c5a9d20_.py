@@ -0,0 +1,58 @@
+"""recurring flight schedules: flight_schedule table and flight.schedule_id
+
+Revision ID: b74e1c5a9d20
+Revises: 3f9c2d7a41b6
+Create Date: 2026-10-18 14:03:27.518734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b74e1c5a9d20'
+down_revision = '3f9c2d7a41b6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # `flask init-db` may have created flight_schedule already; it never alters flight
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('flight_schedule'):
+        op.create_table('flight_schedule',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('airline', sa.String(length=120), nullable=False),
+        sa.Column('flight_number', sa.String(length=120), nullable=False),
+        sa.Column('departure_city', sa.String(length=120), nullable=False),
+        sa.Column('destination', sa.String(length=120), nullable=False),
+        sa.Column('weekdays', sa.String(length=7), nullable=False),
+        sa.Column('departure_time', sa.Time(), nullable=False),
+        sa.Column('duration_minutes', sa.Integer(), nullable=False),
+        sa.Column('valid_from', sa.Date(), nullable=False),
+        sa.Column('valid_to', sa.Date(), nullable=False),
+        sa.Column('price', sa.Float(), nullable=False),
+        sa.Column('capacity', sa.Integer(), nullable=False),
+        sa.Column('is_active', sa.Boolean(), server_default=sa.true(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('flight_schedule', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_flight_schedule_valid_to'), ['valid_to'], unique=False)
+
+    if 'schedule_id' not in {c['name'] for c in inspector.get_columns('flight')}:
+        with op.batch_alter_table('flight', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('schedule_id', sa.Integer(), nullable=True))
+            batch_op.create_foreign_key('fk_flight_schedule_id', 'flight_schedule', ['schedule_id'], ['id'])
+            batch_op.create_unique_constraint('uq_flight_schedule_departure', ['schedule_id', 'departure_time'])
+
+
+def downgrade():
+    with op.batch_alter_table('flight', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_flight_schedule_departure', type_='unique')
+        batch_op.drop_constraint('fk_flight_schedule_id', type_='foreignkey')
+        batch_op.drop_column('schedule_id')
+
+    with op.batch_alter_table('flight_schedule', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_flight_schedule_valid_to'))
+
+    op.drop_table('flight_schedule')
@@ -0,0 +1,89 @@
+"""price and availability alerts: price_alert, price_alert_bucket, alert_change and notification_outbox tables
+
+Revision ID: c1f71a1c6fda
+Revises: 27941cd80dbd
+Create Date: 2026-10-19 09:49:36.196343
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c1f71a1c6fda'
+down_revision = '27941cd80dbd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # `flask init-db` may have created these tables already
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('price_alert'):
+        op.create_table('price_alert',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('service_type', sa.String(length=20), nullable=False),
+        sa.Column('destination', sa.String(length=120), nullable=False),
+        sa.Column('departure_city', sa.String(length=120), nullable=True),
+        sa.Column('start_date', sa.Date(), nullable=False),
+        sa.Column('end_date', sa.Date(), nullable=False),
+        sa.Column('max_price', sa.Float(), nullable=True),
+        sa.Column('num_people', sa.Integer(), nullable=False),
+        sa.Column('notified_price', sa.Float(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('price_alert', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_price_alert_user_id'), ['user_id'], unique=False)
+
+    if not inspector.has_table('price_alert_bucket'):
+        op.create_table('price_alert_bucket',
+        sa.Column('service_type', sa.String(length=20), nullable=False),
+        sa.Column('destination', sa.String(length=120), nullable=False),
+        sa.Column('bucket', sa.Date(), nullable=False),
+        sa.Column('alert_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['alert_id'], ['price_alert.id'], ),
+        sa.PrimaryKeyConstraint('service_type', 'destination', 'bucket', 'alert_id')
+        )
+
+    if not inspector.has_table('alert_change'):
+        op.create_table('alert_change',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('service_table', sa.String(length=20), nullable=False),
+        sa.Column('item_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+        )
+
+    if not inspector.has_table('notification_outbox'):
+        op.create_table('notification_outbox',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=30), nullable=False),
+        sa.Column('subject', sa.String(length=200), nullable=False),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('notification_outbox', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_notification_outbox_sent_at'), ['sent_at'], unique=False)
+            batch_op.create_index(batch_op.f('ix_notification_outbox_user_id'), ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('notification_outbox', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_notification_outbox_user_id'))
+        batch_op.drop_index(batch_op.f('ix_notification_outbox_sent_at'))
+    op.drop_table('notification_outbox')
+
+    op.drop_table('alert_change')
+
+    op.drop_table('price_alert_bucket')
+
+    with op.batch_alter_table('price_alert', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_price_alert_user_id'))
+    op.drop_table('price_alert')
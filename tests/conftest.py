@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import create_app, db
+from app.models import Flight, Hotel, PackageDeal, User
+
+
+def make_app(tmp_path, **config):
+    return create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'test.db'}",
+        "TESTING": True,
+        "WTF_CSRF_ENABLED": False,
+        "LOG_FILE": None,
+        "LOG_TO_CONSOLE": False,
+        "HOLD_SWEEP_INTERVAL": 0,
+        **config,
+    })
+
+
+def add_user(name, email, password="secret1"):
+    user = User(name=name, email=email)
+    user.set_password(password)
+    db.session.add(user)
+    db.session.flush()
+    return user
+
+
+@pytest.fixture
+def app(tmp_path):
+    """An app on a fresh SQLite file with user 1, flight 1, hotel 1 and package 1 (10 units each)."""
+    app = make_app(tmp_path)
+    with app.app_context():
+        db.create_all()
+        add_user("A", "a@example.com")
+        now = datetime.utcnow()
+        flight = Flight(
+            airline="Air", flight_number="AI1", departure_city="Pune", destination="Goa",
+            departure_time=now + timedelta(days=5), arrival_time=now + timedelta(days=5, hours=2),
+            price=100, availability=10,
+        )
+        hotel = Hotel(
+            hotel_name="Sea View", hotel_location="Goa", hotel_rating=4, price=50, availability=10,
+            checkin_date=now, checkout_date=now + timedelta(days=30),
+        )
+        db.session.add_all([flight, hotel])
+        db.session.flush()
+        db.session.add(PackageDeal(
+            flight_id=flight.id, hotel_id=hotel.id, price=200,
+            start_date=now.date(), end_date=(now + timedelta(days=20)).date(),
+        ))
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def login(app, email="a@example.com", password="secret1"):
+    client = app.test_client()
+    client.post("/login", data={"email": email, "password": password})
+    return client
+
+
+@pytest.fixture
+def client(app):
+    return login(app)
+
+
+def search_flight(client, guests=1):
+    day = (datetime.utcnow() + timedelta(days=5)).strftime("%Y-%m-%d")
+    return client.post("/search", data={
+        "booking_type": "Flight", "destination": "Goa", "departure_city": "Pune", "departure_time": day,
+        "guests": str(guests),
+    })
+
+
+def search_hotel(client, guests=1, nights=2, start_in=1):
+    check_in = datetime.utcnow().date() + timedelta(days=start_in)
+    return client.post("/search", data={
+        "booking_type": "Hotel", "destination": "Goa", "check_in": check_in.isoformat(),
+        "check_out": (check_in + timedelta(days=nights)).isoformat(), "guests": str(guests),
+    })
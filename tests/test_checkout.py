@@ -0,0 +1,93 @@
+from datetime import date, timedelta
+
+from app import db, inventory
+from app.models import Booking, Flight, Hotel, HotelNight, HotelStay, InventoryHold, InventoryLedger
+
+from conftest import search_flight, search_hotel
+
+
+def nights(hotel_id):
+    db.session.expire_all()
+    return {row.night: row.availability for row in HotelNight.query.filter_by(hotel_id=hotel_id)}
+
+
+def test_cart_books_every_item_in_one_transaction(app, client):
+    search_flight(client, guests=2)
+    client.post("/cart/add/Flight/1")
+    client.post("/cart/add/PackageDeal/1")
+    assert client.post("/cart/checkout").status_code == 302
+    with app.app_context():
+        assert [(b.service_type, b.num_people) for b in Booking.query.order_by(Booking.id)] == [
+            ("Flight", 2), ("PackageDeal", 2)]
+        assert db.session.get(Flight, 1).availability == 6
+        assert db.session.get(Hotel, 1).availability == 8
+
+
+def test_cart_ledgers_each_booking_separately(app, client):
+    search_flight(client, guests=2)
+    client.post("/cart/add/Flight/1")
+    client.post("/cart/add/PackageDeal/1")
+    client.post("/cart/checkout")
+    with app.app_context():
+        flight, package = Booking.query.order_by(Booking.id)
+        rows = InventoryLedger.query.order_by(InventoryLedger.service_table, InventoryLedger.booking_id)
+        assert [(row.service_table, row.delta, row.booking_id) for row in rows] == [
+            ("flight", -2, flight.id), ("flight", -2, package.id), ("hotel", -2, package.id)]
+
+
+def test_cart_books_nothing_when_one_item_does_not_fit(app, client):
+    search_flight(client, guests=4)
+    client.post("/cart/add/Hotel/1")
+    client.post("/cart/add/Flight/1", data={"num_people": 7})
+    client.post("/cart/add/PackageDeal/1")  # 4 more on the flight: 11 > 10
+    client.post("/cart/checkout")
+    with app.app_context():
+        assert Booking.query.count() == 0
+        assert db.session.get(Flight, 1).availability == 10
+        assert db.session.get(Hotel, 1).availability == 10
+
+
+def test_cart_hotel_stay_takes_only_its_nights(app, client):
+    with app.app_context():
+        inventory.split_hotel_nights(1)
+        db.session.commit()
+        before = nights(1)
+    search_hotel(client, guests=1, nights=2, start_in=3)
+    client.post("/cart/add/Hotel/1")
+    client.post("/cart/checkout")
+    with app.app_context():
+        after = nights(1)
+        check_in = date.today() + timedelta(days=3)
+        taken = {night for night in after if after[night] != before[night]}
+        assert taken == {check_in, check_in + timedelta(days=1)}
+        assert all(after[night] == before[night] - 1 for night in taken)
+        stay = HotelStay.query.one()
+        assert (stay.check_in, stay.check_out) == (check_in, check_in + timedelta(days=2))
+
+
+def test_cart_books_a_held_item_out_of_its_hold(app, client):
+    search_flight(client, guests=2)
+    client.post("/hold/Flight/1")
+    client.post("/cart/add/Flight/1")
+    client.post("/cart/checkout")
+    with app.app_context():
+        assert Booking.query.count() == 1
+        assert InventoryHold.query.count() == 0
+        assert db.session.get(Flight, 1).availability == 8
+    with client.session_transaction() as session:
+        assert "hold" not in session
+
+
+def test_json_checkout_reports_the_item_that_does_not_fit(app, client):
+    items = [{"booking_type": "Hotel", "item_id": 1, "num_people": 3},
+             {"booking_type": "PackageDeal", "item_id": 1, "num_people": 8}]
+    response = client.post("/cart/checkout", json={"items": items})
+    assert response.status_code == 409
+    assert response.get_json() == {"error": "Not enough availability left on Hotel 1."}
+    items[1]["num_people"] = 7
+    response = client.post("/cart/checkout", json={"items": items})
+    assert response.status_code == 201
+    with app.app_context():
+        assert response.get_json()["booking_ids"] == [b.id for b in Booking.query.order_by(Booking.id)]
+        assert db.session.get(Hotel, 1).availability == 0
+        assert db.session.get(Flight, 1).availability == 3
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+from flask import session
+
+from app import db, idempotency
+from app.models import Booking, Flight, IdempotencyKey
+
+from conftest import search_flight
+
+ITEMS = {"items": [{"booking_type": "Flight", "item_id": 1, "num_people": 2}]}
+
+
+def availability(model, item_id):
+    db.session.expire_all()
+    return db.session.get(model, item_id).availability
+
+
+def lease(app, client_key, expires_at):
+    """Store an in-progress marker for user 1's checkout, as a request still running would."""
+    with app.test_request_context("/cart/checkout", method="POST"):
+        session["user_id"] = 1
+        key = idempotency._storage_key(client_key)
+        db.session.add(IdempotencyKey(key=key, request="POST /cart/checkout", expires_at=expires_at))
+        db.session.commit()
+
+
+def test_retried_booking_is_replayed_not_booked_again(app, client):
+    search_flight(client, guests=2)
+    first = client.post("/book/Flight/1", data={"idempotency_key": "k1"})
+    again = client.post("/book/Flight/1", data={"idempotency_key": "k1"})
+    assert again.headers["Idempotent-Replayed"] == "true"
+    assert again.location == first.location
+    with app.app_context():
+        assert Booking.query.count() == 1
+        assert availability(Flight, 1) == 8
+
+
+def test_request_still_running_gets_409(app, client):
+    lease(app, "k2", datetime.utcnow() + timedelta(seconds=60))
+    response = client.post("/cart/checkout", json=ITEMS, headers={"Idempotency-Key": "k2"})
+    assert response.status_code == 409
+    with app.app_context():
+        assert Booking.query.count() == 0
+
+
+def test_expired_lease_is_taken_over(app, client):
+    lease(app, "k3", datetime.utcnow() - timedelta(seconds=1))  # Its worker died mid-request
+    response = client.post("/cart/checkout", json=ITEMS, headers={"Idempotency-Key": "k3"})
+    assert response.status_code == 201
+    with app.app_context():
+        assert Booking.query.count() == 1
+        assert IdempotencyKey.query.one().status_code == 201
+
+
+def test_early_return_after_reserving_keeps_nothing(app, client, monkeypatch):
+    monkeypatch.setattr(Flight, "calculate_cost", lambda self: None)
+    search_flight(client, guests=2)
+    client.post("/book/Flight/1", data={"idempotency_key": "k4"})
+    with app.app_context():
+        assert Booking.query.count() == 0
+        assert availability(Flight, 1) == 10
+        assert IdempotencyKey.query.one().status_code == 302
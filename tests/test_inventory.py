@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db, inventory
+from app.models import Flight, Hotel, InventoryHold, InventoryLedger
+
+from conftest import search_flight
+
+
+def availability(model, item_id):
+    db.session.expire_all()
+    return db.session.get(model, item_id).availability
+
+
+def test_reserve_takes_units_and_ledgers_them(app):
+    with app.app_context():
+        inventory.reserve(inventory.units_for("PackageDeal", 1), 3, "reserve")
+        db.session.commit()
+        assert availability(Flight, 1) == 7
+        assert availability(Hotel, 1) == 7
+        assert sorted((row.service_table, row.delta) for row in InventoryLedger.query) == [("flight", -3), ("hotel", -3)]
+
+
+def test_reserve_refuses_more_than_is_left(app):
+    with app.app_context():
+        with pytest.raises(inventory.InsufficientInventory):
+            inventory.reserve([(Flight, 1)], 11)
+        db.session.rollback()
+        assert availability(Flight, 1) == 10
+
+
+def test_reserve_refuses_retired_rows(app):
+    with app.app_context():
+        db.session.get(Hotel, 1).is_active = False
+        db.session.commit()
+        with pytest.raises(inventory.InsufficientInventory):
+            inventory.reserve([(Hotel, 1)], 1)
+
+
+def test_sweep_releases_only_expired_holds(app):
+    with app.app_context():
+        expired = inventory.place_hold("Flight", 1, 2, ttl=-1).token
+        live = inventory.place_hold("Flight", 1, 3).token
+        db.session.commit()
+        assert availability(Flight, 1) == 5
+        assert inventory.sweep_expired_holds() == 1
+        assert availability(Flight, 1) == 7
+        assert [hold.token for hold in InventoryHold.query] == [live]
+        with pytest.raises(inventory.HoldNotFound):
+            inventory.convert_hold(expired, "Flight", 1, 2)
+
+
+def test_read_only_request_sweeps_expired_holds(app, monkeypatch):
+    app.config["HOLD_SWEEP_INTERVAL"] = 60
+    monkeypatch.setattr(inventory, "_last_sweep", 0.0)
+    with app.app_context():
+        inventory.place_hold("Flight", 1, 4, ttl=-1)
+        db.session.commit()
+    # Search is @read_only: its queries go to the mode=ro engine, the sweep must not
+    assert search_flight(app.test_client()).status_code == 200
+    with app.app_context():
+        assert availability(Flight, 1) == 10
+        assert InventoryHold.query.count() == 0
+
+
+def test_sweep_does_not_commit_the_requests_work(app, monkeypatch):
+    monkeypatch.setattr(inventory, "_last_sweep", 0.0)
+    app.config["HOLD_SWEEP_INTERVAL"] = 60
+    with app.test_request_context():
+        inventory.place_hold("Flight", 1, 1, ttl=-1)
+        db.session.commit()
+        db.session.get(Flight, 1).price = 1  # Left uncommitted by a failed view
+        inventory._maybe_sweep()
+    with app.app_context():
+        assert db.session.get(Flight, 1).price == 100
+        assert availability(Flight, 1) == 10
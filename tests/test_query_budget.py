@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import create_app, db
+from app.models import Booking, Flight, User
+from app.query_profiler import QueryBudgetExceeded
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'test.db'}",
+        "TESTING": True,
+        "WTF_CSRF_ENABLED": False,
+        "LOG_FILE": None,
+        "LOG_TO_CONSOLE": False,
+        "SQL_PROFILER_STRICT": True,
+    })
+    with app.app_context():
+        db.create_all()
+        user = User(name="A", email="a@example.com")
+        user.set_password("secret1")
+        db.session.add(user)
+        now = datetime.utcnow()
+        for i in range(30):
+            flight = Flight(
+                airline="Air", flight_number=f"AI{i}", departure_city="Pune", destination="Goa",
+                departure_time=now + timedelta(days=2), arrival_time=now + timedelta(days=2, hours=2),
+                price=100 + i, availability=10,
+            )
+            db.session.add(flight)
+            db.session.flush()
+            db.session.add(Booking(
+                user_id=user.id, name="A", email="a@example.com", destination="Goa", num_people=1,
+                service_type="Flight", flight_id=flight.id, flight_number=flight.flight_number, total_price=100,
+            ))
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    client.post("/login", data={"email": "a@example.com", "password": "secret1"})
+    return client
+
+
+def search(client):
+    day = (datetime.utcnow() + timedelta(days=2)).strftime("%Y-%m-%d")
+    return client.post("/search", data={
+        "booking_type": "Flight", "destination": "Goa", "departure_city": "Pune", "departure_time": day, "guests": "1",
+    })
+
+
+def test_budgeted_views_fit_their_budget(client):
+    assert search(client).status_code == 200
+    assert client.get("/profile").status_code == 200
+    client.post("/admin-login", data={"password": "admin123"})
+    for view in ("flight", "booking", "flight_bookings", "hotel_bookings", "package_deal_bookings"):
+        assert client.get(f"/admin/{view}/").status_code == 200
+
+
+def test_over_budget_view_fails_in_strict_mode(app, client, monkeypatch):
+    monkeypatch.setattr(app.view_functions["routes.search"], "query_budget", 1)
+    with pytest.raises(QueryBudgetExceeded, match="routes.search ran"):
+        search(client)
+
+
+def test_over_budget_view_passes_outside_strict_mode(app, client, monkeypatch):
+    app.config["SQL_PROFILER_STRICT"] = False
+    monkeypatch.setattr(app.view_functions["routes.search"], "query_budget", 1)
+    assert search(client).status_code == 200
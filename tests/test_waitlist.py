@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+from app import db, waitlist
+from app.models import Booking, Flight, Hotel, NotificationOutbox, WaitlistEntry
+
+from conftest import add_user, search_flight
+
+
+def sell_out(app, client, guests=10):
+    search_flight(client, guests=guests)
+    client.post("/book/Flight/1")
+    with app.app_context():
+        return Booking.query.one().id
+
+
+def wait(name, service_type, item_id, num_people, minutes_ago):
+    user = add_user(name, f"{name.lower()}@example.com")
+    entry = waitlist.join(user.id, name, user.email, "Goa", service_type, item_id, num_people)
+    entry.created_at = datetime.utcnow() - timedelta(minutes=minutes_ago)
+    return user.id
+
+
+def availability(model, item_id):
+    db.session.expire_all()
+    return db.session.get(model, item_id).availability
+
+
+def test_cancel_promotes_a_package_waiting_on_the_flight(app, client):
+    booking_id = sell_out(app, client)
+    with app.app_context():
+        b = wait("B", "PackageDeal", 1, 3, minutes_ago=5)
+        c = wait("C", "Flight", 1, 11, minutes_ago=10)  # Larger than the whole flight: passed over
+        db.session.commit()
+    client.post(f"/cancel-booking/{booking_id}")
+    with app.app_context():
+        promoted = Booking.query.filter_by(user_id=b).one()
+        assert (promoted.service_type, promoted.num_people, promoted.is_confirmed) == ("PackageDeal", 3, True)
+        assert availability(Flight, 1) == 7
+        assert availability(Hotel, 1) == 7
+        assert [entry.user_id for entry in WaitlistEntry.query] == [c]
+        assert [row.user_id for row in NotificationOutbox.query] == [b]
+
+
+def test_cancel_promotes_oldest_first_and_skips_parties_that_do_not_fit(app, client):
+    booking_id = sell_out(app, client, guests=4)
+    with app.app_context():
+        db.session.get(Flight, 1).availability = 0  # The rest sold elsewhere
+        db.session.commit()
+        first = wait("B", "Flight", 1, 3, minutes_ago=30)
+        too_big = wait("C", "Flight", 1, 2, minutes_ago=20)
+        last = wait("D", "Flight", 1, 1, minutes_ago=10)
+        db.session.commit()
+    client.post(f"/cancel-booking/{booking_id}")
+    with app.app_context():
+        booked = {b.user_id: b.num_people for b in Booking.query.filter(Booking.user_id != 1)}
+        assert booked == {first: 3, last: 1}
+        assert availability(Flight, 1) == 0
+        assert [entry.user_id for entry in WaitlistEntry.query] == [too_big]
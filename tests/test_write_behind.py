@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+from app import db, inventory, write_behind
+from app.models import Booking, FareClass, Flight, Hotel, IngestedBooking, InventoryLedger
+
+
+@pytest.fixture
+def pipeline(app, tmp_path):
+    """A pipeline whose writer is not running: tests commit with drain()."""
+    app.config.update(BOOKING_WRITE_BEHIND=True, WRITE_BEHIND_QUEUE_PATH=str(tmp_path / "queue.jsonl"),
+                      WRITE_BEHIND_FSYNC=False)
+    pipeline = write_behind.WriteBehindPipeline(app)
+    app.extensions["write_behind"] = pipeline
+    yield pipeline
+    pipeline.queue.close()
+
+
+def booking(quantity=2):
+    return Booking(user_id=1, name="A", email="a@example.com", destination="Goa", num_people=quantity,
+                   service_type="Flight", flight_id=1, flight_number="AI1", total_price=100 * quantity)
+
+
+def queue(pipeline, quantity=2):
+    units = [(Flight, 1)]
+    pipeline.reserve(units, quantity)
+    return pipeline.enqueue(booking(quantity), units, quantity)
+
+
+def availability(model, item_id):
+    db.session.expire_all()
+    return db.session.get(model, item_id).availability
+
+
+def test_drain_commits_queued_bookings_with_their_ledger(app, pipeline):
+    with app.app_context():
+        ref = queue(pipeline)
+        assert Booking.query.count() == 0
+        assert pipeline.counters.pending_units() == 2
+        assert pipeline.drain() == 1
+        stored = Booking.query.one()
+        assert db.session.get(IngestedBooking, ref).booking_id == stored.id
+        assert availability(Flight, 1) == 8
+        assert [(row.delta, row.booking_id) for row in InventoryLedger.query] == [(-2, stored.id)]
+        assert pipeline.counters.pending_units() == 0
+        assert pipeline.queue.read_all() == []
+
+
+def test_entry_that_no_longer_fits_is_dead_lettered(app, pipeline):
+    with app.app_context():
+        first = queue(pipeline, 4)
+        second = queue(pipeline, 4)
+        inventory.reserve([(Flight, 1)], 5, "book")  # Booked directly behind the counters' back
+        db.session.commit()
+        assert pipeline.drain() == 1
+        assert availability(Flight, 1) == 1
+        assert [row.ref for row in IngestedBooking.query] == [first]
+        with open(pipeline.dead_letter_path, encoding="utf-8") as f:
+            assert [json.loads(line)["ref"] for line in f] == [second]
+        assert pipeline.stats["dead_lettered"] == 1
+        assert pipeline.counters.pending_units() == 0
+        assert pipeline.queue.read_all() == []
+
+
+def test_replayed_entry_already_ingested_is_skipped(app, pipeline):
+    with app.app_context():
+        ref = queue(pipeline)
+        entry = pipeline._entries[0]
+        pipeline.drain()
+        # Replayed after a crash between the commit and the queue's truncation
+        pipeline._entries.append(entry)
+        pipeline._outstanding += 1
+        pipeline.counters.add_pending([(Flight, 1)], 2)
+        assert pipeline.drain() == 0
+        assert pipeline.stats["skipped"] == 1
+        assert [row.ref for row in IngestedBooking.query] == [ref]
+        assert availability(Flight, 1) == 8
+        assert pipeline.counters.pending_units() == 0
+
+
+def test_fare_classes_and_split_hotels_are_booked_directly(app, pipeline):
+    with app.app_context():
+        assert write_behind.accepts([(Flight, 1), (Hotel, 1)])
+        db.session.add(FareClass(flight_id=1, code="Y", name="Economy", price=100, availability=10,
+                                 first_row=1, last_row=10))
+        inventory.split_hotel_nights(1)
+        db.session.commit()
+        assert not write_behind.accepts([(Flight, 1)])
+        assert not write_behind.accepts([(Hotel, 1)])